@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+from datetime import (
+    datetime,
+    timezone)
+
+from src.media.dedup import NearDuplicateIndex
+from src.media.roi import RegionOfInterest
+from src.vision._cache import OCRCache
+from src.telegram.backfill import BackfillStore
+from src.vision._models import VisionBackend
+from src.vision._registry import create_vision
+from src.telegram.telegram import TelegramOCR
+from src.utils import (
+    data_file_path,
+    load_api_info,
+    load_config,
+    source_data_directories
+)
+
+# Load in telegram api info
+telegram_info = load_api_info()
+
+async def backfill_channels(telegram: TelegramOCR, store: BackfillStore, args: argparse.Namespace) -> None:
+    """
+    Backfill each selected channel in turn.
+    """
+
+    offset_date = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc) if args.since else None
+    for channel_config in telegram_info.channels:
+        if args.channel and channel_config.channel not in args.channel:
+            continue
+
+        await telegram.backfill(
+            channel_config=channel_config,
+            store=store,
+            min_id=args.min_id,
+            max_id=args.max_id,
+            offset_date=offset_date)
+        print(f'{store.count(channel=channel_config.channel)} results stored for {channel_config.channel}, '
+              f'{store.count_given_up(channel=channel_config.channel)} messages given up on')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='OCR the history of the configured channels into a local store.')
+    parser.add_argument('--channel', nargs='+', help='channels to backfill, all configured ones by default')
+    parser.add_argument('--min-id', type=int, default=0, help='only messages after this id')
+    parser.add_argument('--max-id', type=int, default=0, help='only messages before this id')
+    parser.add_argument('--since', help='only messages after this date, e.g. 2024-01-31')
+    parser.add_argument('--database', default=data_file_path(file_name='backfill.sqlite3'))
+    parser.add_argument('--max-attempts', type=int, default=3, help='failures after which a message is given up on')
+    args = parser.parse_args()
+
+    # Generate directories
+    for channel_config in telegram_info.channels:
+        source_data_directories(channel=channel_config.channel)
+
+    config = load_config()
+    vision_backend = config.get('vision_backend', VisionBackend.OPENAI.value)
+    vision = create_vision(backend=vision_backend)
+
+    # Shares the live listener's results, so messages it already read are not sent to the backend again
+    ocr_cache = None
+    if config.get('ocr_cache', True):
+        ocr_cache = OCRCache(
+            database_path=data_file_path(file_name='ocr_cache.sqlite3'),
+            ttl=config.get('ocr_cache_ttl_days', 7) * 24 * 60 * 60)
+
+    # Telegram instantiation, nothing is sent so no destination channel is needed
+    telegram = TelegramOCR(
+        telegram_app_id=telegram_info.app_id,
+        telegram_app_hash=telegram_info.app_hash,
+        telegram_phone_number=telegram_info.phone_number,
+        vision=vision,
+        channel_visions={vision_backend: vision},
+        ocr_cache=ocr_cache,
+        near_duplicate_index=NearDuplicateIndex(
+            database_path=data_file_path(file_name='near_duplicates.sqlite3')),
+        region_of_interest=RegionOfInterest() if config.get('crop_to_text_region', False) else None
+    )
+
+    store = BackfillStore(database_path=args.database, max_attempts=args.max_attempts)
+    try:
+        asyncio.run(backfill_channels(telegram=telegram, store=store, args=args))
+    finally:
+        store.close()
+        if ocr_cache is not None:
+            ocr_cache.close()
@@ -27,4 +27,12 @@ def ocr_evaluation(image_name: str, prediction: str) -> None:
     print(f'Evaluating prediction for {image_name}')
     print(f'Expected: {GROUND_TRUTH_DATA[image_name]} -- Prediction: {prediction}')
     print(f'Result: {prediction_result_category}')
-    print('--------------------')
\ No newline at end of file
+    print('--------------------')
+
+def ocr_accuracy(predictions: dict) -> float:
+    """
+    Share of predictions, keyed by image name, that match the ground truth data.
+    """
+
+    correct = sum(prediction == GROUND_TRUTH_DATA[image_name] for image_name, prediction in predictions.items())
+    return correct / len(predictions) if predictions else 0.0
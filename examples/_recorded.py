@@ -0,0 +1,190 @@
+import asyncio
+import dataclasses
+import json
+import time
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple)
+
+from cv2.typing import MatLike
+
+from src.media.hashing import dhash
+from src.vision._base import BaseVision
+from src.vision._models import ImageFormat
+from src.utils import (
+    EncodingPolicy,
+    encode_image)
+
+def _image_key(image: MatLike) -> str:
+    """
+    Key of a pre-processed image in a recording.
+    """
+
+    return f'{dhash(image=image):016x}'
+
+def _policy_to_dict(policy: Optional[EncodingPolicy]) -> Optional[dict]:
+    if policy is None:
+        return None
+    return {**dataclasses.asdict(policy), 'image_format': policy.image_format.value}
+
+def _policy_from_dict(data: Optional[dict]) -> Optional[EncodingPolicy]:
+    if data is None:
+        return None
+    return EncodingPolicy(**{**data, 'image_format': ImageFormat(data['image_format'])})
+
+class RecordingVision(BaseVision):
+    """
+    Wraps a vision backend and records its responses and latencies by image hash.
+    """
+    def __init__(self, vision: BaseVision):
+        self._vision = vision
+        self.responses: Dict[str, dict] = {}
+
+    @property
+    def cache_key(self) -> str:
+        return self._vision.cache_key
+
+    @property
+    def name(self) -> str:
+        return self._vision.name
+
+    def _process_image(self, image: MatLike) -> Any:
+        return self._vision._process_image(image=image)
+
+    def _record(self, image: MatLike, start: float, result: Optional[str], confidence: Optional[float]) -> None:
+        self.responses[_image_key(image=image)] = {
+            'result': result,
+            'confidence': confidence,
+            'latency': time.perf_counter() - start}
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        start = time.perf_counter()
+        result, confidence = self._vision.get_completion_with_confidence(image=image)
+        self._record(image=image, start=start, result=result, confidence=confidence)
+        return result, confidence
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        return self.get_completion_with_confidence(image=image)[0]
+
+    async def aget_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        start = time.perf_counter()
+        result, confidence = await self._vision.aget_completion_with_confidence(image=image)
+        self._record(image=image, start=start, result=result, confidence=confidence)
+        return result, confidence
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        return (await self.aget_completion_with_confidence(image=image))[0]
+
+    def warm_up(self) -> None:
+        self._vision.warm_up()
+
+    async def aclose(self) -> None:
+        await self._vision.aclose()
+
+    def save(self, path: str) -> None:
+        """
+        Write the recorded responses to a JSON file a RecordedVision can replay.
+        """
+
+        # Backends sending raw arrays, e.g. local models, have no encoding policy
+        encoding_policy = getattr(self._vision, '_encoding_policy', None)
+        with open(path, 'w') as f:
+            json.dump({
+                'cache_key': self.cache_key,
+                'encoding_policy': _policy_to_dict(policy=encoding_policy),
+                'responses': self.responses}, f, indent=2)
+
+class RecordedVision(BaseVision):
+    """
+    Offline stand-in for a remote backend, replaying recorded responses.
+
+    Images are matched by the hash of the pre-processed image, so a recording
+    only covers the parser configurations it was made with; other images
+    complete to None. With replay_latency the recorded latency is slept, so
+    concurrency behaves as it would against the real backend. Images are
+    encoded with the recorded backend's encoding policy, if it had one.
+    """
+    def __init__(
+        self,
+        cache_key: str,
+        responses: Dict[str, dict],
+        replay_latency: bool = True,
+        encoding_policy: Optional[EncodingPolicy] = None
+    ):
+        self._cache_key = cache_key
+        self._responses = responses
+        self._replay_latency = replay_latency
+        self._encoding_policy = encoding_policy
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path: str, **options) -> 'RecordedVision':
+        with open(path) as f:
+            recording = json.load(f)
+        return cls(
+            cache_key=f'recorded:{recording["cache_key"]}',
+            responses=recording['responses'],
+            encoding_policy=_policy_from_dict(data=recording.get('encoding_policy')),
+            **options)
+
+    @classmethod
+    def from_ground_truth(
+        cls,
+        images: List[Tuple[str, MatLike]],
+        ground_truth: Dict[str, str],
+        latency: float = 0.0
+    ) -> 'RecordedVision':
+        """
+        Recording answering every pre-processed image with its ground truth, so the suite runs without any backend.
+
+        Accuracy is perfect by construction, only the stage timings and throughput are measured.
+        """
+
+        responses = {
+            _image_key(image=image): {'result': ground_truth[name], 'confidence': None, 'latency': latency}
+            for name, image in images}
+        return cls(cache_key='recorded:ground-truth', responses=responses)
+
+    @property
+    def cache_key(self) -> str:
+        return self._cache_key
+
+    def _process_image(self, image: MatLike) -> Any:
+        """
+        Encode the image as the recorded backend would, so the encode stage is still measured.
+        """
+
+        if self._encoding_policy is None:
+            return image
+        return encode_image(image=image, policy=self._encoding_policy)
+
+    def _lookup(self, image: MatLike) -> Tuple[Optional[str], Optional[float], float]:
+        """
+        Recorded result, confidence and latency of an image.
+        """
+
+        response = self._responses.get(_image_key(image=image))
+        if response is None:
+            self.misses += 1
+            return None, None, 0.0
+        latency = response['latency'] if self._replay_latency else 0.0
+        return response['result'], response['confidence'], latency
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        result, confidence, latency = self._lookup(image=image)
+        time.sleep(latency)
+        return result, confidence
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        return self.get_completion_with_confidence(image=image)[0]
+
+    async def aget_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        result, confidence, latency = self._lookup(image=image)
+        await asyncio.sleep(latency)
+        return result, confidence
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        return (await self.aget_completion_with_confidence(image=image))[0]
@@ -0,0 +1,104 @@
+import base64
+import os
+import time
+from typing import (
+    Callable,
+    Dict,
+    List)
+
+import numpy as np
+import cv2
+from cv2.typing import MatLike
+
+from src.media.loader import MediaLoader
+from src.media.service import preprocess_media
+from src.vision._models import ImageFormat
+from src.utils import (
+    BILEVEL_ENCODING_POLICY,
+    DEFAULT_ENCODING_POLICY,
+    EncodingPolicy,
+    encode_image,
+    encode_image_base64)
+
+REPEATS = 10
+
+POLICIES: Dict[str, EncodingPolicy] = {
+    'jpeg q95 (default)': DEFAULT_ENCODING_POLICY,
+    'jpeg q50': EncodingPolicy(quality=50),
+    'jpeg q95 max 512': EncodingPolicy(max_dimension=512),
+    'png level 3': EncodingPolicy(image_format=ImageFormat.PNG),
+    'png bilevel level 1': EncodingPolicy(image_format=ImageFormat.PNG, png_compression=1, bilevel=True),
+    'png bilevel level 6': BILEVEL_ENCODING_POLICY,
+    'png bilevel level 9': EncodingPolicy(image_format=ImageFormat.PNG, png_compression=9, bilevel=True),
+    'webp lossless': EncodingPolicy(image_format=ImageFormat.WEBP, quality=101),
+}
+
+def _time_call(func: Callable[[], object], repeats: int = REPEATS) -> float:
+    """
+    Best time in milliseconds of a function over a number of repeats.
+    """
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def _changed_pixels(image: MatLike, policy: EncodingPolicy) -> int:
+    """
+    Pixels that differ after an encode and decode round trip, -1 when the size changes.
+    """
+
+    decoded = cv2.imdecode(np.frombuffer(encode_image(image=image, policy=policy), np.uint8), cv2.IMREAD_GRAYSCALE)
+    if decoded.shape != image.shape:
+        return -1
+    return int(np.count_nonzero(decoded != image))
+
+def _legacy_encode_image_base64(image: MatLike) -> str:
+    """
+    Previous base64 encoding, copying the encoded buffer to bytes before encoding it.
+    """
+
+    _, img_encoded = cv2.imencode('.jpg', image)
+    return base64.b64encode(img_encoded.tobytes()).decode('utf-8')
+
+def benchmark_policies(images: List[MatLike]) -> None:
+    """
+    Encoded size, encoding time and losses of each policy over the pre-processed samples.
+    """
+
+    print('Encoding policies over %d pre-processed samples (best of %d runs)' % (len(images), REPEATS))
+    baseline_size = sum(len(encode_image(image=image)) for image in images)
+    for name, policy in POLICIES.items():
+        size = sum(len(encode_image(image=image, policy=policy)) for image in images)
+        encode_ms = sum(_time_call(lambda: encode_image(image=image, policy=policy)) for image in images)
+        changed = [_changed_pixels(image=image, policy=policy) for image in images]
+        lossy = 'resized' if -1 in changed else f'{sum(changed):8d} px changed'
+
+        print(f'{name:<20} {size / 1024:8.1f} KB  {baseline_size / size:6.2f}x smaller  '
+              f'encode {encode_ms:7.3f} ms  {lossy}')
+    print('--------------------')
+
+def benchmark_base64(images: List[MatLike]) -> None:
+    """
+    Compare the base64 payload path with the previous copy through bytes.
+    """
+
+    legacy_ms = sum(_time_call(lambda: _legacy_encode_image_base64(image=image)) for image in images)
+    current_ms = sum(_time_call(lambda: encode_image_base64(image=image)) for image in images)
+    assert all(
+        _legacy_encode_image_base64(image=image) == encode_image_base64(image=image) for image in images), \
+        'Base64 payloads differ from the previous implementation'
+
+    print(f'Base64 JPEG payloads  legacy {legacy_ms:7.3f} ms  current {current_ms:7.3f} ms  (identical output)')
+    print('--------------------')
+
+if __name__ == "__main__":
+    media_directory = "./examples/images"
+    images = [
+        preprocess_media(media_loader=MediaLoader(media_path=os.path.join(media_directory, media)))
+        for media in sorted(os.listdir(media_directory))]
+
+    benchmark_policies(images=images)
+    benchmark_base64(images=images)
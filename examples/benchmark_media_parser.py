@@ -0,0 +1,201 @@
+import os
+import time
+from typing import Callable
+
+import numpy as np
+import cv2
+from cv2.typing import MatLike
+
+from src.media.loader import MediaLoader
+from src.media.parser import (
+    LIGHT_GREY_THRESHOLD,
+    WHITE_THRESHOLD,
+    ContourRemoval,
+    MediaParser,
+    standard_steps)
+from src.media.roi import CropStats
+from src.utils import encode_image
+
+REPEATS = 20
+
+# Number of specks added to the synthetic noisy screenshots
+NOISE_SPECKS = (3000, 20000)
+
+def _time_call(func: Callable[[], object], repeats: int = REPEATS) -> float:
+    """
+    Best time in milliseconds of a function over a number of repeats.
+    """
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def _legacy_pixels_percentage(image: MatLike, threshold: tuple) -> float:
+    """
+    Previous statistics implementation, one color conversion and mask per threshold.
+    """
+
+    img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    mask = np.all(img_rgb >= threshold, axis=-1)
+    return np.sum(mask) / mask.size
+
+def _legacy_statistics(image: MatLike) -> tuple:
+    """
+    Previous statistics stage, two pixel percentage passes.
+    """
+
+    return (
+        _legacy_pixels_percentage(image=image, threshold=WHITE_THRESHOLD),
+        _legacy_pixels_percentage(image=image, threshold=LIGHT_GREY_THRESHOLD))
+
+def benchmark_statistics() -> None:
+    """
+    Compare the single pass statistics stage with the previous two pass stage.
+    """
+
+    media_directory = "./examples/images"
+
+    print('Image statistics (best of %d runs, ms)' % REPEATS)
+    total_legacy, total_single_pass = 0.0, 0.0
+    for media in sorted(os.listdir(media_directory)):
+        media_loader = MediaLoader(media_path=os.path.join(media_directory, media))
+        media_parser = MediaParser(media_loader=media_loader)
+
+        legacy = _legacy_statistics(image=media_loader.image)
+        statistics = media_parser._image_statistics(image=media_loader.image)
+        if legacy != (statistics.white_pixel_percentage, statistics.light_grey_pixel_percentage):
+            print(f'{media}: statistics differ from the previous implementation')
+
+        legacy_ms = _time_call(lambda: _legacy_statistics(image=media_loader.image))
+        single_pass_ms = _time_call(lambda: media_parser._image_statistics(image=media_loader.image))
+        total_legacy += legacy_ms
+        total_single_pass += single_pass_ms
+
+        print(f'{media:<12} {media_loader.image.shape[1]}x{media_loader.image.shape[0]:<5} '
+              f'legacy {legacy_ms:7.3f}  single pass {single_pass_ms:7.3f}  '
+              f'saved {legacy_ms - single_pass_ms:7.3f}')
+
+    print(f'{"total":<22} legacy {total_legacy:7.3f}  single pass {total_single_pass:7.3f}  '
+          f'speed-up {total_legacy / total_single_pass:.2f}x')
+    print('--------------------')
+
+def _noisy_screenshot(specks: int) -> MatLike:
+    """
+    Synthetic white screenshot with large text and thousands of small specks.
+    """
+
+    rng = np.random.default_rng(0)
+    image = np.full((720, 1280, 3), 255, dtype=np.uint8)
+    cv2.putText(image, 'DUSK', (200, 480), cv2.FONT_HERSHEY_SIMPLEX, 10, (0, 0, 0), 40)
+    for x, y in zip(rng.integers(5, 1275, specks), rng.integers(5, 715, specks)):
+        cv2.circle(image, (int(x), int(y)), int(rng.integers(1, 3)), (0, 0, 0), -1)
+    return image
+
+def _time_removal(media_loader: MediaLoader, **parser_options) -> tuple:
+    """
+    Timings in milliseconds of both removal modes and the number of pixels their images differ by.
+    """
+
+    parsers = {
+        mode: MediaParser(media_loader=media_loader, contour_removal=mode, **parser_options)
+        for mode in ContourRemoval}
+    base_image = parsers[ContourRemoval.CONTOURS].image.copy()
+
+    def run(mode: ContourRemoval) -> None:
+        parsers[mode].image = base_image.copy()
+        parsers[mode].remove_small_contours()
+
+    timings = tuple(_time_call(lambda: run(mode)) for mode in ContourRemoval)
+    changed_pixels = np.count_nonzero(
+        parsers[ContourRemoval.CONTOURS].image != parsers[ContourRemoval.COMPONENTS].image)
+    return timings + (changed_pixels,)
+
+def benchmark_contour_removal() -> None:
+    """
+    Timing comparison of the two small contour removal modes, examples/check_contour_removal.py checks their output.
+    """
+
+    media_directory = "./examples/images"
+
+    # The contour count threshold is disabled so that removal runs on every image
+    print('Small contour removal (best of %d runs, ms, image copy included)' % REPEATS)
+    for media in sorted(os.listdir(media_directory)):
+        media_loader = MediaLoader(media_path=os.path.join(media_directory, media))
+        contours_ms, components_ms, changed_pixels = _time_removal(
+            media_loader=media_loader, contour_area_number_threshold=0)
+        print(f'{media:<12} contours {contours_ms:7.3f}  components {components_ms:7.3f}  '
+              f'pixels differing {changed_pixels}')
+
+    for specks in NOISE_SPECKS:
+        media_loader = MediaLoader(image=_noisy_screenshot(specks=specks))
+        contours_ms, components_ms, changed_pixels = _time_removal(media_loader=media_loader)
+        print(f'{f"noisy {specks}":<12} contours {contours_ms:7.3f}  components {components_ms:7.3f}  '
+              f'pixels differing {changed_pixels}  speed-up {contours_ms / components_ms:.2f}x')
+    print('--------------------')
+
+def benchmark_region_of_interest() -> None:
+    """
+    Crop ratio, encoded size and encoding time of pre-processed images with and without cropping.
+    """
+
+    media_directory = "./examples/images"
+
+    print('Region of interest cropping (best of %d runs, ms, image copy included, JPEG KB)' % REPEATS)
+    crop_stats = CropStats()
+    total_full, total_cropped = 0.0, 0.0
+    for media in sorted(os.listdir(media_directory)):
+        media_parser = MediaParser(media_loader=MediaLoader(media_path=os.path.join(media_directory, media)))
+        media_parser.remove_small_contours()
+        full_image = media_parser.image.copy()
+
+        def crop() -> float:
+            media_parser.image = full_image.copy()
+            return media_parser.crop_to_region_of_interest()
+
+        crop_ms = _time_call(crop)
+        crop_stats.record(crop_ratio=crop())
+
+        full_ms = _time_call(lambda: encode_image(image=full_image))
+        cropped_ms = _time_call(lambda: encode_image(image=media_parser.image))
+        total_full += full_ms
+        total_cropped += cropped_ms + crop_ms
+
+        print(f'{media:<12} crop ratio {media_parser.crop_ratio:5.2f}  crop {crop_ms:6.3f}  '
+              f'encode full {full_ms:6.3f} ({len(encode_image(image=full_image)) / 1024:6.1f})  '
+              f'cropped {cropped_ms:6.3f} ({len(encode_image(image=media_parser.image)) / 1024:6.1f})')
+
+    print(f'{"total":<12} mean crop ratio {crop_stats.mean_crop_ratio:5.2f}  '
+          f'encode full {total_full:7.3f}  crop and encode {total_cropped:7.3f}')
+    print('--------------------')
+
+def benchmark_steps() -> None:
+    """
+    Mean time of each pre-processing step and how many images it applied to.
+    """
+
+    media_directory = "./examples/images"
+    steps = standard_steps(realign_and_center_contours=True, crop_to_region_of_interest=True)
+
+    step_timings: dict = {step: [] for step in steps}
+    for media in sorted(os.listdir(media_directory)):
+        media_loader = MediaLoader(media_path=os.path.join(media_directory, media))
+        for _ in range(REPEATS):
+            media_parser = MediaParser(media_loader=media_loader, steps=steps)
+            for step, seconds in media_parser.step_timings.items():
+                step_timings[step].append(seconds)
+
+    print('Pre-processing steps (mean over %d runs of each image, ms)' % REPEATS)
+    images = len(os.listdir(media_directory))
+    for step, timings in step_timings.items():
+        mean_ms = np.mean(timings) * 1000 if timings else 0.0
+        print(f'{step:<28} {mean_ms:7.3f}  applied to {len(timings) // REPEATS:2d}/{images} images')
+    print('--------------------')
+
+if __name__ == "__main__":
+    benchmark_steps()
+    benchmark_statistics()
+    benchmark_contour_removal()
+    benchmark_region_of_interest()
@@ -0,0 +1,73 @@
+import statistics
+import subprocess
+import sys
+from typing import Optional
+
+from src.vision._models import VisionBackend
+from src.vision._registry import VISION_BACKENDS
+
+REPEATS = 5
+
+# Modules that should stay unloaded until a backend using them is created
+HEAVY_MODULES = ('torch', 'transformers', 'easyocr', 'openai', 'google.cloud.vision', 'azure')
+
+MODULES = ('src.utils', 'src.vision._registry', 'src.media.service', 'src.telegram.telegram')
+
+def _run(code: str) -> Optional[str]:
+    """
+    Run code in a fresh interpreter, returning its output or None if it fails.
+    """
+
+    process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    return process.stdout.strip() if process.returncode == 0 else None
+
+def import_seconds(module_name: str) -> Optional[float]:
+    """
+    Median time to import a module in a fresh interpreter.
+    """
+
+    code = (
+        'import time; start = time.perf_counter(); '
+        f'import {module_name}; print(time.perf_counter() - start)')
+    timings = [_run(code=code) for _ in range(REPEATS)]
+    if None in timings:
+        return None
+    return statistics.median(float(timing) for timing in timings)
+
+def loaded_heavy_modules(module_name: str) -> str:
+    """
+    Heavy dependencies pulled in by importing a module.
+    """
+
+    code = (
+        f'import sys, {module_name}; '
+        f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+    return _run(code=code) or 'none'
+
+def warm_up_seconds(backend: VisionBackend) -> Optional[float]:
+    """
+    Time to import, create and warm up a backend in a fresh interpreter.
+    """
+
+    code = (
+        'import time; start = time.perf_counter(); '
+        'from src.vision._registry import create_vision; '
+        f'create_vision(backend={backend.value!r}).warm_up(); print(time.perf_counter() - start)')
+    timing = _run(code=code)
+    return float(timing) if timing is not None else None
+
+if __name__ == "__main__":
+    print(f'Import time (median of {REPEATS} fresh interpreters)')
+    for module_name in MODULES:
+        seconds = import_seconds(module_name=module_name)
+        timing = f'{seconds * 1000:8.1f} ms' if seconds is not None else '  failed'
+        print(f'{module_name:<24} {timing}  heavy modules loaded: {loaded_heavy_modules(module_name=module_name)}')
+    print('--------------------')
+
+    print('Backend import, creation and warm-up')
+    for backend in VisionBackend:
+        module_name, _ = VISION_BACKENDS[backend.value]
+        seconds = warm_up_seconds(backend=backend)
+        timing = f'{seconds:8.2f} s' if seconds is not None else 'unavailable (missing dependency or credentials)'
+        print(f'{backend.value:<10} {module_name:<28} {timing}')
+    print('--------------------')
@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from collections import defaultdict
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple)
+
+import numpy as np
+import cv2
+
+from src.media.loader import MediaLoader
+from src.media.roi import RegionOfInterest
+from src.media.service import preprocess_media
+from src.vision._base import BaseVision
+from src.vision._registry import create_vision
+from examples._evals import (
+    GROUND_TRUTH_DATA,
+    ocr_accuracy)
+from examples._recorded import (
+    RecordedVision,
+    RecordingVision)
+
+MEDIA_DIRECTORIES = ('./examples/images', './examples/videos')
+
+STAGES = ('load', 'preprocess', 'encode', 'ocr')
+
+PERCENTILES = (50, 90, 99)
+
+# Named pre-processing configurations, keyword arguments of preprocess_media
+PARSER_CONFIGS: Dict[str, dict] = {
+    'default': {},
+    'realign': {'realign_and_center_contours': True},
+    'roi': {'region_of_interest': RegionOfInterest()},
+    'no-contour-removal': {'remove_small_contours': False},
+}
+
+# Backends given as recorded:<path> replay a recording instead of calling the backend
+RECORDED_PREFIX = 'recorded:'
+
+# Backend answering every sample with its ground truth, runs with no recording or backend at all
+GROUND_TRUTH_BACKEND = 'ground-truth'
+
+def sample_media() -> List[str]:
+    """
+    Paths of every sample image and video.
+    """
+
+    return [
+        os.path.join(media_directory, media)
+        for media_directory in MEDIA_DIRECTORIES
+        for media in sorted(os.listdir(media_directory))]
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the peak resident set size of this process, only possible on Linux.
+    """
+
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process since the last reset, or since it started, in megabytes.
+    """
+
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    # Linux reports kilobytes, macOS bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def latency_summary(latencies: List[float]) -> dict:
+    """
+    Mean and percentile latencies in milliseconds.
+    """
+
+    if not latencies:
+        return {}
+    summary = {f'p{q}': float(np.percentile(latencies, q)) * 1000 for q in PERCENTILES}
+    summary['mean'] = float(np.mean(latencies)) * 1000
+    return summary
+
+def ground_truth_vision(media_paths: List[str], parser_config_names: List[str], latency: float) -> RecordedVision:
+    """
+    Recording of the ground truth of every sample, pre-processed with each parser configuration.
+    """
+
+    images = []
+    for media_path in media_paths:
+        name = os.path.basename(media_path)
+        if name not in GROUND_TRUTH_DATA:
+            continue
+        media_loader = MediaLoader(media_path=media_path)
+        for parser_config_name in parser_config_names:
+            image = preprocess_media(media_loader=media_loader, **PARSER_CONFIGS[parser_config_name])
+            if image is not None:
+                images.append((name, image))
+    return RecordedVision.from_ground_truth(images=images, ground_truth=GROUND_TRUTH_DATA, latency=latency)
+
+def create_backend(spec: str, media_paths: List[str], args: argparse.Namespace) -> BaseVision:
+    """
+    Create a backend from a registry name, a recorded:<path> recording or the ground truth.
+    """
+
+    if spec == GROUND_TRUTH_BACKEND:
+        return ground_truth_vision(
+            media_paths=media_paths, parser_config_names=args.parser_configs, latency=args.ground_truth_latency)
+    if spec.startswith(RECORDED_PREFIX):
+        return RecordedVision.from_file(path=spec[len(RECORDED_PREFIX):])
+    return create_vision(backend=spec)
+
+async def _run_sample(
+    media_path: str,
+    vision: BaseVision,
+    parser_config: dict,
+    timings: Dict[str, List[float]]
+) -> Optional[str]:
+    """
+    Run one sample through every stage, recording each stage's latency.
+
+    The OCR stage includes any encoding the backend does itself, the encode
+    stage times that encoding on its own.
+    """
+
+    start = time.perf_counter()
+    media_loader = await asyncio.to_thread(MediaLoader, media_path=media_path)
+    timings['load'].append(time.perf_counter() - start)
+    if media_loader.image is None:
+        return None
+
+    start = time.perf_counter()
+    image = await asyncio.to_thread(preprocess_media, media_loader=media_loader, **parser_config)
+    timings['preprocess'].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.to_thread(vision._process_image, image=image)
+    timings['encode'].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        prediction = await vision.aget_completion(image=image)
+    except Exception as e:
+        print(f'{vision.cache_key} failed on {media_path}: {e}')
+        prediction = None
+    timings['ocr'].append(time.perf_counter() - start)
+    return prediction
+
+async def run_benchmark(
+    backend: str,
+    vision: BaseVision,
+    parser_config_name: str,
+    concurrency: int,
+    media_paths: List[str]
+) -> dict:
+    """
+    Benchmark one backend and parser configuration at a given concurrency.
+    """
+
+    parser_config = PARSER_CONFIGS[parser_config_name]
+    timings: Dict[str, List[float]] = defaultdict(list)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(media_path: str) -> Optional[str]:
+        async with semaphore:
+            return await _run_sample(
+                media_path=media_path, vision=vision, parser_config=parser_config, timings=timings)
+
+    # Peak memory is per run where it can be reset, otherwise it is the process' peak so far
+    peak_rss_per_run = reset_peak_rss()
+    start = time.perf_counter()
+    predictions = await asyncio.gather(*[bounded(media_path=media_path) for media_path in media_paths])
+    elapsed = time.perf_counter() - start
+
+    # Only samples with ground truth count towards accuracy
+    named_predictions = {os.path.basename(path): prediction for path, prediction in zip(media_paths, predictions)}
+    scored = {name: prediction for name, prediction in named_predictions.items() if name in GROUND_TRUTH_DATA}
+
+    return {
+        'backend': backend,
+        'cache_key': vision.cache_key,
+        'parser_config': parser_config_name,
+        'concurrency': concurrency,
+        'samples': len(media_paths),
+        'seconds': elapsed,
+        'throughput': len(media_paths) / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+        'peak_rss_per_run': peak_rss_per_run,
+        'accuracy': ocr_accuracy(predictions=scored),
+        'stages': {stage: latency_summary(latencies=timings[stage]) for stage in STAGES},
+        'predictions': named_predictions}
+
+def _run_id(run: dict) -> Tuple[str, str, int]:
+    return run['backend'], run['parser_config'], run['concurrency']
+
+def compare_runs(runs: List[dict], baseline_runs: List[dict], tolerance: float) -> List[str]:
+    """
+    Regressions of runs against a baseline, matched by backend, parser configuration and concurrency.
+
+    Median stage latencies or throughput worse by more than tolerance, and any
+    drop in accuracy, are regressions.
+    """
+
+    baseline = {_run_id(run=run): run for run in baseline_runs}
+    regressions = []
+    for run in runs:
+        reference = baseline.get(_run_id(run=run))
+        if reference is None:
+            continue
+
+        name = '%s/%s/x%d' % _run_id(run=run)
+        if run['accuracy'] < reference['accuracy']:
+            regressions.append(f'{name} accuracy {reference["accuracy"]:.2f} -> {run["accuracy"]:.2f}')
+        if run['throughput'] < reference['throughput'] * (1 - tolerance):
+            regressions.append(
+                f'{name} throughput {reference["throughput"]:.2f} -> {run["throughput"]:.2f} samples/s')
+        for stage in STAGES:
+            current = run['stages'][stage].get('p50')
+            previous = reference['stages'][stage].get('p50')
+            if current is not None and previous and current > previous * (1 + tolerance):
+                regressions.append(f'{name} {stage} p50 {previous:.1f} -> {current:.1f} ms')
+    return regressions
+
+def print_run(run: dict) -> None:
+    stages = '  '.join(
+        f'{stage} {run["stages"][stage].get("p50", 0.0):7.1f}/{run["stages"][stage].get("p99", 0.0):7.1f}'
+        for stage in STAGES)
+    print(f'{run["backend"]:<24} {run["parser_config"]:<18} x{run["concurrency"]:<3d} '
+          f'{run["throughput"]:6.2f}/s  acc {run["accuracy"]:4.2f}  rss {run["peak_rss_mb"]:7.1f} MB  {stages}')
+
+async def main(args: argparse.Namespace) -> int:
+    media_paths = sample_media()
+    visions = {backend: create_backend(spec=backend, media_paths=media_paths, args=args) for backend in args.backends}
+
+    # Live backends are recorded so later runs can replay them offline
+    if args.record_dir:
+        os.makedirs(args.record_dir, exist_ok=True)
+        visions = {
+            backend: vision if isinstance(vision, RecordedVision) else RecordingVision(vision=vision)
+            for backend, vision in visions.items()}
+
+    print(f'{len(media_paths)} samples, stage latencies as p50/p99 ms')
+    runs = []
+    try:
+        for backend, vision in visions.items():
+            await asyncio.to_thread(vision.warm_up)
+            for parser_config_name in args.parser_configs:
+                for concurrency in args.concurrency:
+                    run = await run_benchmark(
+                        backend=backend,
+                        vision=vision,
+                        parser_config_name=parser_config_name,
+                        concurrency=concurrency,
+                        media_paths=media_paths)
+                    print_run(run=run)
+                    runs.append(run)
+    finally:
+        for backend, vision in visions.items():
+            await vision.aclose()
+            if isinstance(vision, RecordingVision):
+                vision.save(path=os.path.join(args.record_dir, f'{backend}.json'))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'opencv': cv2.__version__,
+                'runs': runs}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline_runs = json.load(f)['runs']
+        regressions = compare_runs(runs=runs, baseline_runs=baseline_runs, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark vision backends and parser configurations.')
+    parser.add_argument(
+        '--backends', nargs='+', required=True,
+        help=f'registered backend names, {RECORDED_PREFIX}<path> to replay a recording offline, '
+             f'or {GROUND_TRUTH_BACKEND} to run without any recording or backend')
+    parser.add_argument('--parser-configs', nargs='+', default=['default'], choices=list(PARSER_CONFIGS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--record-dir', help='record live backends into this directory')
+    parser.add_argument('--output', help='write the runs to this JSON file')
+    parser.add_argument('--baseline', help='compare against the runs of a previous JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    parser.add_argument(
+        '--ground-truth-latency', type=float, default=0.0, help=f'seconds each {GROUND_TRUTH_BACKEND} read takes')
+    sys.exit(asyncio.run(main(args=parser.parse_args())))
@@ -0,0 +1,77 @@
+import os
+import time
+from typing import (
+    Dict,
+    List,
+    Tuple)
+
+from cv2.typing import MatLike
+
+from src.media.loader import MediaLoader
+from src.media.parser import MediaParser
+from src.vision._models import (
+    LocalModels,
+    TrOCREngine)
+from src.vision.vision_trocr import TrOCR
+from examples._evals import (
+    GROUND_TRUTH_DATA,
+    ocr_accuracy)
+
+# Warm-up passes before timing, the first calls include graph and allocator set-up
+WARM_UP = 2
+
+def _sample_images() -> List[Tuple[str, MatLike]]:
+    """
+    Pre-process the sample images the same way as the TrOCR example.
+    """
+
+    media_directory = "./examples/images"
+
+    images = []
+    for media in sorted(os.listdir(media_directory)):
+        media_parser = MediaParser(media_loader=MediaLoader(media_path=os.path.join(media_directory, media)))
+        media_parser.remove_small_contours()
+        media_parser.realign_and_center_contours()
+        images.append((media, media_parser.image))
+    return images
+
+def benchmark_engine(model_name: LocalModels, engine: TrOCREngine, images: List[Tuple[str, MatLike]]) -> Dict:
+    """
+    Accuracy and per image latency of one TrOCR engine.
+    """
+
+    start = time.perf_counter()
+    trocr = TrOCR(model_name=model_name, engine=engine)
+    load_seconds = time.perf_counter() - start
+
+    for _ in range(WARM_UP):
+        trocr.get_completion(image=images[0][1])
+
+    predictions, latencies = {}, []
+    for media, image in images:
+        start = time.perf_counter()
+        predictions[media] = trocr.get_completion(image=image)
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        'load': load_seconds,
+        'median': latencies[len(latencies) // 2],
+        'total': sum(latencies),
+        'accuracy': ocr_accuracy(predictions=predictions),
+        'predictions': predictions}
+
+if __name__ == "__main__":
+    model_name = LocalModels.TROCR_LARGE_STR
+    images = _sample_images()
+
+    results = {engine: benchmark_engine(model_name=model_name, engine=engine, images=images) for engine in TrOCREngine}
+    baseline = results[TrOCREngine.PYTORCH]
+
+    print(f'TrOCR engines on {model_name.value}, {len(images)} samples')
+    for engine, result in results.items():
+        agreement = sum(
+            result['predictions'][media] == baseline['predictions'][media] for media in GROUND_TRUTH_DATA)
+        print(f'{engine.value:<14} load {result["load"]:6.1f} s  median {result["median"] * 1000:7.1f} ms  '
+              f'speed-up {baseline["total"] / result["total"]:5.2f}x  accuracy {result["accuracy"]:5.2f}  '
+              f'agrees with pytorch {agreement}/{len(GROUND_TRUTH_DATA)}')
@@ -0,0 +1,74 @@
+import os
+import sys
+from typing import List
+
+import numpy as np
+import cv2
+from cv2.typing import MatLike
+
+from src.media.loader import MediaLoader
+from src.media.parser import (
+    ContourRemoval,
+    MediaParser)
+
+MEDIA_DIRECTORY = './examples/images'
+
+def _ring_mask(media_parser: MediaParser, image: MatLike) -> MatLike:
+    """
+    Pixels of the enclosed black components only the components mode fills.
+
+    These have fewer pixels than the area threshold but a bounding box at
+    least as large, e.g. thin rings, which the contour loop measures by
+    everything they enclose.
+    """
+
+    height, width = image.shape[:2]
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(cv2.bitwise_not(image), connectivity=4)
+    left, top, box_width, box_height, area = stats.T
+    enclosed = (left > 0) & (top > 0) & (left + box_width < width) & (top + box_height < height)
+    enclosed[0] = False
+
+    max_area = media_parser._contour_area_threshold * media_parser._image_area
+    rings = enclosed & (area < max_area) & (box_width * box_height >= max_area)
+    return rings[labels]
+
+def check_media(media_loader: MediaLoader, **parser_options) -> List[str]:
+    """
+    Compare both removal modes on one image, returning any mismatches.
+    """
+
+    parsers = {
+        mode: MediaParser(media_loader=media_loader, contour_removal=mode, **parser_options)
+        for mode in ContourRemoval}
+    image = parsers[ContourRemoval.CONTOURS].image.copy()
+    for media_parser in parsers.values():
+        media_parser.remove_small_contours()
+
+    contours = parsers[ContourRemoval.CONTOURS].image
+    components = parsers[ContourRemoval.COMPONENTS].image
+    rings = _ring_mask(media_parser=parsers[ContourRemoval.COMPONENTS], image=image)
+
+    problems = []
+    if np.any(components < contours):
+        problems.append('components mode kept pixels the contour loop filled')
+    if not np.array_equal(components[~rings], contours[~rings]):
+        problems.append('modes differ outside of the components measured by pixel count alone')
+    return problems
+
+def main() -> int:
+    failures = 0
+    for media in sorted(os.listdir(MEDIA_DIRECTORY)):
+        media_loader = MediaLoader(media_path=os.path.join(MEDIA_DIRECTORY, media))
+
+        # With the contour count threshold disabled removal runs on every image
+        for parser_options in ({}, {'contour_area_number_threshold': 0}):
+            problems = check_media(media_loader=media_loader, **parser_options)
+            for problem in problems:
+                print(f'{media} {parser_options}: {problem}')
+            failures += len(problems)
+
+    print('Contour removal modes agree' if not failures else f'{failures} contour removal mismatches')
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import os
+
+from src.media.loader import MediaLoader
+from src.media.parser import MediaParser
+from src.vision.vision_cascade import (
+    CascadeStage,
+    CascadeVision)
+from src.vision.vision_easyocr import EasyOCR
+from src.vision.vision_openai import OpenAIVision
+from examples._evals import ocr_evaluation
+
+def example_ocr() -> str:
+    """
+    Example of how a cascade of a local engine and a paid API can be used.
+    """
+
+    # Easy OCR answers first, OpenAI only sees images it is not confident about
+    cascade_vision = CascadeVision(
+        stages=[
+            CascadeStage(vision=EasyOCR(), min_confidence=0.6),
+            CascadeStage(vision=OpenAIVision())])
+
+    # Retrieve all sample media
+    media_directory = "./examples/images"
+
+    sample_media = os.listdir(media_directory)
+
+    for media in sample_media:
+        media_path = os.path.join(media_directory, media)
+
+        # Instantiate media parser
+        media_parser = MediaParser(
+            media_loader=MediaLoader(media_path=media_path)
+        )
+        media_parser.remove_small_contours()
+
+        response = cascade_vision.get_completion(image=media_parser.image)
+
+        # OCR evaluation
+        ocr_evaluation(image_name=media, prediction=response)
+
+    # Per stage latency and escalation rate
+    for stage, stats in zip(['easy ocr', 'openai'], cascade_vision.stats):
+        print(f'{stage:<10} calls {stats.calls:3d}  escalation rate {stats.escalation_rate:5.2f}  '
+              f'median latency {stats.median_latency * 1000:8.1f} ms')
+
+if __name__ == "__main__":
+    example_ocr()
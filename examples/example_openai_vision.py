@@ -27,10 +27,7 @@ def example_ocr() -> str:
         )
         media_parser.remove_small_contours()
 
-        response = openai.get_completion(
-            prompt='What are the largest characters in this image? Only output the text in the image.',
-            image=media_parser.image
-        )
+        response = openai.get_completion(image=media_parser.image)
         
         # OCR evaluation
         ocr_evaluation(image_name=media, prediction=response)
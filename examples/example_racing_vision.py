@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+from src.media.loader import MediaLoader
+from src.media.parser import MediaParser
+from src.vision.vision_google import GoogleVision
+from src.vision.vision_openai import OpenAIVision
+from src.vision.vision_racing import RacingVision
+from examples._evals import ocr_evaluation
+
+async def example_ocr() -> str:
+    """
+    Example of how hedged requests across Google and OpenAI can be used.
+    """
+
+    # OpenAI is asked first, Google too once OpenAI runs past its p95 latency
+    racing_vision = RacingVision(backends=[OpenAIVision(), GoogleVision()])
+
+    # Retrieve all sample media
+    media_directory = "./examples/images"
+
+    sample_media = os.listdir(media_directory)
+
+    for media in sample_media:
+        media_path = os.path.join(media_directory, media)
+
+        # Instantiate media parser
+        media_parser = MediaParser(
+            media_loader=MediaLoader(media_path=media_path)
+        )
+        media_parser.remove_small_contours()
+
+        response = await racing_vision.aget_completion(image=media_parser.image)
+
+        # OCR evaluation
+        ocr_evaluation(image_name=media, prediction=response)
+
+    # Per backend wins and tail latency
+    for backend, stats in zip(['openai', 'google'], racing_vision.stats):
+        p95 = stats.quantile(q=0.95)
+        print(f'{backend:<8} requests {stats.requests:3d}  wins {stats.wins:3d}  '
+              f'cancelled {stats.cancellations:3d}  p95 {p95 if p95 is not None else float("nan"):6.2f} s')
+
+    await racing_vision.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(example_ocr())
@@ -0,0 +1,295 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    as_completed)
+from dataclasses import (
+    dataclass,
+    field)
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple)
+
+from cv2.typing import MatLike
+
+from src.media.loader import MediaLoader
+from src.media.parser import (
+    CORE_STEPS,
+    MediaParser,
+    standard_steps)
+from src.vision._base import BaseVision
+from src.vision._models import VisionBackend
+from src.vision._registry import create_vision
+from src.utils import parse_ocr_response
+from examples._evals import GROUND_TRUTH_DATA
+
+MEDIA_DIRECTORY = './examples/images'
+
+# Core step outputs kept per worker, configurations differing only in later steps reuse them
+CORE_CACHE_SIZE = 512
+
+@dataclass
+class SearchParameter:
+    """
+    Range or choices a parser option is sampled from.
+    """
+
+    low: float = 0.0
+    high: float = 0.0
+    integer: bool = False
+    log: bool = False
+    choices: Tuple = ()
+
+    def sample(self, rng: random.Random):
+        if self.choices:
+            return rng.choice(self.choices)
+        if self.log:
+            value = math.exp(rng.uniform(math.log(self.low), math.log(self.high)))
+        else:
+            value = rng.uniform(self.low, self.high)
+        return int(round(value)) if self.integer else value
+
+# Options that only change the core steps, the rest only change the optional steps
+CORE_SEARCH_SPACE: Dict[str, SearchParameter] = {
+    'pixel_threshold': SearchParameter(low=3000, high=50000, integer=True, log=True),
+    'inversion_threshold': SearchParameter(low=100, high=190, integer=True),
+    'light_grey_pixel_threshold': SearchParameter(low=0.1, high=0.6),
+    'black_character_threshold': SearchParameter(low=100, high=170, integer=True),
+    'dilation_iterations': SearchParameter(low=3, high=12, integer=True),
+    'clahe_clip_limit': SearchParameter(low=1.0, high=6.0),
+    'blur_kernel_size': SearchParameter(choices=(1, 3, 5)),
+}
+
+CONTOUR_SEARCH_SPACE: Dict[str, SearchParameter] = {
+    'contour_area_threshold': SearchParameter(low=0.001, high=0.03, log=True),
+    'contour_area_number_threshold': SearchParameter(low=10, high=300, integer=True, log=True),
+}
+
+REALIGNMENT_SEARCH_SPACE: Dict[str, SearchParameter] = {
+    'contour_alignment_threshold': SearchParameter(low=0.05, high=0.3),
+    'contour_alignment_deviation': SearchParameter(low=0.75, high=3.0),
+}
+
+@dataclass
+class Trial:
+    """
+    One sampled parser configuration and its parsed prediction for each image scored so far.
+    """
+
+    trial_id: int
+    parser_options: dict
+    predictions: Dict[str, Optional[str]] = field(default_factory=dict)
+
+    def accuracy(self, media: List[str]) -> float:
+        return sum(self.predictions[name] == GROUND_TRUTH_DATA[name] for name in media) / len(media)
+
+# Per worker process state, filled by _init_worker
+_LOADED_MEDIA: Dict[str, MatLike] = {}
+_CORE_CACHE: 'OrderedDict[Tuple, MatLike]' = OrderedDict()
+
+def _init_worker(media_directory: str, media: List[str]) -> None:
+    """
+    Decode every sample once per worker.
+    """
+
+    for name in media:
+        _LOADED_MEDIA[name] = MediaLoader(media_path=os.path.join(media_directory, name)).image
+
+def _core_image(name: str, core_options: dict) -> MatLike:
+    """
+    Output of the core steps for an image, cached by the options that affect them.
+    """
+
+    key = (name, tuple(sorted(core_options.items())))
+    if key in _CORE_CACHE:
+        _CORE_CACHE.move_to_end(key)
+        return _CORE_CACHE[key]
+
+    image = MediaParser(media_loader=MediaLoader(image=_LOADED_MEDIA[name]), **core_options).image
+    _CORE_CACHE[key] = image
+    if len(_CORE_CACHE) > CORE_CACHE_SIZE:
+        _CORE_CACHE.popitem(last=False)
+    return image
+
+def _preprocess_trial(trial_id: int, parser_options: dict, media: List[str]) -> Tuple[int, Dict[str, MatLike]]:
+    """
+    Worker entry point, pre-process images with a trial's options.
+    """
+
+    options = dict(parser_options)
+    steps = options.pop('steps')
+    core_options = {name: value for name, value in options.items() if name in CORE_SEARCH_SPACE}
+    later_steps = [step for step in steps if step not in CORE_STEPS]
+
+    images = {}
+    for name in media:
+        image = _core_image(name=name, core_options=core_options)
+
+        # Later steps copy the cached core image before writing to it
+        if later_steps:
+            image = MediaParser(media_loader=MediaLoader(image=image), steps=later_steps, **options).image
+        images[name] = image
+    return trial_id, images
+
+class TrialScorer:
+    """
+    Reads pre-processed images with a local backend, caching results by image content.
+
+    Configurations often produce identical images, which are only read once.
+    """
+    def __init__(self, vision: BaseVision):
+        self._vision = vision
+        self._results: Dict[str, Optional[str]] = {}
+        self.reads = 0
+        self.cache_hits = 0
+
+    def score(self, trial: Trial, images: Dict[str, MatLike]) -> None:
+        digests = {name: hashlib.blake2b(image.tobytes() + str(image.shape).encode(), digest_size=16).hexdigest()
+                   for name, image in images.items()}
+        missing = {digest: images[name] for name, digest in digests.items() if digest not in self._results}
+        self.cache_hits += len(images) - len(missing)
+
+        if missing:
+            responses = self._vision.get_completions(images=list(missing.values()))
+            self.reads += len(missing)
+            for digest, response in zip(missing, responses):
+                self._results[digest] = parse_ocr_response(response=response) if response else None
+
+        for name, digest in digests.items():
+            trial.predictions[name] = self._results[digest]
+
+def sample_trials(count: int, steps: Tuple[str, ...], seed: int) -> List[Trial]:
+    """
+    The current defaults followed by randomly sampled configurations.
+    """
+
+    search_space = dict(CORE_SEARCH_SPACE)
+    if 'remove_small_contours' in steps:
+        search_space.update(CONTOUR_SEARCH_SPACE)
+    if 'realign_and_center_contours' in steps:
+        search_space.update(REALIGNMENT_SEARCH_SPACE)
+
+    rng = random.Random(seed)
+    trials = [Trial(trial_id=0, parser_options={'steps': list(steps)})]
+    for trial_id in range(1, count):
+        parser_options = {name: parameter.sample(rng=rng) for name, parameter in search_space.items()}
+        parser_options['steps'] = list(steps)
+        trials.append(Trial(trial_id=trial_id, parser_options=parser_options))
+    return trials
+
+def rung_sizes(media_count: int, reduction_factor: int, min_media: int) -> List[int]:
+    """
+    Number of images scored at each rung of successive halving, ending with all of them.
+    """
+
+    sizes = [media_count]
+    while sizes[0] // reduction_factor >= min_media:
+        sizes.insert(0, sizes[0] // reduction_factor)
+    return sizes
+
+def successive_halving(
+    trials: List[Trial],
+    media: List[str],
+    scorer: TrialScorer,
+    executor: ProcessPoolExecutor,
+    reduction_factor: int,
+    min_media: int
+) -> List[Trial]:
+    """
+    Score every trial on a few images, then only the best share of them on more, until all are scored.
+    """
+
+    survivors = trials
+    sizes = rung_sizes(media_count=len(media), reduction_factor=reduction_factor, min_media=min_media)
+    for rung, size in enumerate(sizes):
+        rung_media = media[:size]
+
+        # Trials promoted from the previous rung only pre-process the images they have not seen
+        futures = [
+            executor.submit(
+                _preprocess_trial,
+                trial.trial_id,
+                trial.parser_options,
+                [name for name in rung_media if name not in trial.predictions])
+            for trial in survivors]
+        by_id = {trial.trial_id: trial for trial in survivors}
+        for future in as_completed(futures):
+            trial_id, images = future.result()
+            scorer.score(trial=by_id[trial_id], images=images)
+
+        # Ties keep the earlier trial, so the defaults only lose to a strictly better configuration
+        survivors = sorted(survivors, key=lambda trial: (-trial.accuracy(media=rung_media), trial.trial_id))
+        print(f'Rung {rung}: {len(survivors):3d} trials on {size:2d} images, '
+              f'best accuracy {survivors[0].accuracy(media=rung_media):.2f}')
+        if rung < len(sizes) - 1:
+            survivors = survivors[:max(1, math.ceil(len(survivors) / reduction_factor))]
+    return survivors
+
+def main(args: argparse.Namespace) -> None:
+    media = sorted(name for name in os.listdir(MEDIA_DIRECTORY) if name in GROUND_TRUTH_DATA)
+    random.Random(args.seed).shuffle(media)
+
+    steps = standard_steps(
+        remove_small_contours=not args.keep_small_contours,
+        realign_and_center_contours=args.realign,
+        crop_to_region_of_interest=args.crop)
+    trials = sample_trials(count=args.trials, steps=steps, seed=args.seed)
+
+    vision = create_vision(backend=args.backend)
+    vision.warm_up()
+    scorer = TrialScorer(vision=vision)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(MEDIA_DIRECTORY, media)
+    ) as executor:
+        ranked = successive_halving(
+            trials=trials,
+            media=media,
+            scorer=scorer,
+            executor=executor,
+            reduction_factor=args.reduction_factor,
+            min_media=args.min_media)
+    elapsed = time.perf_counter() - start
+
+    best = ranked[0]
+    defaults = trials[0]
+    best_accuracy = best.accuracy(media=media)
+    default_accuracy = defaults.accuracy(media=media) if len(defaults.predictions) == len(media) else None
+
+    print(f'{len(trials)} trials in {elapsed:.1f} s, {scorer.reads} images read, {scorer.cache_hits} read from cache')
+    print(f'Best trial {best.trial_id}: accuracy {best_accuracy:.2f}'
+          + (f', defaults {default_accuracy:.2f}' if default_accuracy is not None else ', defaults stopped early'))
+
+    profile = {
+        'backend': vision.cache_key,
+        'accuracy': best_accuracy,
+        'default_accuracy': default_accuracy,
+        'trials': len(trials),
+        'seed': args.seed,
+        'parser_options': best.parser_options}
+    with open(args.output, 'w') as f:
+        json.dump(profile, f, indent=2)
+    print(f'Profile written to {args.output}, load it with MediaParser.from_profile or backend_parser_options')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Search MediaParser options against the ground truth data.')
+    parser.add_argument('--backend', default=VisionBackend.EASYOCR.value, help='local backend used to score')
+    parser.add_argument('--trials', type=int, default=81)
+    parser.add_argument('--reduction-factor', type=int, default=3, help='share of trials kept at each rung')
+    parser.add_argument('--min-media', type=int, default=3, help='images scored at the first rung, at least')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-small-contours', action='store_true')
+    parser.add_argument('--realign', action='store_true')
+    parser.add_argument('--crop', action='store_true')
+    parser.add_argument('--output', default='./parser_profile.json')
+    main(args=parser.parse_args())
@@ -1,33 +1,91 @@
 import asyncio
 
-from src.vision.vision_openai import OpenAIVision
+from src.media.dedup import NearDuplicateIndex
+from src.media.service import PreprocessingService
+from src.media.roi import RegionOfInterest
+from src.vision._cache import OCRCache
+from src.vision._models import VisionBackend
+from src.vision._registry import create_vision
+from src.telegram.metrics import (
+    Metrics,
+    MetricsFileExporter,
+    MetricsServer)
 from src.telegram.telegram import TelegramOCR
 from src.utils import (
+    data_file_path,
     load_api_info,
+    load_config,
     source_data_directories
 )
 
 # Load in telegram api info
 telegram_info = load_api_info()
 
+async def stream_with_metrics(telegram: TelegramOCR, exporters: list) -> None:
+    """
+    Stream every channel while the metrics exporters run.
+    """
+
+    for exporter in exporters:
+        await exporter.start()
+    try:
+        await telegram.stream_channels(channels=telegram_info.channels)
+    finally:
+        for exporter in exporters:
+            await exporter.stop()
+
 if __name__ == "__main__":
 
     # Generate directories
-    source_data_directories(channel=telegram_info.channel)
+    for channel_config in telegram_info.channels:
+        source_data_directories(channel=channel_config.channel)
+
+    # Channels without a backend of their own use the default one
+    config = load_config()
+    vision_backend = config.get('vision_backend', VisionBackend.OPENAI.value)
+    vision = create_vision(backend=vision_backend)
+
+    # Results of reposted images are reused across restarts unless the cache is disabled
+    ocr_cache = None
+    if config.get('ocr_cache', True):
+        ocr_cache = OCRCache(
+            database_path=data_file_path(file_name='ocr_cache.sqlite3'),
+            ttl=config.get('ocr_cache_ttl_days', 7) * 24 * 60 * 60)
+
+    # Pre-processing runs in a process pool when a worker count is configured, otherwise in a thread
+    preprocessing_service = None
+    if config.get('preprocessing_workers'):
+        preprocessing_service = PreprocessingService(max_workers=config['preprocessing_workers'])
+
+    # Instrumentation is only enabled when an export is configured
+    exporters = []
+    metrics = None
+    if config.get('metrics_port') or config.get('metrics_file') or config.get('trace_file'):
+        metrics = Metrics(trace_path=config.get('trace_file'))
+        if config.get('metrics_port'):
+            exporters.append(MetricsServer(metrics=metrics, port=config['metrics_port']))
+        if config.get('metrics_file'):
+            exporters.append(MetricsFileExporter(metrics=metrics, path=config['metrics_file']))
 
     # Telegram instantiation
     telegram = TelegramOCR(
         telegram_app_id=telegram_info.app_id,
         telegram_app_hash=telegram_info.app_hash,
         telegram_phone_number=telegram_info.phone_number,
-        openai_vision=OpenAIVision()
+        vision=vision,
+        channel_visions={vision_backend: vision},
+        preprocessing_service=preprocessing_service,
+        ocr_cache=ocr_cache,
+        near_duplicate_index=NearDuplicateIndex(
+            database_path=data_file_path(file_name='near_duplicates.sqlite3')),
+        # Cropping costs more than the encode it saves on most screenshots, so it is opt-in
+        region_of_interest=RegionOfInterest() if config.get('crop_to_text_region', False) else None,
+        metrics=metrics
     )
 
-    # Download any images sent by account in question
-    asyncio.run(
-        telegram.stream_images_in_messages(
-            telegram_channel=telegram_info.channel,
-            telegram_channel_to_send=telegram_info.channel_to_send,
-            telegram_channel_keywords=telegram_info.channel_keywords
-        )
-    )
\ No newline at end of file
+    # Download any images sent by accounts in question, all channels through one client
+    try:
+        asyncio.run(stream_with_metrics(telegram=telegram, exporters=exporters))
+    finally:
+        if preprocessing_service is not None:
+            preprocessing_service.close()
\ No newline at end of file
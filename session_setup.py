@@ -1,6 +1,7 @@
 import asyncio
 
-from src.vision.vision_openai import OpenAIVision
+from src.vision._models import VisionBackend
+from src.vision._registry import create_vision
 from src.telegram.telegram import TelegramOCR
 from src.utils import load_api_info
 
@@ -12,7 +13,7 @@ if __name__ == "__main__":
         telegram_app_id=telegram_info.app_id,
         telegram_app_hash=telegram_info.app_hash,
         telegram_phone_number=telegram_info.phone_number,
-        openai_vision=OpenAIVision()
+        vision=create_vision(backend=VisionBackend.OPENAI)
     )
 
     # Set-up session for future use
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import threading
+from itertools import combinations
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple)
+
+from src.media.hashing import hamming_distance
+
+HASH_BITS = 64
+
+class NearDuplicateIndex:
+    """
+    Multi-index hash table over 64 bit perceptual hashes.
+
+    Each hash is split into chunks with one lookup table per chunk. If two
+    hashes are within max_distance bits, by the pigeonhole principle at least
+    one chunk differs in at most max_distance // chunks bits, so a lookup only
+    probes the chunk neighbourhoods within that radius and verifies the few
+    candidates it finds. Entries are persisted to SQLite when a path is given.
+    """
+    def __init__(
+        self,
+        max_distance: int = 4,
+        chunks: int = 4,
+        database_path: Optional[str] = None
+    ):
+        if HASH_BITS % chunks:
+            raise ValueError(f'chunks must divide {HASH_BITS}')
+
+        self._max_distance = max_distance
+        self._chunks = chunks
+        self._chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self._chunk_bits) - 1
+        self._database_path = database_path
+
+        # Bit flip masks of every chunk neighbour within the search radius
+        radius = self._max_distance // self._chunks
+        self._neighbour_masks = [
+            sum(1 << bit for bit in bits)
+            for distance in range(radius + 1)
+            for bits in combinations(range(self._chunk_bits), distance)]
+
+        self._hashes: List[int] = []
+        self._results: List[str] = []
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(self._chunks)]
+        self._lock = threading.Lock()
+
+        # Writes to the store hold their own lock, so lookups never wait on a commit
+        self._database_lock = threading.Lock()
+
+        self._connection: Optional[sqlite3.Connection] = None
+        if self._database_path is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _split(self, image_hash: int) -> List[int]:
+        """
+        Split a hash into its chunk values.
+        """
+
+        return [
+            (image_hash >> (index * self._chunk_bits)) & self._chunk_mask
+            for index in range(self._chunks)]
+
+    def _insert(self, image_hash: int, result: str) -> None:
+        """
+        Add a hash to the in-memory tables.
+        """
+
+        position = len(self._hashes)
+        self._hashes.append(image_hash)
+        self._results.append(result)
+        for table, chunk in zip(self._tables, self._split(image_hash=image_hash)):
+            table.setdefault(chunk, []).append(position)
+
+    def _load(self) -> None:
+        """
+        Open the SQLite store and load every stored hash into memory.
+        """
+
+        os.makedirs(os.path.dirname(self._database_path) or '.', exist_ok=True)
+        self._connection = sqlite3.connect(self._database_path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS near_duplicates (hash TEXT PRIMARY KEY, result TEXT NOT NULL)')
+        self._connection.commit()
+
+        for image_hash, result in self._connection.execute('SELECT hash, result FROM near_duplicates'):
+            self._insert(image_hash=int(image_hash, 16), result=result)
+
+    def lookup(self, image_hash: int) -> Optional[Tuple[str, int]]:
+        """
+        Find the closest stored hash within max_distance, returning its result and distance.
+        """
+
+        best: Optional[Tuple[str, int]] = None
+        seen = set()
+
+        with self._lock:
+            for table, chunk in zip(self._tables, self._split(image_hash=image_hash)):
+                for mask in self._neighbour_masks:
+                    for position in table.get(chunk ^ mask, ()):
+                        if position in seen:
+                            continue
+                        seen.add(position)
+
+                        distance = hamming_distance(image_hash, self._hashes[position])
+                        if distance <= self._max_distance and (best is None or distance < best[1]):
+                            best = (self._results[position], distance)
+                            if distance == 0:
+                                return best
+        return best
+
+    def add(self, image_hash: int, result: str) -> None:
+        """
+        Store the result for a hash, persisting it when a database is configured.
+
+        Persisting commits to SQLite, so async callers run this in a thread.
+        """
+
+        with self._lock:
+            self._insert(image_hash=image_hash, result=result)
+
+        with self._database_lock:
+            if self._connection is not None:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO near_duplicates (hash, result) VALUES (?, ?)',
+                    (f'{image_hash:016x}', result))
+                self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Close the on-disk store.
+        """
+
+        with self._database_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
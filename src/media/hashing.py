@@ -0,0 +1,50 @@
+import numpy as np
+import cv2
+from cv2.typing import MatLike
+
+HASH_SIZE = 8
+PHASH_FACTOR = 4
+
+def _to_grey(image: MatLike) -> MatLike:
+    """
+    Return a single channel view of the image.
+    """
+
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    """
+    Pack a boolean array into a single integer.
+    """
+
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+def phash(image: MatLike, hash_size: int = HASH_SIZE) -> int:
+    """
+    Perceptual hash, compares low frequency DCT coefficients against their median.
+    """
+
+    size = hash_size * PHASH_FACTOR
+    resized = cv2.resize(_to_grey(image), (size, size), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(resized.astype(np.float32))[:hash_size, :hash_size]
+
+    # Skip the DC coefficient when calculating the median
+    median = np.median(dct.ravel()[1:])
+    return _bits_to_int(dct > median)
+
+def dhash(image: MatLike, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash, compares the brightness of horizontally adjacent pixels.
+    """
+
+    resized = cv2.resize(_to_grey(image), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(resized[:, 1:] > resized[:, :-1])
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """
+    Number of differing bits between two hashes.
+    """
+
+    return (hash_a ^ hash_b).bit_count()
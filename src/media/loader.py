@@ -1,17 +1,90 @@
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import (
+    List,
+    Optional,
+    Tuple)
+
+import numpy as np
 import cv2
 from cv2.typing import MatLike
 
 FRAME_TIME = 0
 
+# Memory backed directory used when a video stream cannot be read from a buffer
+SHARED_MEMORY_DIRECTORY = '/dev/shm'
+
+# Width of the thumbnails used to score sampled video frames
+SCORE_THUMBNAIL_WIDTH = 160
+
+@dataclass
+class VideoSampling:
+    """
+    How frames are sampled from a video to find the one showing the text.
+
+    Every frame_stride-th frame is decoded, up to frame_budget frames. With a
+    scene_change_threshold only frames that differ from the previous sample
+    by that mean absolute intensity are scored. The top_k highest scoring
+    frames are kept, best first.
+    """
+
+    frame_stride: int = 10
+    frame_budget: int = 12
+    scene_change_threshold: Optional[float] = None
+    top_k: int = 1
+
+def _frame_thumbnail(frame: MatLike) -> MatLike:
+    """
+    Small greyscale version of a frame for cheap statistics.
+    """
+
+    height, width = frame.shape[:2]
+    thumbnail_height = max(1, height * SCORE_THUMBNAIL_WIDTH // width)
+    thumbnail = cv2.resize(
+        frame, (SCORE_THUMBNAIL_WIDTH, thumbnail_height), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+
+def _frame_text_score(thumbnail: MatLike) -> float:
+    """
+    Score how likely a frame shows large text, from edge density and contrast.
+    """
+
+    edges = cv2.Canny(thumbnail, 100, 200)
+    edge_density = cv2.countNonZero(edges) / edges.size
+    _, std = cv2.meanStdDev(thumbnail)
+    return edge_density * float(std[0][0]) / 128
+
 class MediaLoader:
     """
     Load in .jpg/.png/.mp4 file and standardize to image.
+
+    Media can also be passed as an in-memory byte buffer through media_bytes,
+    mp4 buffers are recognized from their container header, or as an already
+    decoded image. For videos, frames holds the top sampled frames, best first.
     """
-    def __init__(self, media_path: str):
+    def __init__(
+        self,
+        media_path: Optional[str] = None,
+        media_bytes: Optional[bytes] = None,
+        image: Optional[MatLike] = None,
+        video_sampling: Optional[VideoSampling] = None
+    ):
         self._media_path = media_path
-        self._media_path_lower = media_path.lower()
+        self._media_path_lower = (media_path or '').lower()
+        self._media_bytes = media_bytes
+        self._video_sampling = video_sampling or VideoSampling()
+        self.frames: List[MatLike] = []
 
-        if self._media_path_lower.endswith('.mp4'):
+        if image is not None:
+            self.image = image
+        elif self._media_bytes is not None:
+            if self._is_mp4_buffer():
+                self.image = self._convert_mp4_to_jpg()
+            else:
+                self.image = self._decode_image()
+        elif self._media_path_lower.endswith('.mp4'):
             self.image = self._convert_mp4_to_jpg()
         elif (self._media_path_lower.endswith('.jpg') or 
               self._media_path_lower.endswith('.png')):
@@ -20,6 +93,9 @@ class MediaLoader:
             self.image = None
             print('Extension of image path is not recognized...')
 
+        if not self.frames and self.image is not None:
+            self.frames = [self.image]
+
     def _load_image(self) -> MatLike:
         """
         Load image as MatLike object.
@@ -27,26 +103,111 @@ class MediaLoader:
 
         return cv2.imread(self._media_path)
 
-    def _convert_mp4_to_jpg(self) -> MatLike:
+    def _is_mp4_buffer(self) -> bool:
         """
-        Convert mp4 to jpg for ease in image processing.
+        Check for the ftyp box that starts every mp4 container.
         """
-        
-        cap = cv2.VideoCapture(self._media_path)
 
-        # Check if the video opened successfully
-        if not cap.isOpened():
-            print("Error: Could not open video.")
+        return self._media_bytes[4:8] == b'ftyp'
+
+    def _decode_image(self) -> Optional[MatLike]:
+        """
+        Decode an encoded image buffer as MatLike object.
+        """
 
-        # Get frames info
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_number = int(FRAME_TIME * fps)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        # Zero-copy view over the downloaded bytes
+        buffer = np.frombuffer(self._media_bytes, dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
 
-        # Read the frame
-        ret, image = cap.read()
+        if image is None:
+            print('Error: Could not decode image buffer.')
+        return image
 
-        # Check if the frame was read successfully
-        if ret:
+    def _open_buffer_capture(self) -> cv2.VideoCapture:
+        """
+        Open a video capture over the in-memory buffer.
+        """
+
+        self._video_stream = None
+        try:
+            # Stream readers need an explicit backend, supported from OpenCV 4.11,
+            # the stream is kept referenced as the capture does not own it
+            self._video_stream = io.BytesIO(self._media_bytes)
+            return cv2.VideoCapture(self._video_stream, cv2.CAP_FFMPEG, [])
+        except (cv2.error, SystemError, TypeError):
+            pass
+
+        # Older builds read from a memory backed file, unlinked as soon as it is open
+        directory = SHARED_MEMORY_DIRECTORY if os.path.isdir(SHARED_MEMORY_DIRECTORY) else None
+        with tempfile.NamedTemporaryFile(suffix='.mp4', dir=directory) as temp_file:
+            temp_file.write(self._media_bytes)
+            temp_file.flush()
+            return cv2.VideoCapture(temp_file.name)
+
+    def _sample_frames(self, cap: cv2.VideoCapture) -> List[Tuple[float, MatLike]]:
+        """
+        Decode sampled frames within the frame budget, returning scored candidates.
+        """
+
+        sampling = self._video_sampling
+        candidates = []
+        previous_thumbnail = None
+        frame_index = 0
+        sampled = 0
+
+        # Skipped frames are only grabbed, which avoids retrieving and converting them
+        while sampled < sampling.frame_budget and cap.grab():
+            if frame_index % max(1, sampling.frame_stride) == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                sampled += 1
+                thumbnail = _frame_thumbnail(frame=frame)
+
+                is_scene_change = (
+                    previous_thumbnail is None or
+                    sampling.scene_change_threshold is None or
+                    cv2.norm(thumbnail, previous_thumbnail, cv2.NORM_L1) / thumbnail.size
+                    > sampling.scene_change_threshold)
+                if is_scene_change:
+                    candidates.append((_frame_text_score(thumbnail=thumbnail), frame))
+                previous_thumbnail = thumbnail
+            frame_index += 1
+
+        return candidates
+
+    def _convert_mp4_to_jpg(self) -> Optional[MatLike]:
+        """
+        Convert mp4 to jpg for ease in image processing, picking the frame most likely to show text.
+        """
+        
+        if self._media_bytes is not None:
+            cap = self._open_buffer_capture()
+        else:
+            cap = cv2.VideoCapture(self._media_path)
+
+        try:
+            # Check if the video opened successfully
+            if not cap.isOpened():
+                print("Error: Could not open video.")
+                return None
+
+            # Get frames info
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_number = int(FRAME_TIME * fps)
+            if frame_number:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+            candidates = self._sample_frames(cap=cap)
+        finally:
             cap.release()
-            return image
\ No newline at end of file
+            self._video_stream = None
+
+        # Check if any frame was read successfully
+        if not candidates:
+            print("Error: Could not read frames from video.")
+            return None
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        self.frames = [frame for _, frame in candidates[:max(1, self._video_sampling.top_k)]]
+        return self.frames[0]
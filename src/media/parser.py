@@ -1,4 +1,14 @@
-from typing import Tuple
+import json
+import math
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import (
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+    Union)
 
 import numpy as np
 import cv2
@@ -6,13 +16,96 @@ from cv2.typing import MatLike
 from numpy.typing import NDArray
 
 from src.media.loader import MediaLoader
+from src.media.roi import crop_to_text_region
 
 WHITE_THRESHOLD = (240, 240, 240)
 LIGHT_GREY_THRESHOLD = (150, 150, 150)
 
+# Grey conversion weights of the blue, green and red channels
+GREY_WEIGHTS = (0.114, 0.587, 0.299)
+
+# Core pre-processing steps in their default order, steps that do not apply to an image are skipped
+CORE_STEPS = ('contrast', 'grey', 'blur', 'threshold', 'opening', 'inversion', 'erosion')
+
+# Pre-processing step name to MediaParser method, the optional steps are also public methods
+STEP_METHODS = {
+    'contrast': '_contrast_step',
+    'grey': '_grey_step',
+    'blur': '_blur_step',
+    'threshold': '_threshold_step',
+    'opening': '_opening_step',
+    'inversion': '_inversion_step',
+    'erosion': '_erosion_step',
+    'remove_small_contours': 'remove_small_contours',
+    'realign_and_center_contours': 'realign_and_center_contours',
+    'crop_to_region_of_interest': 'crop_to_region_of_interest',
+}
+
+def standard_steps(
+    remove_small_contours: bool = True,
+    realign_and_center_contours: bool = False,
+    crop_to_region_of_interest: bool = False
+) -> Tuple[str, ...]:
+    """
+    Core steps followed by the optional steps asked for.
+    """
+
+    optional_steps = (
+        ('remove_small_contours',) * remove_small_contours +
+        ('realign_and_center_contours',) * realign_and_center_contours +
+        ('crop_to_region_of_interest',) * crop_to_region_of_interest)
+    return CORE_STEPS + optional_steps
+
+def load_parser_profile(profile_path: str) -> dict:
+    """
+    Load the parser options saved in a tuned profile.
+    """
+
+    with open(profile_path, 'r') as f:
+        return json.load(f)['parser_options']
+
+class ContourRemoval(Enum):
+    """
+    Implementations of small contour removal.
+    """
+
+    # Fill every small contour found by findContours, one draw call each
+    CONTOURS = 'contours'
+
+    # Label enclosed background regions once and fill those with few pixels together,
+    # only pays off over the per contour loop on screenshots with many thousands of specks
+    COMPONENTS = 'components'
+
+@dataclass
+class ImageStatistics:
+    """
+    Image statistics gathered in a single pass over the loaded image.
+
+    The histogram counts the minimum channel value of each pixel, a pixel is at
+    least as bright as a threshold in every channel exactly when its minimum is.
+    """
+
+    white_pixel_percentage: float
+    light_grey_pixel_percentage: float
+    mean_intensity: float
+    histogram: NDArray
+
+def _histogram_percentage(histogram: NDArray, threshold: tuple) -> float:
+    """
+    Percentage of pixels at or above a threshold, which is the same for every channel.
+    """
+
+    return float(histogram[threshold[0]:].sum() / histogram.sum())
+
 class MediaParser:
     """
     Image pre-processing methods for OCR analysis.
+
+    Pre-processing runs as a sequence of named steps, by default CORE_STEPS.
+    Steps can be reordered, dropped or extended with the optional steps in
+    STEP_METHODS, with keyword arguments per step in step_options. Steps that
+    do not apply to an image, e.g. the opening on dark characters, return at
+    once. The time spent in each step that ran is kept in step_timings.
     """
     def __init__(
         self,
@@ -24,7 +117,16 @@ class MediaParser:
         contour_area_threshold: float = 0.008,
         contour_area_number_threshold: int = 100,
         contour_alignment_threshold: float = 0.15,
-        contour_alignment_deviation: float = 1.50
+        contour_alignment_deviation: float = 1.50,
+        statistics_max_pixels: Optional[int] = 4_000_000,
+        contour_removal: Union[ContourRemoval, str] = ContourRemoval.CONTOURS,
+        black_character_threshold: int = 135,
+        dilation_iterations: int = 9,
+        clahe_clip_limit: float = 3.0,
+        clahe_tile_size: int = 3,
+        blur_kernel_size: int = 3,
+        steps: Sequence[str] = CORE_STEPS,
+        step_options: Optional[Dict[str, dict]] = None
     ):
         self._media_loader = media_loader
         self._pixel_threshold = pixel_threshold
@@ -35,99 +137,132 @@ class MediaParser:
         self._contour_area_number_threshold = contour_area_number_threshold
         self._contour_alignment_threshold = contour_alignment_threshold
         self._contour_alignment_deviation = contour_alignment_deviation
+        self._statistics_max_pixels = statistics_max_pixels
+        self._contour_removal = ContourRemoval(contour_removal)
+        self._black_character_threshold = black_character_threshold
+        self._dilation_iterations = dilation_iterations
+        self._clahe_clip_limit = clahe_clip_limit
+        self._clahe_tile_size = clahe_tile_size
+        self._blur_kernel_size = blur_kernel_size
 
         self._image_width = self._media_loader.image.shape[0]
         self._image_height = self._media_loader.image.shape[1]
         self._image_area = self._image_width * self._image_height
         self._center_y = self._image_width // 2
 
-        self._white_pixel_percentage = self._calculate_pixels_percentage(
-            image=self._media_loader.image,
-            threshold=WHITE_THRESHOLD)
-        self._light_grey_pixel_percentage = self._calculate_pixels_percentage(
-            image=self._media_loader.image,
-            threshold=LIGHT_GREY_THRESHOLD)
+        self.statistics = self._image_statistics(image=self._media_loader.image)
+        self._white_pixel_percentage = self.statistics.white_pixel_percentage
+        self._light_grey_pixel_percentage = self.statistics.light_grey_pixel_percentage
 
         self._erosion_iterations, self._kernel = self._kernel_choice()
 
-        # Basic image pre-processing
-        self.image = self._basic_preprocessing(image=self._media_loader.image)
+        # Dark characters on a light background are thresholded at a fixed level, others with Otsu
+        self._dark_characters = self._light_grey_pixel_percentage > self._light_grey_pixel_threshold
 
-        # Image pre-processing
-        self.image = self._image_processing()
+        # Steps write in place once the image no longer is the loader's
+        self.image = self._media_loader.image
+        self._owns_image = False
 
-    def _kernel_choice(self) -> Tuple[int, NDArray]:
+        # Share of the image area kept by crop_to_region_of_interest
+        self.crop_ratio = 1.0
+
+        self.step_timings: Dict[str, float] = {}
+        self.run_steps(steps=steps, step_options=step_options)
+
+    @classmethod
+    def from_profile(cls, media_loader: MediaLoader, profile_path: str, **overrides) -> 'MediaParser':
         """
-        Decide size of kernel and erosion iterations depending on size of image (pixels).
+        Pre-process media with the options of a tuned profile, overrides taking precedence.
         """
 
-        if self._image_area * self._white_pixel_percentage < self._pixel_threshold:
-            return 3, np.ones((2, 2), np.uint8)
-        else:
-            return 4, np.ones((3, 3), np.uint8)
+        return cls(media_loader=media_loader, **{**load_parser_profile(profile_path=profile_path), **overrides})
 
-    def _calculate_pixels_percentage(self, image: MatLike, threshold: tuple) -> float:
+    def run_steps(self, steps: Sequence[str], step_options: Optional[Dict[str, dict]] = None) -> None:
         """
-        Calculate the percentage of white or near-white pixels using NumPy.
+        Run pre-processing steps in order, timing each step that applies to the image.
         """
 
-        # Convert the image to RGB
-        img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        step_options = step_options or {}
+        for step in steps:
+            if step not in STEP_METHODS:
+                raise ValueError(f'{step} is not a pre-processing step')
+
+            # Only core steps know when to allocate, the others write into the image as they find it
+            if step not in CORE_STEPS and not self._owns_image:
+                self._set_image(image=self.image.copy())
 
-        # Create a boolean mask where white or near-white pixels are True
-        mask = np.all(img_rgb >= threshold, axis=-1)
-        white_pixels_percentage = np.sum(mask) / mask.size
-        return white_pixels_percentage
+            start = time.perf_counter()
+            ran = getattr(self, STEP_METHODS[step])(**step_options.get(step, {}))
+            if ran is not False:
+                self.step_timings[step] = self.step_timings.get(step, 0.0) + time.perf_counter() - start
 
-    def _do_inversion(self, image: MatLike) -> MatLike:
+    def _buffer(self) -> Optional[MatLike]:
+        """
+        Destination for an in-place step, None to allocate while the image is the loader's.
         """
-        Invert the image only if it is white characters on black background.
-        s"""
 
-        # Calculate the average pixel intensity
-        average_intensity = np.mean(image)
+        return self.image if self._owns_image else None
 
-        # Determine the thresholding type based on the average intensity
-        if average_intensity < self._inversion_threshold:
-            return cv2.bitwise_not(image)
-        return image
+    def _set_image(self, image: MatLike) -> None:
+        self.image = image
+        self._owns_image = True
 
-    def _image_processing_white_characters(self) -> MatLike:
+    def _kernel_choice(self) -> Tuple[int, NDArray]:
         """
-        Image pre-processing to highlight white characters.
+        Decide size of kernel and erosion iterations depending on size of image (pixels).
         """
 
-        # Generate threshold to highlight white characters
-        _, thresh = cv2.threshold(self.image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if self._image_area * self._white_pixel_percentage < self._pixel_threshold:
+            return 3, np.ones((2, 2), np.uint8)
+        else:
+            return 4, np.ones((3, 3), np.uint8)
 
-        # Opening on threshold
-        eroded = cv2.erode(thresh, self._kernel, iterations=self._erosion_iterations)
-        dilated = cv2.dilate(eroded, self._kernel, iterations=9)
+    def _statistics_view(self, image: MatLike) -> MatLike:
+        """
+        Strided view of large images for statistics, no pixels are copied.
+        """
+
+        if self._statistics_max_pixels is None or self._image_area <= self._statistics_max_pixels:
+            return image
+
+        step = math.ceil(math.sqrt(self._image_area / self._statistics_max_pixels))
+        return image[::step, ::step]
 
-        # Invert black and white and erode image
-        inverted = self._do_inversion(image=dilated)
-        return inverted
- 
-    def _image_processing_black_characters(self) -> MatLike:
+    def _image_statistics(self, image: MatLike) -> ImageStatistics:
         """
-        Image pre-processing to highlight black characters.
+        Calculate pixel percentages, mean intensity and histogram in a single pass.
         """
 
-        # Apply thresholding if your image is not binary
-        _, thresh = cv2.threshold(self.image, 135, 255, cv2.THRESH_BINARY_INV)
+        view = self._statistics_view(image=image)
+
+        # Per pixel minimum over the channels replaces a color conversion and mask per threshold
+        if view.ndim == 3:
+            channel_minimum = np.minimum(np.minimum(view[:, :, 0], view[:, :, 1]), view[:, :, 2])
+        else:
+            channel_minimum = view
+        histogram = cv2.calcHist(
+            [np.ascontiguousarray(channel_minimum)], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+
+        channel_means = cv2.mean(view)
+        if view.ndim == 3:
+            mean_intensity = sum(weight * mean for weight, mean in zip(GREY_WEIGHTS, channel_means))
+        else:
+            mean_intensity = channel_means[0]
+
+        return ImageStatistics(
+            white_pixel_percentage=_histogram_percentage(histogram=histogram, threshold=WHITE_THRESHOLD),
+            light_grey_pixel_percentage=_histogram_percentage(histogram=histogram, threshold=LIGHT_GREY_THRESHOLD),
+            mean_intensity=mean_intensity,
+            histogram=histogram)
 
-        # Invert the binary image and erode image
-        inverted = self._do_inversion(image=thresh)
-        eroded = cv2.erode(inverted, self._kernel, iterations=1)
-        return eroded
-    
     def _clahe_transformation(self, image: MatLike) -> MatLike:
         """
         Clahe transformation on l-channel in image to increase contrast.
         """
 
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(3, 3))
-            
+        clahe = cv2.createCLAHE(
+            clipLimit=self._clahe_clip_limit, tileGridSize=(self._clahe_tile_size, self._clahe_tile_size))
+
         # Convert the image to LAB color space and split channels
         lab = cv2.cvtColor(image, cv2.COLOR_BGR2Lab)
         l, a, b = cv2.split(lab)
@@ -137,38 +272,132 @@ class MediaParser:
         lab_image = cv2.merge((cl, a, b))
         return lab_image
 
-    def _basic_preprocessing(self, image: MatLike) -> MatLike:
+    def _contrast_step(self) -> bool:
+        """
+        Do clahe transformation only if there are no white/near-white pixels.
+        """
+
+        if not (self._white_pixel_percentage == self._white_pixel_threshold and
+                self._light_grey_pixel_percentage < self._light_grey_pixel_threshold):
+            return False
+        self._set_image(image=self._clahe_transformation(image=self.image))
+        return True
+
+    def _grey_step(self) -> bool:
         """
-        Basic image pre-processing.
+        Apply grey scale to color images.
         """
 
-        # Do clahe transformation only if there are no white/near-white pixels
-        if (self._white_pixel_percentage == self._white_pixel_threshold and
-            self._light_grey_pixel_percentage < self._light_grey_pixel_threshold):
-            image = self._clahe_transformation(image=image)
+        if self.image.ndim == 2:
+            return False
+        self._set_image(image=cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY))
+        return True
+
+    def _blur_step(self) -> bool:
+        """
+        Gaussian blur to smooth out noise before thresholding.
+        """
 
-        # Apply grey scale and gaussian blur to image
-        grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(grey, (3, 3), 0)
-        return blur
+        size = self._blur_kernel_size
+        self._set_image(image=cv2.GaussianBlur(self.image, (size, size), 0, dst=self._buffer()))
+        return True
 
-    def _image_processing(self) -> MatLike:
+    def _threshold_step(self) -> bool:
         """
-        Core image pre-processing.
+        Binarize, dark characters at a fixed level and others with Otsu to highlight white characters.
         """
 
-        if self._light_grey_pixel_percentage > self._light_grey_pixel_threshold:
-            image = self._image_processing_black_characters()
+        if self._dark_characters:
+            _, image = cv2.threshold(
+                self.image, self._black_character_threshold, 255, cv2.THRESH_BINARY_INV, dst=self._buffer())
         else:
-            image = self._image_processing_white_characters()
-        
-        return image
+            _, image = cv2.threshold(self.image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=self._buffer())
+        self._set_image(image=image)
+        return True
+
+    def _opening_step(self) -> bool:
+        """
+        Opening on the threshold of white characters.
+        """
+
+        if self._dark_characters:
+            return False
+        image = cv2.erode(self.image, self._kernel, dst=self._buffer(), iterations=self._erosion_iterations)
+        self._set_image(image=cv2.dilate(image, self._kernel, dst=image, iterations=self._dilation_iterations))
+        return True
+
+    def _inversion_step(self) -> bool:
+        """
+        Invert the image only if it is white characters on black background.
+        """
+
+        # Calculate the average pixel intensity
+        if cv2.mean(self.image)[0] >= self._inversion_threshold:
+            return False
+        self._set_image(image=cv2.bitwise_not(self.image, dst=self._buffer()))
+        return True
+
+    def _erosion_step(self) -> bool:
+        """
+        Erode dark characters after inversion.
+        """
+
+        if not self._dark_characters:
+            return False
+        self._set_image(image=cv2.erode(self.image, self._kernel, dst=self._buffer(), iterations=1))
+        return True
 
     def remove_small_contours(self) -> None:
         """
         If needed, remove small contours from image.
         """
 
+        if self._contour_removal == ContourRemoval.COMPONENTS:
+            self._remove_small_components()
+        else:
+            self._remove_small_contours_iteratively()
+
+    def _remove_small_components(self) -> None:
+        """
+        Connected components approximation of removing small contours.
+
+        Filling a small contour only changes the image where it encloses black
+        pixels, so every black component that does not touch the border and
+        has fewer pixels than the area threshold is filled. White components
+        (8-connected) plus those enclosed black components (4-connected) are
+        the contours findContours would return. Components are measured by
+        their own pixels, not by what they enclose, so a thin ring around a
+        character is also filled where the contour loop keeps it. Wherever a
+        component's bounding box is below the threshold the result matches
+        the contour loop.
+        """
+
+        height, width = self.image.shape[:2]
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(
+            cv2.bitwise_not(self.image), connectivity=4)
+
+        left, top, box_width, box_height, area = stats.T
+        enclosed = (left > 0) & (top > 0) & (left + box_width < width) & (top + box_height < height)
+        enclosed[0] = False
+
+        # White components are only labelled when the enclosed regions alone are too few
+        contour_count = np.count_nonzero(enclosed)
+        if contour_count < self._contour_area_number_threshold:
+            contour_count += cv2.connectedComponents(self.image, connectivity=8)[0] - 1
+            if contour_count < self._contour_area_number_threshold:
+                return
+
+        small = enclosed & (area < self._contour_area_threshold * self._image_area)
+
+        # Single lookup table fill of every small component
+        lookup = np.where(small, 255, 0).astype(np.uint8)
+        cv2.bitwise_or(self.image, np.take(lookup, labels), dst=self.image)
+
+    def _remove_small_contours_iteratively(self) -> None:
+        """
+        Remove small contours one draw call at a time.
+        """
+
         # Find contours and hierarchy
         contours, _ = cv2.findContours(self.image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
 
@@ -198,9 +427,16 @@ class MediaParser:
                 contour_mid_point_difference(y=y, h=h)
             )
 
+        if not contour_diffs:
+            return
+
         contour_diffs_std = np.std(contour_diffs)
         contour_diffs_mean = np.mean(contour_diffs)
 
+        # Identical offsets have no outliers, which also avoids dividing by a zero deviation
+        if contour_diffs_std == 0:
+            return
+
         # Center of the image and iterate through contours
         for contour in contours:
             x, y, w, h = cv2.boundingRect(contour)
@@ -214,4 +450,17 @@ class MediaParser:
 
                 # Calculate new position and re-place
                 new_y = self._center_y - h // 2
-                self.image[new_y:new_y+h, x:x+w] = character
\ No newline at end of file
+                self.image[new_y:new_y+h, x:x+w] = character
+
+    def crop_to_region_of_interest(self, margin: float = 0.25, min_height_ratio: float = 0.5) -> float:
+        """
+        Crop the image to its dominant text block, returning the share of the area kept.
+        """
+
+        image, self.crop_ratio = crop_to_text_region(
+            image=self.image, margin=margin, min_height_ratio=min_height_ratio)
+
+        # A copy keeps the crop contiguous for encoding and shared memory
+        if self.crop_ratio < 1.0:
+            self.image = image.copy()
+        return self.crop_ratio
@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from typing import (
+    Optional,
+    Tuple)
+
+import numpy as np
+import cv2
+from cv2.typing import MatLike
+from numpy.typing import NDArray
+
+# Components spanning more than this share of a side are frames or background
+MAX_SIDE_RATIO = 0.9
+
+# Components smaller than this share of the image are specks
+MIN_COMPONENT_AREA_RATIO = 0.0002
+
+@dataclass
+class RegionOfInterest:
+    """
+    How pre-processed images are cropped to their dominant text block before OCR.
+
+    The block is made of the characters at least min_height_ratio as tall as
+    the tallest one, padded by margin times that character's height.
+    """
+
+    margin: float = 0.25
+    min_height_ratio: float = 0.5
+
+@dataclass
+class CropStats:
+    """
+    Running statistics of region of interest crops.
+    """
+
+    crops: int = 0
+    total_ratio: float = 0.0
+
+    @property
+    def mean_crop_ratio(self) -> float:
+        return self.total_ratio / self.crops if self.crops else 1.0
+
+    def record(self, crop_ratio: float) -> None:
+        self.crops += 1
+        self.total_ratio += crop_ratio
+
+def character_boxes(image: MatLike) -> NDArray:
+    """
+    Bounding boxes (x, y, w, h, area) of the dark regions in a pre-processed image.
+
+    Dark regions are the holes findContours traces in the white pixels, with
+    the image padded by a white pixel so regions touching the border are holes
+    too. The area is that of the hole's contour, including anything it encloses.
+    """
+
+    white = cv2.copyMakeBorder(
+        cv2.compare(image, 255, cv2.CMP_EQ), 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=255)
+    contours, hierarchy = cv2.findContours(white, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return np.zeros((0, 5), dtype=np.int64)
+
+    holes = [contour for contour, parent in zip(contours, hierarchy[0][:, 3]) if parent != -1]
+    if not holes:
+        return np.zeros((0, 5), dtype=np.int64)
+
+    boxes = np.array([(*cv2.boundingRect(hole), cv2.contourArea(hole)) for hole in holes], dtype=np.int64)
+    boxes[:, :2] -= 1
+    return boxes
+
+def find_text_region(
+    boxes: NDArray,
+    image_shape: Tuple[int, ...],
+    margin: float = 0.25,
+    min_height_ratio: float = 0.5
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Locate the block of the largest characters, returning (x, y, w, h) with a margin.
+
+    Only boxes at least min_height_ratio as tall as the tallest character are
+    kept, and the margin is a share of that tallest character's height.
+    """
+
+    if not len(boxes):
+        return None
+
+    height, width = image_shape[:2]
+    x, y, w, h, area = np.asarray(boxes).T
+
+    candidates = (
+        (w < MAX_SIDE_RATIO * width) & (h < MAX_SIDE_RATIO * height) &
+        (area >= MIN_COMPONENT_AREA_RATIO * height * width))
+    if not candidates.any():
+        return None
+
+    tallest = h[candidates].max()
+    large = candidates & (h >= min_height_ratio * tallest)
+
+    pad = int(margin * tallest)
+    left = max(int(x[large].min()) - pad, 0)
+    top = max(int(y[large].min()) - pad, 0)
+    right = min(int((x[large] + w[large]).max()) + pad, width)
+    bottom = min(int((y[large] + h[large]).max()) + pad, height)
+    return left, top, right - left, bottom - top
+
+def crop_to_text_region(
+    image: MatLike,
+    boxes: Optional[NDArray] = None,
+    margin: float = 0.25,
+    min_height_ratio: float = 0.5
+) -> Tuple[MatLike, float]:
+    """
+    Crop a pre-processed image to its dominant text block, returning the crop and its area ratio.
+
+    The crop is a view into the image. Images without a clear text block are
+    returned whole with a ratio of one.
+    """
+
+    if boxes is None:
+        boxes = character_boxes(image=image)
+
+    region = find_text_region(
+        boxes=boxes, image_shape=image.shape, margin=margin, min_height_ratio=min_height_ratio)
+    if region is None:
+        return image, 1.0
+
+    x, y, w, h = region
+    crop_ratio = (w * h) / (image.shape[0] * image.shape[1])
+    return image[y:y+h, x:x+w], crop_ratio
@@ -0,0 +1,327 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import (
+    dataclass,
+    field)
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple)
+
+import numpy as np
+from cv2.typing import MatLike
+
+from src.media.hashing import dhash
+from src.media.loader import (
+    MediaLoader,
+    VideoSampling)
+from src.media.parser import (
+    MediaParser,
+    standard_steps)
+from src.media.roi import RegionOfInterest
+
+# Shared memory block name, image shape and dtype string
+SharedImage = Tuple[str, Tuple[int, ...], str]
+
+# Shared images, perceptual hash, crop ratio and step timings returned by a worker
+WorkerResult = Tuple[List[SharedImage], Optional[int], float, Dict[str, float]]
+
+@dataclass
+class ProcessedMedia:
+    """
+    Pre-processed image together with the perceptual hash of the loaded media.
+
+    For videos sampled with top_k above one, alternatives holds the other
+    pre-processed frames, best first, so their OCR results can be voted on.
+    crop_ratio is the share of the image area kept by region of interest
+    cropping, one when the image was not cropped. step_timings holds the
+    seconds spent in each pre-processing step of the main image.
+    """
+
+    image: Optional[MatLike]
+    image_hash: Optional[int] = None
+    alternatives: List[MatLike] = field(default_factory=list)
+    crop_ratio: float = 1.0
+    step_timings: Dict[str, float] = field(default_factory=dict)
+
+def _preprocess_image(
+    media_loader: MediaLoader,
+    parser_options: Optional[dict],
+    remove_small_contours: bool,
+    realign_and_center_contours: bool,
+    region_of_interest: Optional[RegionOfInterest]
+) -> Tuple[MatLike, float, Dict[str, float]]:
+    """
+    Run the pre-processing steps on a loaded image, returning it with its crop ratio and step timings.
+
+    Parser options giving their own steps replace the standard steps chosen by the flags.
+    """
+
+    options = dict(parser_options or {})
+    if 'steps' not in options:
+        options['steps'] = standard_steps(
+            remove_small_contours=remove_small_contours,
+            realign_and_center_contours=realign_and_center_contours,
+            crop_to_region_of_interest=region_of_interest is not None)
+    if region_of_interest is not None:
+        step_options = dict(options.get('step_options') or {})
+        step_options.setdefault(
+            'crop_to_region_of_interest',
+            {'margin': region_of_interest.margin, 'min_height_ratio': region_of_interest.min_height_ratio})
+        options['step_options'] = step_options
+
+    media_parser = MediaParser(media_loader=media_loader, **options)
+    return media_parser.image, media_parser.crop_ratio, media_parser.step_timings
+
+def preprocess_media(
+    media_loader: MediaLoader,
+    parser_options: Optional[dict] = None,
+    remove_small_contours: bool = True,
+    realign_and_center_contours: bool = False,
+    region_of_interest: Optional[RegionOfInterest] = None
+) -> Optional[MatLike]:
+    """
+    Run the standard pre-processing on loaded media, returning the processed image.
+    """
+
+    if media_loader.image is None:
+        return None
+
+    image, _, _ = _preprocess_image(
+        media_loader=media_loader,
+        parser_options=parser_options,
+        remove_small_contours=remove_small_contours,
+        realign_and_center_contours=realign_and_center_contours,
+        region_of_interest=region_of_interest)
+    return image
+
+def process_media(
+    media_loader: MediaLoader,
+    parser_options: Optional[dict] = None,
+    remove_small_contours: bool = True,
+    realign_and_center_contours: bool = False,
+    region_of_interest: Optional[RegionOfInterest] = None
+) -> ProcessedMedia:
+    """
+    Hash the loaded media and run the standard pre-processing on it.
+    """
+
+    if media_loader.image is None:
+        return ProcessedMedia(image=None)
+
+    # Hash the media as loaded, before any pre-processing touches it
+    image_hash = dhash(image=media_loader.image)
+    image, crop_ratio, step_timings = _preprocess_image(
+        media_loader=media_loader,
+        parser_options=parser_options,
+        remove_small_contours=remove_small_contours,
+        realign_and_center_contours=realign_and_center_contours,
+        region_of_interest=region_of_interest)
+
+    alternatives = [
+        preprocess_media(
+            media_loader=MediaLoader(image=frame),
+            parser_options=parser_options,
+            remove_small_contours=remove_small_contours,
+            realign_and_center_contours=realign_and_center_contours,
+            region_of_interest=region_of_interest)
+        for frame in media_loader.frames[1:]]
+    return ProcessedMedia(
+        image=image,
+        image_hash=image_hash,
+        alternatives=alternatives,
+        crop_ratio=crop_ratio,
+        step_timings=step_timings)
+
+def _to_shared_image(image: MatLike) -> SharedImage:
+    """
+    Copy an image into a new shared memory block.
+    """
+
+    # The caller owns the block from here on and is responsible for unlinking it
+    shared_memory = SharedMemory(create=True, size=max(1, image.nbytes))
+    try:
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shared_memory.buf)[:] = image
+        return shared_memory.name, image.shape, image.dtype.str
+    finally:
+        shared_memory.close()
+
+def _preprocess_to_shared_memory(
+    media_path: Optional[str],
+    media_bytes: Optional[bytes],
+    parser_options: Optional[dict],
+    remove_small_contours: bool,
+    realign_and_center_contours: bool,
+    video_sampling: Optional[VideoSampling],
+    region_of_interest: Optional[RegionOfInterest]
+) -> WorkerResult:
+    """
+    Worker entry point, pre-process media and copy the results into shared memory.
+    """
+
+    processed_media = process_media(
+        media_loader=MediaLoader(
+            media_path=media_path, media_bytes=media_bytes, video_sampling=video_sampling),
+        parser_options=parser_options,
+        remove_small_contours=remove_small_contours,
+        realign_and_center_contours=realign_and_center_contours,
+        region_of_interest=region_of_interest)
+
+    if processed_media.image is None:
+        return [], processed_media.image_hash, processed_media.crop_ratio, processed_media.step_timings
+
+    images = [processed_media.image] + processed_media.alternatives
+    shared_images = [_to_shared_image(image=image) for image in images]
+    return shared_images, processed_media.image_hash, processed_media.crop_ratio, processed_media.step_timings
+
+def _to_processed_media(result: WorkerResult) -> ProcessedMedia:
+    """
+    Build the processed media from a worker result, releasing its shared memory.
+    """
+
+    shared_images, image_hash, crop_ratio, step_timings = result
+    images = [_read_shared_image(shared_image=shared_image) for shared_image in shared_images]
+    if not images:
+        return ProcessedMedia(image=None, image_hash=image_hash)
+    return ProcessedMedia(
+        image=images[0],
+        image_hash=image_hash,
+        alternatives=images[1:],
+        crop_ratio=crop_ratio,
+        step_timings=step_timings)
+
+def _read_shared_image(shared_image: SharedImage) -> MatLike:
+    """
+    Copy an image out of a shared memory block and release the block.
+    """
+
+    name, shape, dtype = shared_image
+    shared_memory = SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shared_memory.buf).copy()
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+def _release_abandoned_image(future) -> None:
+    """
+    Release the shared memory of a job whose caller stopped waiting for it.
+    """
+
+    if not future.cancelled() and future.exception() is None:
+        _to_processed_media(result=future.result())
+
+class PreprocessingService:
+    """
+    Process pool backed media pre-processing.
+
+    Loading and pre-processing run in worker processes so they scale across
+    cores without holding up the event loop, and processed frames are handed
+    back through shared memory instead of pickled arrays.
+    """
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        parser_options: Optional[dict] = None,
+        remove_small_contours: bool = True,
+        realign_and_center_contours: bool = False,
+        video_sampling: Optional[VideoSampling] = None,
+        region_of_interest: Optional[RegionOfInterest] = None
+    ):
+        self._max_workers = max_workers
+        self._parser_options = parser_options or {}
+        self._remove_small_contours = remove_small_contours
+        self._realign_and_center_contours = realign_and_center_contours
+        self._video_sampling = video_sampling
+        self._region_of_interest = region_of_interest
+
+        # Workers must share the parent's tracker so blocks unlinked here are not reported as leaked
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+
+    def __enter__(self) -> 'PreprocessingService':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _submit(
+        self,
+        media_path: Optional[str],
+        media_bytes: Optional[bytes],
+        parser_options: Optional[dict] = None,
+        video_sampling: Optional[VideoSampling] = None,
+        region_of_interest: Optional[RegionOfInterest] = None
+    ):
+        """
+        Submit a pre-processing job to the process pool, the given settings overriding the service's.
+        """
+
+        if media_path is None and media_bytes is None:
+            raise ValueError('Either media_path or media_bytes must be provided')
+
+        return self._executor.submit(
+            _preprocess_to_shared_memory,
+            media_path,
+            media_bytes,
+            self._parser_options if parser_options is None else parser_options,
+            self._remove_small_contours,
+            self._realign_and_center_contours,
+            video_sampling or self._video_sampling,
+            region_of_interest or self._region_of_interest)
+
+    def preprocess(
+        self,
+        media_path: Optional[str] = None,
+        media_bytes: Optional[bytes] = None,
+        parser_options: Optional[dict] = None,
+        video_sampling: Optional[VideoSampling] = None,
+        region_of_interest: Optional[RegionOfInterest] = None
+    ) -> ProcessedMedia:
+        """
+        Pre-process media from a path or an encoded byte buffer.
+        """
+
+        result = self._submit(
+            media_path=media_path,
+            media_bytes=media_bytes,
+            parser_options=parser_options,
+            video_sampling=video_sampling,
+            region_of_interest=region_of_interest).result()
+        return _to_processed_media(result=result)
+
+    async def apreprocess(
+        self,
+        media_path: Optional[str] = None,
+        media_bytes: Optional[bytes] = None,
+        parser_options: Optional[dict] = None,
+        video_sampling: Optional[VideoSampling] = None,
+        region_of_interest: Optional[RegionOfInterest] = None
+    ) -> ProcessedMedia:
+        """
+        Pre-process media without blocking the running event loop.
+        """
+
+        future = self._submit(
+            media_path=media_path,
+            media_bytes=media_bytes,
+            parser_options=parser_options,
+            video_sampling=video_sampling,
+            region_of_interest=region_of_interest)
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_release_abandoned_image)
+            raise
+
+        return _to_processed_media(result=result)
+
+    def close(self) -> None:
+        """
+        Shut down the worker processes.
+        """
+
+        self._executor.shutdown(wait=True, cancel_futures=True)
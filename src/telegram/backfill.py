@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+from typing import (
+    Optional,
+    Set)
+
+class BackfillStore:
+    """
+    SQLite store of backfilled OCR results and of how far each channel has been backfilled.
+
+    Results are committed together with the checkpoint, so a resumed backfill
+    never skips a message whose result was lost. Failures are counted per
+    message, a message that failed max_attempts times is given up on and
+    no longer holds the checkpoint back.
+    """
+    def __init__(self, database_path: str, max_attempts: int = 3):
+        self._database_path = database_path
+        self._max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self._database_path) or '.', exist_ok=True)
+        self._connection = sqlite3.connect(self._database_path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'channel TEXT NOT NULL, message_id INTEGER NOT NULL, date TEXT, response TEXT, image_hash TEXT, '
+            'PRIMARY KEY (channel, message_id))')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS checkpoints (channel TEXT PRIMARY KEY, message_id INTEGER NOT NULL)')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS failures ('
+            'channel TEXT NOT NULL, message_id INTEGER NOT NULL, attempts INTEGER NOT NULL, error TEXT, '
+            'PRIMARY KEY (channel, message_id))')
+        self._connection.commit()
+
+    def add(
+        self,
+        channel: str,
+        message_id: int,
+        date: Optional[str],
+        response: Optional[str],
+        image_hash: Optional[int]
+    ) -> None:
+        """
+        Stage the result of a message, written on the next checkpoint.
+        """
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO results (channel, message_id, date, response, image_hash) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (channel, message_id, date, response, None if image_hash is None else f'{image_hash:016x}'))
+            self._connection.execute(
+                'DELETE FROM failures WHERE channel = ? AND message_id = ?', (channel, message_id))
+
+    def record_failure(self, channel: str, message_id: int, error: str) -> bool:
+        """
+        Count a failed attempt at a message, returning whether it has now been given up on.
+        """
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO failures (channel, message_id, attempts, error) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (channel, message_id) DO UPDATE SET attempts = attempts + 1, error = excluded.error',
+                (channel, message_id, error))
+            attempts = self._connection.execute(
+                'SELECT attempts FROM failures WHERE channel = ? AND message_id = ?',
+                (channel, message_id)).fetchone()[0]
+            self._connection.commit()
+        return attempts >= self._max_attempts
+
+    def checkpoint(self, channel: str) -> int:
+        """
+        Id of the last message of a channel that was backfilled along with every earlier one, zero if none.
+        """
+
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT message_id FROM checkpoints WHERE channel = ?', (channel,)).fetchone()
+        return row[0] if row else 0
+
+    def save_checkpoint(self, channel: str, message_id: int) -> None:
+        """
+        Record a channel's checkpoint and commit every staged result.
+        """
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO checkpoints (channel, message_id) VALUES (?, ?)', (channel, message_id))
+            self._connection.commit()
+
+    def commit(self) -> None:
+        """
+        Commit every staged result without moving any checkpoint.
+        """
+
+        with self._lock:
+            self._connection.commit()
+
+    def count(self, channel: str) -> int:
+        """
+        Number of results stored for a channel.
+        """
+
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM results WHERE channel = ?', (channel,)).fetchone()[0]
+
+    def count_given_up(self, channel: str) -> int:
+        """
+        Number of messages of a channel given up on after failing max_attempts times.
+        """
+
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM failures WHERE channel = ? AND attempts >= ?',
+                (channel, self._max_attempts)).fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Commit and close the store.
+        """
+
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+class BackfillCheckpoint:
+    """
+    Low watermark of messages backfilled out of order.
+
+    Messages are iterated oldest first but finish in any order, so the
+    watermark is the highest id at or below which no message is in flight.
+    """
+    def __init__(self, last_id: int = 0):
+        self._pending: Set[int] = set()
+        self._highest = last_id
+
+    @property
+    def watermark(self) -> int:
+        return min(self._pending) - 1 if self._pending else self._highest
+
+    def skipped(self, message_id: int) -> None:
+        self._highest = max(self._highest, message_id)
+
+    def started(self, message_id: int) -> None:
+        self._pending.add(message_id)
+        self._highest = max(self._highest, message_id)
+
+    def finished(self, message_id: int) -> None:
+        self._pending.discard(message_id)
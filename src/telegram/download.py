@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from telethon.tl.types import (
+    Photo,
+    PhotoSize,
+    PhotoSizeProgressive)
+
+@dataclass
+class DownloadPolicy:
+    """
+    How photos are downloaded before pre-processing.
+
+    With thumbnail_first, the smallest photo size whose longest side reaches
+    min_dimension is downloaded, and the full photo is only fetched when
+    pre-processing or OCR on the reduced version fails.
+    """
+
+    thumbnail_first: bool = True
+    min_dimension: int = 800
+
+@dataclass
+class DownloadStats:
+    """
+    Counters of reduced and full resolution downloads.
+    """
+
+    reduced_downloads: int = 0
+    full_downloads: int = 0
+    escalations: int = 0
+
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalations / self.reduced_downloads if self.reduced_downloads else 0.0
+
+def choose_photo_size(photo: Photo, min_dimension: int) -> Optional[PhotoSize]:
+    """
+    Return the smallest photo size large enough for OCR, or None if only the full photo is.
+    """
+
+    # Stripped and path sizes are inline previews without usable dimensions
+    sizes = sorted(
+        (size for size in photo.sizes if isinstance(size, (PhotoSize, PhotoSizeProgressive))),
+        key=lambda size: max(size.w, size.h))
+    if not sizes:
+        return None
+
+    for size in sizes[:-1]:
+        if max(size.w, size.h) >= min_dimension:
+            return size
+    return None
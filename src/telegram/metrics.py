@@ -0,0 +1,346 @@
+import asyncio
+import bisect
+import json
+import time
+from collections import (
+    OrderedDict,
+    defaultdict)
+from contextlib import (
+    contextmanager,
+    nullcontext)
+from dataclasses import (
+    dataclass,
+    field)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple)
+
+# Upper bounds in seconds, vision APIs can take tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Metric name and sorted label pairs
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# Gauge name, labels and value returned by collectors
+Gauge = Tuple[str, Dict[str, Any], float]
+
+# Shared by every disabled span, so disabled instrumentation allocates nothing
+_NULL_SPAN = nullcontext()
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> MetricKey:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape_label_value(value=value)}"' for label, value in pairs) + '}'
+
+@dataclass
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count of observed values.
+    """
+
+    buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    counts: List[int] = field(default_factory=list)
+    total: float = 0.0
+    count: int = 0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * len(self.buckets)
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        cumulative, running = [], 0
+        for count in self.counts:
+            running += count
+            cumulative.append(running)
+        return cumulative
+
+@dataclass
+class MessageTrace:
+    """
+    Timing spans of one message, offsets in seconds from when it was received.
+    """
+
+    message_id: int
+    channel: str
+    received: float = field(default_factory=time.time)
+    started: float = field(default_factory=time.perf_counter)
+    spans: List[dict] = field(default_factory=list)
+
+    def record(self, start: float, end: float, **labels: Any) -> None:
+        self.spans.append({
+            'offset': start - self.started,
+            'duration': end - start,
+            **labels})
+
+    def as_record(self, outcome: str) -> dict:
+        return {
+            'message_id': self.message_id,
+            'channel': self.channel,
+            'received': self.received,
+            'total': time.perf_counter() - self.started,
+            'outcome': outcome,
+            'spans': self.spans}
+
+class Metrics:
+    """
+    Counters, histograms and per-message timing spans of the message pipeline.
+
+    Collectors are called when metrics are exported and return gauges read
+    from elsewhere, such as queue depths or cache statistics. Finished traces
+    are appended to trace_path as JSON lines. Traces never finished, e.g. of
+    messages dropped by a failing stage, are written as incomplete once more
+    than max_open_traces are open. When disabled every call returns at once.
+    """
+    def __init__(self, enabled: bool = True, trace_path: Optional[str] = None, max_open_traces: int = 1000):
+        self.enabled = enabled
+        self._trace_path = trace_path
+        self._max_open_traces = max_open_traces
+        self._counters: Dict[MetricKey, float] = defaultdict(float)
+        self._histograms: Dict[MetricKey, Histogram] = {}
+        self._collectors: List[Callable[[], List[Gauge]]] = []
+        self._traces: 'OrderedDict[Hashable, MessageTrace]' = OrderedDict()
+        self._trace_file = None
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        """
+        Add to a counter.
+        """
+
+        if not self.enabled:
+            return
+        self._counters[_metric_key(name=name, labels=labels)] += value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """
+        Add a value to a histogram.
+        """
+
+        if not self.enabled:
+            return
+        key = _metric_key(name=name, labels=labels)
+        if key not in self._histograms:
+            self._histograms[key] = Histogram()
+        self._histograms[key].observe(value=value)
+
+    @contextmanager
+    def _timer(self, name: str, trace: Optional[MessageTrace], labels: dict) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.observe(name, end - start, **labels)
+            if trace is not None:
+                trace.record(start=start, end=end, **labels)
+
+    def time(self, name: str, **labels: Any):
+        """
+        Context manager observing the duration of its block in a histogram.
+        """
+
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._timer(name=name, trace=None, labels=labels)
+
+    def start_trace(self, key: Hashable, message_id: int, channel: str) -> None:
+        """
+        Open the trace of a message as it is received.
+        """
+
+        if not self.enabled:
+            return
+        self._traces[key] = MessageTrace(message_id=message_id, channel=channel)
+        while len(self._traces) > self._max_open_traces:
+            _, trace = self._traces.popitem(last=False)
+            self._write_trace(record=trace.as_record(outcome='incomplete'))
+
+    def span(self, key: Hashable, stage: str, **labels: Any):
+        """
+        Context manager timing one stage of a message, recorded in its trace and in stage_seconds.
+        """
+
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._timer(name='stage_seconds', trace=self._traces.get(key), labels={'stage': stage, **labels})
+
+    def finish_trace(self, key: Hashable, outcome: str) -> None:
+        """
+        Close the trace of a message, counting its outcome and writing its spans.
+        """
+
+        if not self.enabled:
+            return
+        trace = self._traces.pop(key, None)
+        if trace is None:
+            return
+        record = trace.as_record(outcome=outcome)
+        self.increment('messages_total', outcome=outcome)
+        self.observe('message_seconds', record['total'])
+        self._write_trace(record=record)
+
+    def _write_trace(self, record: dict) -> None:
+        if self._trace_path is None:
+            return
+        if self._trace_file is None:
+            self._trace_file = open(self._trace_path, 'a', buffering=1)
+        self._trace_file.write(json.dumps(record) + '\n')
+
+    def register_collector(self, collector: Callable[[], List[Gauge]]) -> None:
+        """
+        Register a function returning (name, labels, value) gauges.
+        """
+
+        if self.enabled:
+            self._collectors.append(collector)
+
+    def _gauges(self) -> Dict[MetricKey, float]:
+        gauges: Dict[MetricKey, float] = {}
+        for collector in self._collectors:
+            try:
+                gauges.update(
+                    (_metric_key(name=name, labels=labels), value) for name, labels, value in collector())
+            except Exception as e:
+                print(f'Metrics collector failed: {e}')
+        return gauges
+
+    def snapshot(self) -> dict:
+        """
+        Current counters, gauges and histogram summaries as a JSON serialisable dict.
+        """
+
+        def name(key: MetricKey) -> str:
+            return key[0] + _format_labels(labels=key[1])
+
+        return {
+            'time': time.time(),
+            'counters': {name(key): value for key, value in self._counters.items()},
+            'gauges': {name(key): value for key, value in self._gauges().items()},
+            'histograms': {
+                name(key): {
+                    'count': histogram.count,
+                    'sum': histogram.total,
+                    'buckets': dict(zip(map(str, histogram.buckets), histogram.cumulative_counts()))}
+                for key, histogram in self._histograms.items()}}
+
+    def render_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+
+        lines = []
+        for (name, labels), value in sorted(self._counters.items()):
+            lines.append(f'{name}{_format_labels(labels=labels)} {value}')
+        for (name, labels), value in sorted(self._gauges().items()):
+            lines.append(f'{name}{_format_labels(labels=labels)} {value}')
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            for bound, count in zip(histogram.buckets, histogram.cumulative_counts()):
+                lines.append(f'{name}_bucket{_format_labels(labels=labels, le=str(bound))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels=labels, le="+Inf")} {histogram.count}')
+            lines.append(f'{name}_sum{_format_labels(labels=labels)} {histogram.total}')
+            lines.append(f'{name}_count{_format_labels(labels=labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def close(self) -> None:
+        """
+        Write the traces still open as incomplete and close the trace file.
+        """
+
+        while self._traces:
+            _, trace = self._traces.popitem(last=False)
+            self._write_trace(record=trace.as_record(outcome='incomplete'))
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+
+# Instrumentation used when none is configured
+DISABLED_METRICS = Metrics(enabled=False)
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving the metrics in the Prometheus text format on any path.
+    """
+    def __init__(self, metrics: Metrics, host: str = '127.0.0.1', port: int = 9464):
+        self._metrics = metrics
+        self._host = host
+        self._port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Only the request head is read, the request itself is not inspected
+            await reader.readuntil(b'\r\n\r\n')
+            body = self._metrics.render_prometheus().encode('utf-8')
+            writer.write(
+                b'HTTP/1.1 200 OK\r\n'
+                b'Content-Type: text/plain; version=0.0.4\r\n'
+                b'Content-Length: ' + str(len(body)).encode('ascii') + b'\r\n'
+                b'Connection: close\r\n\r\n' + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, host=self._host, port=self._port)
+        print(f'Serving metrics on http://{self._host}:{self._port}/metrics')
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+class MetricsFileExporter:
+    """
+    Append a snapshot of the metrics to a JSON lines file every interval seconds.
+    """
+    def __init__(self, metrics: Metrics, path: str, interval: float = 60.0):
+        self._metrics = metrics
+        self._path = path
+        self._interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def _write(self) -> None:
+        with open(self._path, 'a') as f:
+            f.write(json.dumps(self._metrics.snapshot()) + '\n')
+
+    async def _export(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            self._write()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._export(), name='metrics-exporter')
+
+    async def stop(self) -> None:
+        """
+        Stop exporting, writing a final snapshot.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._write()
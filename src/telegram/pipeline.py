@@ -0,0 +1,258 @@
+import asyncio
+from collections import (
+    defaultdict,
+    deque)
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional)
+
+from src.telegram.metrics import (
+    DISABLED_METRICS,
+    Metrics)
+
+@dataclass
+class PipelineStage:
+    """
+    Single stage of the media pipeline.
+
+    The handler receives one item and returns the item to hand to the next
+    stage, or None to drop it from the pipeline.
+    """
+
+    name: str
+    handler: Callable[[Any], Awaitable[Optional[Any]]]
+    concurrency: int = 1
+
+@dataclass
+class PipelineConfig:
+    """
+    Concurrency and queue sizes for each stage of the media pipeline.
+
+    The stage queues are shared and first in first out, so fairness between
+    channels only holds up to channel_in_flight: a channel's next message
+    can wait behind as many messages of every other channel.
+    """
+
+    download_concurrency: int = 4
+    preprocess_concurrency: int = 2
+    ocr_concurrency: int = 4
+    delivery_concurrency: int = 1
+    queue_size: int = 32
+    channel_queue_size: int = 8
+    channel_in_flight: int = 4
+    drain_on_shutdown: bool = True
+
+class MediaPipeline:
+    """
+    Staged asynchronous pipeline with bounded queues between stages.
+
+    Each stage is served by its own pool of workers, so a slow stage only
+    delays the items it is working on, while the bounded queues apply
+    backpressure to the stages in front of it.
+    """
+    def __init__(self, stages: List[PipelineStage], queue_size: int = 32, metrics: Metrics = DISABLED_METRICS):
+        if not stages:
+            raise ValueError('A pipeline needs at least one stage')
+
+        self._stages = stages
+        self._queue_size = queue_size
+        self._metrics = metrics
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def queue_depths(self) -> dict:
+        """
+        Return the number of items waiting in front of each stage.
+        """
+
+        return {
+            stage.name: queue.qsize() for stage, queue in zip(self._stages, self._queues)}
+
+    def start(self) -> None:
+        """
+        Create the stage queues and start the workers on the running loop.
+        """
+
+        if self.running:
+            return
+
+        self._queues = [asyncio.Queue(maxsize=self._queue_size) for _ in self._stages]
+
+        for index, stage in enumerate(self._stages):
+            for worker_index in range(max(1, stage.concurrency)):
+                self._workers.append(
+                    asyncio.create_task(
+                        self._worker(index=index),
+                        name=f'{stage.name}-{worker_index}'))
+
+    async def submit(self, item: Any) -> None:
+        """
+        Enqueue an item into the first stage, waiting while the queue is full.
+        """
+
+        if not self.running:
+            raise RuntimeError('Pipeline has not been started')
+
+        await self._queues[0].put(item)
+
+    async def stop(self, drain: bool = True) -> None:
+        """
+        Stop all workers, optionally processing every queued item first.
+        """
+
+        if drain:
+            # Join stage by stage so items moving forward are not lost
+            for queue in self._queues:
+                await queue.join()
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, index: int) -> None:
+        """
+        Pull items from a stage queue and forward results to the next stage.
+        """
+
+        stage = self._stages[index]
+        queue = self._queues[index]
+        next_queue = self._queues[index + 1] if index + 1 < len(self._queues) else None
+
+        while True:
+            item = await queue.get()
+            try:
+                result = await stage.handler(item)
+                if result is not None and next_queue is not None:
+                    await next_queue.put(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'Error in {stage.name} stage: {e!r}')
+                self._metrics.increment('pipeline_stage_errors_total', stage=stage.name)
+            finally:
+                queue.task_done()
+
+class FairScheduler:
+    """
+    Round-robin intake in front of a pipeline, one bounded queue per key.
+
+    Items wait in the queue of their key, e.g. their source channel, and are
+    fed to the pipeline one key at a time. A key has at most max_in_flight
+    items in the pipeline, each released by calling done once the item
+    leaves it. A noisy key only fills its own queue and a bounded share of
+    the pipeline's, so every other key still gets a turn soon.
+    """
+    def __init__(self, pipeline: MediaPipeline, queue_size: int = 8, max_in_flight: int = 4):
+        self._pipeline = pipeline
+        self._queue_size = queue_size
+        self._max_in_flight = max(1, max_in_flight)
+        self._queues: Dict[Hashable, asyncio.Queue] = {}
+        self._in_flight: Dict[Hashable, int] = defaultdict(int)
+        self._ready: Deque[Hashable] = deque()
+        self._has_items: Optional[asyncio.Event] = None
+        self._feeder: Optional[asyncio.Task] = None
+
+    def queue_depths(self) -> dict:
+        """
+        Return the number of items waiting for each key.
+        """
+
+        return {key: queue.qsize() for key, queue in self._queues.items()}
+
+    def in_flight(self) -> dict:
+        """
+        Return the number of items of each key handed to the pipeline and not done yet.
+        """
+
+        return dict(self._in_flight)
+
+    def start(self) -> None:
+        """
+        Start feeding the pipeline on the running loop.
+        """
+
+        if self._feeder is None:
+            self._has_items = asyncio.Event()
+            self._feeder = asyncio.create_task(self._feed(), name='fair-scheduler')
+
+    async def submit(self, key: Hashable, item: Any) -> None:
+        """
+        Enqueue an item for a key, waiting while that key's queue is full.
+        """
+
+        if self._feeder is None:
+            raise RuntimeError('Scheduler has not been started')
+
+        queue = self._queues.setdefault(key, asyncio.Queue(maxsize=self._queue_size))
+        await queue.put(item)
+        self._make_ready(key=key)
+
+    def done(self, key: Hashable) -> None:
+        """
+        Release an item of a key that left the pipeline, letting the key feed another.
+        """
+
+        if self._in_flight[key] > 0:
+            self._in_flight[key] -= 1
+        self._make_ready(key=key)
+
+    def _make_ready(self, key: Hashable) -> None:
+        """
+        Queue a key for a turn if it has items waiting and room in the pipeline.
+        """
+
+        queue = self._queues.get(key)
+        if queue is None or queue.empty() or key in self._ready:
+            return
+        if self._in_flight[key] < self._max_in_flight:
+            self._ready.append(key)
+            self._has_items.set()
+
+    async def stop(self, drain: bool = True) -> None:
+        """
+        Stop feeding the pipeline, optionally handing it every queued item first.
+        """
+
+        if drain:
+            for queue in list(self._queues.values()):
+                await queue.join()
+
+        if self._feeder is not None:
+            self._feeder.cancel()
+            await asyncio.gather(self._feeder, return_exceptions=True)
+            self._feeder = None
+
+    async def _feed(self) -> None:
+        """
+        Hand one item per key in turn to the pipeline.
+        """
+
+        while True:
+            if not self._ready:
+                self._has_items.clear()
+                await self._has_items.wait()
+                continue
+
+            key = self._ready.popleft()
+            queue = self._queues[key]
+            item = queue.get_nowait()
+            self._in_flight[key] += 1
+
+            # The key goes to the back of the line if it still has items waiting and room, else done requeues it
+            self._make_ready(key=key)
+            try:
+                await self._pipeline.submit(item)
+            finally:
+                queue.task_done()
@@ -1,16 +1,93 @@
-from telethon import events, TelegramClient
+import asyncio
+import time
+from dataclasses import (
+    dataclass,
+    field)
+from datetime import datetime
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional)
+
+from cv2.typing import MatLike
+from telethon import errors, events, TelegramClient, utils
+from telethon.tl.custom.message import Message
 from telethon.tl.types import (
     MessageMediaDocument,
     MessageMediaPhoto)
 
-from src.media.parser import MediaParser
-from src.media.loader import MediaLoader
-from src.vision.vision_openai import OpenAIVision
+from src.media.dedup import NearDuplicateIndex
+from src.media.loader import (
+    MediaLoader,
+    VideoSampling)
+from src.media.roi import (
+    CropStats,
+    RegionOfInterest)
+from src.media.service import (
+    PreprocessingService,
+    process_media)
+from src.telegram.backfill import (
+    BackfillCheckpoint,
+    BackfillStore)
+from src.telegram.download import (
+    DownloadPolicy,
+    DownloadStats,
+    choose_photo_size)
+from src.telegram.metrics import (
+    DISABLED_METRICS,
+    Gauge,
+    Metrics)
+from src.telegram.pipeline import (
+    FairScheduler,
+    MediaPipeline,
+    PipelineConfig,
+    PipelineStage)
+from src.vision._base import BaseVision
+from src.vision._cache import OCRCache
+from src.vision._registry import create_vision
+from src.vision.vision_cached import CachedVision
 from src.utils import (
+    ChannelConfig,
     clean_channel,
-    encode_image, 
     parse_ocr_response,
-    source_data_directory)
+    source_data_directory,
+    vote_ocr_responses)
+
+# Larger queues and more parallel downloads for history, nothing waits on a single result
+BACKFILL_PIPELINE_CONFIG = PipelineConfig(
+    download_concurrency=8,
+    preprocess_concurrency=4,
+    ocr_concurrency=16,
+    delivery_concurrency=1,
+    queue_size=256)
+
+# Flood waits longer than this many seconds are not retried
+MAX_FLOOD_WAIT = 900
+
+@dataclass
+class MediaJob:
+    """
+    State of a single Telegram message as it moves through the pipeline.
+    """
+
+    message: Message
+    channel: str
+    channel_to_send: str
+    media_bytes: Optional[bytes] = None
+    media_extension: Optional[str] = None
+    image: Optional[MatLike] = None
+    alternatives: List[MatLike] = field(default_factory=list)
+    image_hash: Optional[int] = None
+    reduced_resolution: bool = False
+    response: Optional[str] = None
+    vision: Optional[BaseVision] = None
+    parser_options: Optional[dict] = None
+
+    @property
+    def trace_key(self) -> tuple:
+        return self.channel, self.message.id
 
 class TelegramOCR:
     """
@@ -21,12 +98,51 @@ class TelegramOCR:
         telegram_app_id: int,
         telegram_app_hash: str,
         telegram_phone_number: str,
-        openai_vision: OpenAIVision
+        vision: BaseVision,
+        pipeline_config: Optional[PipelineConfig] = None,
+        preprocessing_service: Optional[PreprocessingService] = None,
+        ocr_cache: Optional[OCRCache] = None,
+        near_duplicate_index: Optional[NearDuplicateIndex] = None,
+        archive_media: bool = True,
+        download_policy: Optional[DownloadPolicy] = None,
+        video_sampling: Optional[VideoSampling] = None,
+        region_of_interest: Optional[RegionOfInterest] = None,
+        warm_up_vision: bool = True,
+        channel_visions: Optional[Dict[str, BaseVision]] = None,
+        metrics: Optional[Metrics] = None
     ):
         self._telegram_app_id = telegram_app_id
         self._telegram_app_hash = telegram_app_hash
         self._telegram_phone_number = telegram_phone_number
-        self.openai_vision = openai_vision
+        self.vision = vision
+        self.ocr_cache = ocr_cache
+        self.near_duplicate_index = near_duplicate_index
+
+        # Reposted images are answered from the cache instead of the vision API
+        self._vision = self._with_cache(vision=vision)
+
+        # Backends named in channel configs, created on first use unless given here
+        self._channel_visions = {
+            name: self._with_cache(vision=channel_vision)
+            for name, channel_vision in (channel_visions or {}).items()}
+        self._pipeline_config = pipeline_config or PipelineConfig()
+        self._preprocessing_service = preprocessing_service
+        self._shutdown_event: Optional[asyncio.Event] = None
+        self._archive_media = archive_media
+        self._archive_tasks: set = set()
+        self._download_policy = download_policy or DownloadPolicy()
+        self.download_stats = DownloadStats()
+        self._video_sampling = video_sampling
+        self._region_of_interest = region_of_interest
+        self.crop_stats = CropStats()
+        self._warm_up_vision = warm_up_vision
+
+        # Stage timings and counters, instrumentation is a no-op unless metrics are given
+        self.metrics = metrics or DISABLED_METRICS
+        self.metrics.register_collector(self._collect_metrics)
+        self._pipeline: Optional[MediaPipeline] = None
+        self._scheduler: Optional[FairScheduler] = None
+        self._channel_names: Dict[int, str] = {}
 
         # Telegram client instance
         self._client = TelegramClient(
@@ -45,6 +161,264 @@ class TelegramOCR:
 
         await self._client.disconnect()
 
+    def _with_cache(self, vision: BaseVision) -> BaseVision:
+        """Put the OCR cache, if any, in front of a vision backend."""
+        return vision if self.ocr_cache is None else CachedVision(vision=vision, cache=self.ocr_cache)
+
+    def _channel_vision(self, channel_config: ChannelConfig) -> BaseVision:
+        """Return the vision backend a channel is read with."""
+        name = channel_config.vision_backend
+        if name is None:
+            return self._vision
+
+        if name not in self._channel_visions:
+            self._channel_visions[name] = self._with_cache(vision=create_vision(backend=name))
+        return self._channel_visions[name]
+
+    def _all_visions(self) -> List[BaseVision]:
+        """Every distinct vision backend in use."""
+        visions = {id(vision): vision for vision in [self._vision, *self._channel_visions.values()]}
+        return list(visions.values())
+
+    def _collect_metrics(self) -> List[Gauge]:
+        """Gauges of queue depths, caches and download statistics."""
+        gauges = [
+            ('downloads_reduced', {}, self.download_stats.reduced_downloads),
+            ('downloads_full', {}, self.download_stats.full_downloads),
+            ('download_escalations', {}, self.download_stats.escalations),
+            ('crop_ratio_mean', {}, self.crop_stats.mean_crop_ratio)]
+        if self._pipeline is not None:
+            gauges.extend(
+                ('pipeline_queue_depth', {'stage': stage}, depth)
+                for stage, depth in self._pipeline.queue_depths().items())
+        if self._scheduler is not None:
+            gauges.extend(
+                ('channel_queue_depth', {'channel': self._channel_names.get(chat_id, chat_id)}, depth)
+                for chat_id, depth in self._scheduler.queue_depths().items())
+        if self.ocr_cache is not None:
+            cache_stats = self.ocr_cache.stats
+            gauges.extend([
+                ('ocr_cache_hits', {}, cache_stats.memory_hits + cache_stats.disk_hits),
+                ('ocr_cache_misses', {}, cache_stats.misses),
+                ('ocr_cache_hit_rate', {}, cache_stats.hit_rate)])
+        return gauges
+
+    def _build_pipeline(
+        self,
+        config: Optional[PipelineConfig] = None,
+        delivery_stage: Optional[Callable[[MediaJob], Awaitable[None]]] = None,
+        on_done: Optional[Callable[[MediaJob], None]] = None,
+        on_failed: Optional[Callable[[MediaJob, Exception], None]] = None
+    ) -> MediaPipeline:
+        """Build the download, preprocessing, OCR and delivery pipeline, calling on_done or on_failed as jobs leave."""
+        config = config or self._pipeline_config
+        stages = [
+            PipelineStage('download', self._download_stage, config.download_concurrency),
+            PipelineStage('preprocess', self._preprocess_stage, config.preprocess_concurrency),
+            PipelineStage('ocr', self._ocr_stage, config.ocr_concurrency),
+            PipelineStage('delivery', delivery_stage or self._delivery_stage, config.delivery_concurrency)
+        ]
+        if on_done is not None or on_failed is not None:
+            stages = [
+                PipelineStage(
+                    stage.name,
+                    self._notify_when_done(handler=stage.handler, on_done=on_done, on_failed=on_failed),
+                    stage.concurrency)
+                for stage in stages]
+        return MediaPipeline(stages=stages, queue_size=config.queue_size, metrics=self.metrics)
+
+    @staticmethod
+    def _notify_when_done(
+        handler: Callable[[MediaJob], Awaitable[Optional[MediaJob]]],
+        on_done: Optional[Callable[[MediaJob], None]] = None,
+        on_failed: Optional[Callable[[MediaJob, Exception], None]] = None
+    ) -> Callable[[MediaJob], Awaitable[Optional[MediaJob]]]:
+        """Wrap a stage handler to call on_done for jobs it drops or finishes and on_failed for jobs it fails."""
+        async def handle(job: MediaJob) -> Optional[MediaJob]:
+            try:
+                result = await handler(job)
+            except Exception as e:
+                if on_failed is not None:
+                    on_failed(job, e)
+                raise
+            if result is None and on_done is not None:
+                on_done(job)
+            return result
+        return handle
+
+    async def _download_media(self, *args, **kwargs) -> Optional[bytes]:
+        """Download media into memory, waiting out flood waits Telethon does not sleep through itself."""
+        while True:
+            try:
+                return await self._client.download_media(*args, **kwargs)
+            except errors.FloodWaitError as e:
+                if e.seconds > MAX_FLOOD_WAIT:
+                    raise
+                print(f'Flood wait of {e.seconds} seconds on download')
+                self.metrics.increment('flood_waits_total')
+                await asyncio.sleep(e.seconds)
+
+    async def _download_stage(self, job: MediaJob) -> Optional[MediaJob]:
+        """Download photo or mp4 media attached to the message into memory."""
+        message_media = job.message.media
+
+        # If media is a photo or mp4 file
+        with self.metrics.span(key=job.trace_key, stage='download'):
+            if isinstance(message_media, MessageMediaPhoto):
+                await self._download_photo(job=job)
+            elif isinstance(message_media, MessageMediaDocument):
+                if 'video/mp4' in message_media.document.mime_type:
+                    job.media_bytes = await self._download_media(message_media, file=bytes)
+                    job.media_extension = 'mp4'
+
+        if job.media_bytes is None:
+            self.metrics.finish_trace(key=job.trace_key, outcome='no_media')
+            return None
+
+        if self._archive_media:
+            self._archive(job=job)
+        return job
+
+    async def _download_photo(self, job: MediaJob, full_resolution: bool = False) -> None:
+        """Download a photo, preferring a reduced size when the policy allows it."""
+        photo = job.message.media.photo
+        photo_size = None
+        if self._download_policy.thumbnail_first and not full_resolution:
+            photo_size = choose_photo_size(
+                photo=photo, min_dimension=self._download_policy.min_dimension)
+
+        if photo_size is not None:
+            job.media_bytes = await self._download_media(photo, file=bytes, thumb=photo_size)
+            self.download_stats.reduced_downloads += 1
+        else:
+            job.media_bytes = await self._download_media(photo, file=bytes)
+            self.download_stats.full_downloads += 1
+
+        job.media_extension = 'jpg'
+        job.reduced_resolution = photo_size is not None
+
+    async def _escalate(self, job: MediaJob) -> bool:
+        """Re-download a reduced photo at full resolution and pre-process it again."""
+        if not job.reduced_resolution:
+            return False
+
+        self.download_stats.escalations += 1
+        with self.metrics.span(key=job.trace_key, stage='escalation'):
+            await self._download_photo(job=job, full_resolution=True)
+            if self._archive_media:
+                self._archive(job=job)
+
+            await self._preprocess(job=job)
+        return job.image is not None
+
+    def _archive(self, job: MediaJob) -> None:
+        """Write downloaded media to the data directory in the background."""
+        media_path = f'{source_data_directory(channel=job.channel)}/{job.message.id}.{job.media_extension}'
+
+        def write_media(media_bytes: bytes) -> None:
+            with open(media_path, 'wb') as f:
+                f.write(media_bytes)
+
+        task = asyncio.create_task(asyncio.to_thread(write_media, job.media_bytes))
+        self._archive_tasks.add(task)
+        task.add_done_callback(self._archive_tasks.discard)
+
+    async def _preprocess(self, job: MediaJob) -> None:
+        """Decode and pre-process the downloaded media of a job."""
+        # The service is given the same sampling and cropping as in-process pre-processing
+        if self._preprocessing_service is not None:
+            processed_media = await self._preprocessing_service.apreprocess(
+                media_bytes=job.media_bytes,
+                parser_options=job.parser_options,
+                video_sampling=self._video_sampling,
+                region_of_interest=self._region_of_interest)
+        else:
+            processed_media = await asyncio.to_thread(
+                lambda: process_media(
+                    media_loader=MediaLoader(
+                        media_bytes=job.media_bytes, video_sampling=self._video_sampling),
+                    parser_options=job.parser_options,
+                    region_of_interest=self._region_of_interest))
+
+        # The encoded media is no longer needed once decoded
+        job.media_bytes = None
+
+        job.image = processed_media.image
+        job.image_hash = processed_media.image_hash
+        job.alternatives = processed_media.alternatives
+        if job.image is not None:
+            self.crop_stats.record(crop_ratio=processed_media.crop_ratio)
+        for step, seconds in processed_media.step_timings.items():
+            self.metrics.observe('preprocess_step_seconds', seconds, step=step)
+
+    async def _preprocess_stage(self, job: MediaJob) -> Optional[MediaJob]:
+        """Run CPU bound image pre-processing off the event loop."""
+        with self.metrics.span(key=job.trace_key, stage='preprocess'):
+            await self._preprocess(job=job)
+        if job.image is not None or await self._escalate(job=job):
+            return job
+        self.metrics.finish_trace(key=job.trace_key, outcome='preprocess_failed')
+
+    async def _recognize(self, job: MediaJob) -> None:
+        """Complete the pre-processed image of a job with the vision backend."""
+
+        # Re-encoded or resized reposts reuse the result of the earlier post
+        if self.near_duplicate_index is not None and job.image_hash is not None:
+            duplicate = self.near_duplicate_index.lookup(image_hash=job.image_hash)
+            if duplicate is not None:
+                self.metrics.increment('near_duplicate_hits_total')
+                job.response, _ = duplicate
+                return
+
+        # Top sampled video frames are all read and the majority result wins
+        vision = job.vision or self._vision
+        responses = await asyncio.gather(
+            *[self._complete(vision=vision, image=image) for image in [job.image] + job.alternatives])
+        parsed_responses = [parse_ocr_response(response=response) if response else None for response in responses]
+        job.response = vote_ocr_responses(responses=parsed_responses)
+
+        for response, parsed_response in zip(responses, parsed_responses):
+            if not response:
+                self.metrics.increment('ocr_empty_responses_total', backend=vision.name)
+            elif parsed_response is None:
+                self.metrics.increment('ocr_parse_failures_total', backend=vision.name)
+
+        if self.near_duplicate_index is not None and job.image_hash is not None and job.response is not None:
+            await asyncio.to_thread(
+                self.near_duplicate_index.add, image_hash=job.image_hash, result=job.response)
+
+    async def _complete(self, vision: BaseVision, image: MatLike) -> Optional[str]:
+        """Complete one image, timing the backend."""
+        with self.metrics.time('vision_seconds', backend=vision.name):
+            return await vision.aget_completion(image=image)
+
+    async def _ocr_stage(self, job: MediaJob) -> MediaJob:
+        """Run the vision completion without blocking the event loop."""
+        with self.metrics.span(key=job.trace_key, stage='ocr'):
+            await self._recognize(job=job)
+
+        # A failed read on a reduced photo is retried once at full resolution
+        if job.response is None and await self._escalate(job=job):
+            await self._recognize(job=job)
+        return job
+
+    async def _delivery_stage(self, job: MediaJob) -> None:
+        """Send parsed response to Telegram channel."""
+        message_date = job.message.date
+        if job.response is not None:
+            text = f'Text parsed in message on {message_date}: {job.response}'
+        else:
+            message_link = f"https://t.me/{clean_channel(channel=job.channel)}/{job.message.id}"
+            text = f"ISSUE WITH PARSING TEXT IN MESSAGE on {message_date}.\nPlease see link to message: {message_link}"
+
+        try:
+            with self.metrics.span(key=job.trace_key, stage='delivery'):
+                await self._client.send_message(job.channel_to_send, text)
+        except Exception:
+            self.metrics.finish_trace(key=job.trace_key, outcome='delivery_failed')
+            raise
+        self.metrics.finish_trace(key=job.trace_key, outcome='parsed' if job.response is not None else 'unparsed')
+
     async def stream_images_in_messages(
         self,
         telegram_channel: str,
@@ -52,66 +426,211 @@ class TelegramOCR:
         telegram_channel_keywords: list
     ) -> None:
         """Stream messages from Telegram channel and process images."""
+        await self.stream_channels(
+            channels=[
+                ChannelConfig(
+                    channel=telegram_channel,
+                    channel_to_send=telegram_channel_to_send,
+                    channel_keywords=telegram_channel_keywords)])
+
+    async def stream_channels(self, channels: List[ChannelConfig]) -> None:
+        """Stream messages from several Telegram channels through one client and process images."""
+
+        # Backends are resolved up front so they can all warm up
+        channel_visions = [self._channel_vision(channel_config=channel_config) for channel_config in channels]
 
-        path_source_data_image = source_data_directory(channel=telegram_channel)
+        # Model weights load in the background while the client connects
+        warm_up_task = None
+        if self._warm_up_vision:
+            warm_up_task = asyncio.gather(
+                *[asyncio.to_thread(vision.warm_up) for vision in self._all_visions()])
 
         await self._client.connect()
 
-        channel_entity = await self._client.get_entity(telegram_channel)
+        # Messages are routed by the marked peer id of their chat
+        channel_entities = [await self._client.get_entity(channel_config.channel) for channel_config in channels]
+        routes = {
+            utils.get_peer_id(entity): (channel_config, vision)
+            for entity, channel_config, vision in zip(channel_entities, channels, channel_visions)}
+
+        self._channel_names = {chat_id: channel_config.channel for chat_id, (channel_config, _) in routes.items()}
+
+        def release(job: MediaJob, error: Optional[Exception] = None) -> None:
+            scheduler.done(key=job.message.chat_id)
 
-        @self._client.on(events.NewMessage(chats=channel_entity))
+        pipeline = self._pipeline = self._build_pipeline(on_done=release, on_failed=release)
+        pipeline.start()
+
+        # Each channel queues on its own and only has a few messages in the pipeline, so it cannot starve the rest
+        scheduler = self._scheduler = FairScheduler(
+            pipeline=pipeline,
+            queue_size=self._pipeline_config.channel_queue_size,
+            max_in_flight=self._pipeline_config.channel_in_flight)
+        scheduler.start()
+
+        # Listening only starts once the first message would not wait on the warm-up
+        if warm_up_task is not None:
+            try:
+                await warm_up_task
+            except Exception as e:
+                print(f'Vision warm-up failed, weights will load on first use: {e}')
+
+        @self._client.on(events.NewMessage(chats=channel_entities))
         async def handler(event):
-            """Telegram media handler."""
+            """Telegram media handler, only routes and enqueues work for the pipeline."""
 
             # Message info
             message = event.message
-            message_media = message.media
-            if message_media:
-                media_path = None
-
-                # If media is a photo or mp4 file
-                if isinstance(message_media, MessageMediaPhoto):
-                    media_path = await self._client.download_media(
-                        message_media.photo,
-                        f'{path_source_data_image}/{message.id}.jpg'
-                    )
-                elif isinstance(message_media, MessageMediaDocument):
-                    if 'video/mp4' in message_media.document.mime_type:
-                        media_path = await self._client.download_media(
-                            message_media,
-                            f'{path_source_data_image}/{message.id}.mp4'
-                        )
-
-                # Media parser instantiation
-                if media_path is not None:
-                    media_parser = MediaParser(
-                        media_loader=MediaLoader(
-                            media_path=media_path
-                        )
-                    )
-                    if media_parser.image is not None:
-                        media_parser.remove_small_contours()
-
-                        # After image processing, encode image to base64 representation
-                        base64_image = encode_image(image=media_parser.image)
-
-                        response = self.openai_vision.get_completion(
-                            prompt='What are the largest characters in this image? Only output the text in the image.',
-                            base64_image=base64_image
-                        )
-                        
-                        # Check if any keywords are in text of message
-                        do_keywords = any(i for i in telegram_channel_keywords if i in message.text)
-                        response_parsed = parse_ocr_response(response=response)
-
-                        # Send parsed response to Telegram channel
-                        if do_keywords:
-                            if response_parsed is not None:
-                                message = f'Text parsed in message on {message.date}: {response_parsed}'
-                                await self._client.send_message(telegram_channel_to_send, message)
-                            else:
-                                message_link = f"https://t.me/{clean_channel(channel=telegram_channel)}/{message.id}"
-                                message = f"ISSUE WITH PARSING TEXT IN MESSAGE on {message.date}.\nPlease see link to message: {message_link}"
-                                await self._client.send_message(telegram_channel_to_send, message)
-
-        await self._client.run_until_disconnected()
\ No newline at end of file
+            route = routes.get(event.chat_id)
+            if route is None:
+                return
+            channel_config, vision = route
+
+            # Check if any keywords are in text of message, results are only sent if so
+            do_keywords = any(i for i in channel_config.channel_keywords if i in (message.text or ''))
+
+            if message.media and do_keywords:
+                job = MediaJob(
+                    message=message,
+                    channel=channel_config.channel,
+                    channel_to_send=channel_config.channel_to_send,
+                    vision=vision,
+                    parser_options=channel_config.parser_options or None)
+                self.metrics.start_trace(key=job.trace_key, message_id=message.id, channel=job.channel)
+                await scheduler.submit(key=event.chat_id, item=job)
+
+        # Listen until disconnected or asked to shut down
+        self._shutdown_event = asyncio.Event()
+        shutdown_task = asyncio.create_task(self._shutdown_event.wait())
+        try:
+            await asyncio.wait(
+                [self._client.disconnected, shutdown_task],
+                return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            shutdown_task.cancel()
+            self._client.remove_event_handler(handler)
+
+            # Drain before disconnecting so queued results can still be delivered
+            drain = self._pipeline_config.drain_on_shutdown
+            await scheduler.stop(drain=drain)
+            await pipeline.stop(drain=drain)
+            await asyncio.gather(*self._archive_tasks, return_exceptions=True)
+            for vision in self._all_visions():
+                await vision.aclose()
+            self.metrics.close()
+            await self._client.disconnect()
+
+    async def backfill(
+        self,
+        channel_config: ChannelConfig,
+        store: BackfillStore,
+        min_id: int = 0,
+        max_id: int = 0,
+        offset_date: Optional[datetime] = None,
+        pipeline_config: Optional[PipelineConfig] = None,
+        checkpoint_interval: float = 10.0
+    ) -> int:
+        """
+        OCR a channel's history oldest first, storing results locally instead of sending them.
+
+        Messages after min_id, before max_id when set and after offset_date when
+        set are read, resuming after the store's checkpoint for the channel.
+        Only runs starting at the checkpoint move it, a run after a later
+        min_id or an offset_date leaves it for a full run. Messages whose
+        processing failed hold the checkpoint back, so they are read again on
+        the next run, until the store gives up on them. Returns the number of
+        messages sent through the pipeline.
+        """
+        channel = channel_config.channel
+        vision = self._channel_vision(channel_config=channel_config)
+        if self._warm_up_vision:
+            await asyncio.to_thread(vision.warm_up)
+
+        # A client connected by the caller is left connected
+        connected_here = not self._client.is_connected()
+        if connected_here:
+            await self._client.connect()
+        entity = await self._client.get_entity(channel)
+
+        # Ranged runs skip messages before their range, the checkpoint would move past them
+        stored_checkpoint = store.checkpoint(channel=channel)
+        moves_checkpoint = offset_date is None and min_id <= stored_checkpoint
+        if not moves_checkpoint:
+            print(f'Backfill of {channel} starts after its checkpoint {stored_checkpoint}, leaving it unchanged')
+
+        checkpoint = BackfillCheckpoint(last_id=max(min_id, stored_checkpoint))
+        last_saved = time.monotonic()
+
+        def save_checkpoint() -> None:
+            if moves_checkpoint:
+                store.save_checkpoint(channel=channel, message_id=checkpoint.watermark)
+            else:
+                store.commit()
+
+        def on_done(job: MediaJob) -> None:
+            nonlocal last_saved
+            checkpoint.finished(message_id=job.message.id)
+            if time.monotonic() - last_saved >= checkpoint_interval:
+                save_checkpoint()
+                last_saved = time.monotonic()
+
+        def on_failed(job: MediaJob, error: Exception) -> None:
+            # Messages that keep failing are given up on so they stop holding the checkpoint back
+            if store.record_failure(channel=channel, message_id=job.message.id, error=repr(error)):
+                print(f'Giving up on message {job.message.id} of {channel}: {error!r}')
+                on_done(job)
+
+        async def store_stage(job: MediaJob) -> None:
+            """Stage the parsed response in the local store."""
+            store.add(
+                channel=channel,
+                message_id=job.message.id,
+                date=job.message.date.isoformat() if job.message.date else None,
+                response=job.response,
+                image_hash=job.image_hash)
+            self.metrics.increment('backfilled_messages_total', channel=channel)
+
+        pipeline = self._build_pipeline(
+            config=pipeline_config or BACKFILL_PIPELINE_CONFIG,
+            delivery_stage=store_stage,
+            on_done=on_done,
+            on_failed=on_failed)
+        pipeline.start()
+
+        submitted = 0
+        drain = False
+        try:
+            async for message in self._client.iter_messages(
+                entity, min_id=checkpoint.watermark, max_id=max_id, offset_date=offset_date, reverse=True
+            ):
+                # Same filter as live messages, results only matter for posts with the keywords
+                do_keywords = any(i for i in channel_config.channel_keywords if i in (message.text or ''))
+                if not (message.media and do_keywords):
+                    checkpoint.skipped(message_id=message.id)
+                    continue
+
+                checkpoint.started(message_id=message.id)
+                await pipeline.submit(
+                    MediaJob(
+                        message=message,
+                        channel=channel,
+                        channel_to_send=channel_config.channel_to_send,
+                        vision=vision,
+                        parser_options=channel_config.parser_options or None))
+                submitted += 1
+            drain = True
+        finally:
+            # Interrupted backfills keep the checkpoint below every message still in flight
+            await pipeline.stop(drain=drain)
+            await asyncio.gather(*self._archive_tasks, return_exceptions=True)
+            save_checkpoint()
+            if connected_here:
+                await self._client.disconnect()
+
+        print(f'Backfilled {submitted} messages of {channel} up to message {checkpoint.watermark}')
+        return submitted
+
+    def request_shutdown(self) -> None:
+        """Stop listening for new messages and shut the pipeline down."""
+        if self._shutdown_event is not None:
+            self._shutdown_event.set()
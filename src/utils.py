@@ -2,12 +2,86 @@ import os
 import json
 import base64
 import re
-from typing import Optional
-
-from dataclasses import dataclass
+from collections import Counter
+from functools import lru_cache
+from typing import (
+    List,
+    Optional)
+
+from dataclasses import (
+    dataclass,
+    field)
 import cv2
 from cv2.typing import MatLike
 
+from src.media.parser import load_parser_profile
+from src.vision._models import ImageFormat
+
+MIME_TYPES = {
+    ImageFormat.JPEG: 'image/jpeg',
+    ImageFormat.PNG: 'image/png',
+    ImageFormat.WEBP: 'image/webp'}
+
+@dataclass
+class EncodingPolicy:
+    """
+    How images are encoded before they are sent to a vision backend.
+
+    quality applies to JPEG and WebP, where a WebP quality above 100 is
+    lossless, and png_compression to PNG. Images whose longest side exceeds
+    max_dimension are downscaled first. With bilevel, images are thresholded
+    and packed as 1-bit PNG, which suits the binary images MediaParser produces.
+    """
+
+    image_format: ImageFormat = ImageFormat.JPEG
+    quality: int = 95
+    png_compression: int = 3
+    max_dimension: Optional[int] = None
+    grayscale: bool = False
+    bilevel: bool = False
+
+    def __post_init__(self):
+        if self.bilevel and self.image_format is not ImageFormat.PNG:
+            raise ValueError('bilevel packing is only supported for PNG')
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.image_format]
+
+    @property
+    def parameters(self) -> List[int]:
+        """
+        OpenCV encoding parameters of the policy.
+        """
+
+        if self.image_format is ImageFormat.JPEG:
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        if self.image_format is ImageFormat.WEBP:
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        return [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression, cv2.IMWRITE_PNG_BILEVEL, int(self.bilevel)]
+
+# Previous behaviour, default quality JPEG at full size
+DEFAULT_ENCODING_POLICY = EncodingPolicy()
+
+# Lossless 1-bit PNG, an order of magnitude smaller than JPEG for pre-processed images
+BILEVEL_ENCODING_POLICY = EncodingPolicy(image_format=ImageFormat.PNG, png_compression=6, bilevel=True)
+
+@dataclass
+class ChannelConfig:
+    """
+    A watched channel, its keywords, destination and how its media is read.
+
+    vision_backend names a registered backend, None uses the default one,
+    and parser_options are passed to MediaParser for this channel's media,
+    on top of any parser options configured for its backend.
+    """
+
+    channel: str
+    channel_to_send: str
+    channel_keywords: list
+    vision_backend: Optional[str] = None
+    parser_options: dict = field(default_factory=dict)
+
 @dataclass
 class TelegramInfo:
     app_id: int
@@ -16,9 +90,16 @@ class TelegramInfo:
     channel: str
     channel_to_send: str
     channel_keywords: list
+    channels: List[ChannelConfig] = field(default_factory=list)
+
+@lru_cache(maxsize=None)
+def load_config() -> dict:
+    """
+    Load the config file on first use.
+    """
 
-with open('config.json', 'r') as f:
-    config = json.load(f)
+    with open('config.json', 'r') as f:
+        return json.load(f)
 
 def clean_channel(channel: str) -> str:
     return channel.replace('@', '')
@@ -28,10 +109,27 @@ def load_api_info() -> TelegramInfo:
     Load in all API info from both config file and environment variables.
     """
 
-    # Config variables
-    TELEGRAM_CHANNEL = config['telegram_channel']
-    TELEGRAM_CHANNEL_TO_SEND = config['telegram_channel_to_send']
-    TELEGRAM_CHANNEL_KEYWORDS = config['telegram_keywords']
+    # Config variables, either a list of channels or the single channel keys
+    config = load_config()
+
+    # Backend parser options are given inline or as the path of a tuned profile
+    backend_parser_options = {
+        backend: load_parser_profile(profile_path=options) if isinstance(options, str) else options
+        for backend, options in config.get('backend_parser_options', {}).items()}
+
+    TELEGRAM_CHANNELS = [
+        ChannelConfig(
+            channel=channel['telegram_channel'],
+            channel_to_send=channel['telegram_channel_to_send'],
+            channel_keywords=channel['telegram_keywords'],
+            vision_backend=channel.get('vision_backend'),
+            parser_options={
+                **backend_parser_options.get(channel.get('vision_backend', config.get('vision_backend')), {}),
+                **channel.get('parser_options', {})})
+        for channel in config.get('channels', [config])]
+    TELEGRAM_CHANNEL = TELEGRAM_CHANNELS[0].channel
+    TELEGRAM_CHANNEL_TO_SEND = TELEGRAM_CHANNELS[0].channel_to_send
+    TELEGRAM_CHANNEL_KEYWORDS = TELEGRAM_CHANNELS[0].channel_keywords
 
     # Environment variables
     TELEGRAM_APP_ID = os.environ['TELEGRAM_APP_ID']
@@ -44,7 +142,8 @@ def load_api_info() -> TelegramInfo:
         phone_number=TELEGRAM_PHONE_NUMBER,
         channel=TELEGRAM_CHANNEL,
         channel_to_send=TELEGRAM_CHANNEL_TO_SEND,
-        channel_keywords=TELEGRAM_CHANNEL_KEYWORDS
+        channel_keywords=TELEGRAM_CHANNEL_KEYWORDS,
+        channels=TELEGRAM_CHANNELS
     )
 
 def source_data_directory(channel: str) -> None:
@@ -52,7 +151,14 @@ def source_data_directory(channel: str) -> None:
     Return source data directory.
     """
 
-    return f"{config['data_dir']}/{clean_channel(channel=channel)}"
+    return f"{load_config()['data_dir']}/{clean_channel(channel=channel)}"
+
+def data_file_path(file_name: str) -> str:
+    """
+    Return path of a file stored directly under the data directory.
+    """
+
+    return f"{load_config()['data_dir']}/{file_name}"
 
 def source_data_directories(channel: str) -> None:
     """
@@ -62,22 +168,48 @@ def source_data_directories(channel: str) -> None:
     path = source_data_directory(channel=channel)
     os.makedirs(path, exist_ok=True)
 
-def encode_image(image: MatLike) -> bytes:
+def _prepare_image(image: MatLike, policy: EncodingPolicy) -> MatLike:
+    """
+    Downscale and reduce the channels of an image as the encoding policy asks.
+    """
+
+    longest_side = max(image.shape[:2])
+    if policy.max_dimension is not None and longest_side > policy.max_dimension:
+        scale = policy.max_dimension / longest_side
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    if (policy.grayscale or policy.bilevel) and image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    # 1-bit packing keeps only whether a pixel is non-zero, so grey pixels are thresholded first
+    if policy.bilevel:
+        _, image = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY)
+    return image
+
+def _encode(image: MatLike, policy: EncodingPolicy) -> MatLike:
+    """
+    Encode an image, returning OpenCV's encoded buffer without copying it.
+    """
+
+    _, img_encoded = cv2.imencode(
+        policy.image_format.value, _prepare_image(image=image, policy=policy), policy.parameters)
+    return img_encoded
+
+def encode_image(image: MatLike, policy: EncodingPolicy = DEFAULT_ENCODING_POLICY) -> bytes:
     """
     Given MatLike object from cv2, return bytes representation of image.
     """
 
-    _, img_encoded = cv2.imencode('.jpg', image)
-    img_bytes = img_encoded.tobytes()
+    img_bytes = _encode(image=image, policy=policy).tobytes()
     return img_bytes
 
-def encode_image_base64(image: MatLike) -> bytes:
+def encode_image_base64(image: MatLike, policy: EncodingPolicy = DEFAULT_ENCODING_POLICY) -> str:
     """
     Given MatLike object from cv2, return base64 representation of image.
     """
 
-    img_bytes = encode_image(image=image)
-    img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+    # Encoded straight from OpenCV's buffer, base64 output is ASCII so decoding is a plain copy
+    img_base64 = base64.b64encode(_encode(image=image, policy=policy)).decode('ascii')
     return img_base64
 
 def parse_ocr_response(response: str) -> Optional[str]:
@@ -90,4 +222,16 @@ def parse_ocr_response(response: str) -> Optional[str]:
 
     # Ignore reponse if length is more than 5 letters
     if len(cleaned_response) in range(1, 6):
-        return cleaned_response
\ No newline at end of file
+        return cleaned_response
+
+def vote_ocr_responses(responses: List[Optional[str]]) -> Optional[str]:
+    """
+    Majority vote over parsed OCR responses, ties go to the earliest response.
+    """
+
+    votes = Counter(response for response in responses if response is not None)
+    if not votes:
+        return None
+
+    top_count = max(votes.values())
+    return next(response for response in responses if votes.get(response) == top_count)
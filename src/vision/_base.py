@@ -1,4 +1,9 @@
-from typing import Any
+import asyncio
+from typing import (
+    Any,
+    List,
+    Optional,
+    Tuple)
 
 from cv2.typing import MatLike
 from abc import (
@@ -6,10 +11,86 @@ from abc import (
     abstractmethod)
 
 class BaseVision(ABC):
+    # Default cap on in-flight requests per backend instance
+    _max_concurrent_requests: int = 8
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Identifies the backend configuration when caching its results.
+        """
+
+        return type(self).__name__
+
+    @property
+    def name(self) -> str:
+        """
+        Short name of the backend that never changes, e.g. for metric labels.
+        """
+
+        return type(self).__name__
+
     @abstractmethod
     def _process_image(self, image: MatLike) -> Any:
         pass
 
     @abstractmethod
-    def get_completion(self, prompt: str) -> str:
-        pass
\ No newline at end of file
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        pass
+
+    def get_completions(self, images: List[MatLike]) -> List[Optional[str]]:
+        """
+        Batch completion, by default each image is completed one after another.
+        """
+
+        return [self.get_completion(image=image) for image in images]
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Async completion, by default the blocking completion runs in a worker thread.
+        """
+
+        async with self._request_slot():
+            return await asyncio.to_thread(self.get_completion, image=image)
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Completion with the backend's confidence in it, None if the backend reports none.
+        """
+
+        return self.get_completion(image=image), None
+
+    async def aget_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Async completion with confidence, by default the async completion without one.
+        """
+
+        # Backends reporting a confidence run their blocking completion in a worker thread
+        if type(self).get_completion_with_confidence is not BaseVision.get_completion_with_confidence:
+            async with self._request_slot():
+                return await asyncio.to_thread(self.get_completion_with_confidence, image=image)
+        return await self.aget_completion(image=image), None
+
+    def warm_up(self) -> None:
+        """
+        Load weights and run a first inference ahead of real traffic, by default nothing to do.
+        """
+
+        pass
+
+    async def aclose(self) -> None:
+        """
+        Release any connections held by the async client.
+        """
+
+        pass
+
+    def _request_slot(self) -> asyncio.Semaphore:
+        """
+        Semaphore capping the number of in-flight requests for this backend.
+        """
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_requests)
+        return self._semaphore
@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Optional,
+    Tuple)
+
+from cv2.typing import MatLike
+
+from src.media.hashing import phash
+
+# Number of writes between sweeps of the on-disk tier
+EVICTION_INTERVAL = 100
+
+@dataclass
+class CacheStats:
+    """
+    Hit and miss counters of the OCR cache.
+    """
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+def cache_key(image: MatLike, backend_key: str) -> str:
+    """
+    Content address of a pre-processed image for a given backend and prompt.
+    """
+
+    return f'{backend_key}:{phash(image=image):016x}'
+
+class OCRCache:
+    """
+    Two tier OCR result cache.
+
+    An in-memory LRU sits in front of an optional SQLite store, which expires
+    entries after a TTL and keeps at most max_disk_entries rows.
+    """
+    def __init__(
+        self,
+        max_memory_entries: int = 1024,
+        database_path: Optional[str] = None,
+        ttl: float = 7 * 24 * 60 * 60,
+        max_disk_entries: int = 100_000
+    ):
+        self._max_memory_entries = max_memory_entries
+        self._database_path = database_path
+        self._ttl = ttl
+        self._max_disk_entries = max_disk_entries
+
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = CacheStats()
+
+        self._connection: Optional[sqlite3.Connection] = None
+        if self._database_path is not None:
+            os.makedirs(os.path.dirname(self._database_path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self._database_path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS ocr_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS ocr_cache_accessed ON ocr_cache (accessed)')
+            self._connection.commit()
+
+    def _remember(self, key: str, value: str) -> None:
+        """
+        Insert into the in-memory tier, evicting the least recently used entry.
+        """
+
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
+
+    @property
+    def on_disk(self) -> bool:
+        return self._connection is not None
+
+    def get_from_memory(self, key: str) -> Tuple[bool, Optional[str]]:
+        """
+        Look up a key in the in-memory tier only, misses are left for get to count.
+        """
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return True, self._memory[key]
+            return False, None
+
+    def get(self, key: str) -> Tuple[bool, Optional[str]]:
+        """
+        Look up a key, returning whether it was found and the cached result.
+        """
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return True, self._memory[key]
+
+            if self._connection is not None:
+                now = time.time()
+                row = self._connection.execute(
+                    'SELECT value FROM ocr_cache WHERE key = ? AND created >= ?',
+                    (key, now - self._ttl)).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        'UPDATE ocr_cache SET accessed = ? WHERE key = ?', (now, key))
+                    self._connection.commit()
+                    self._remember(key=key, value=row[0])
+                    self.stats.disk_hits += 1
+                    return True, row[0]
+
+            self.stats.misses += 1
+            return False, None
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Store a result in both tiers.
+        """
+
+        with self._lock:
+            self._remember(key=key, value=value)
+
+            if self._connection is not None:
+                now = time.time()
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO ocr_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                    (key, value, now, now))
+                self._writes += 1
+                if self._writes % EVICTION_INTERVAL == 0:
+                    self._evict(now=now)
+                self._connection.commit()
+
+    def _evict(self, now: float) -> None:
+        """
+        Remove expired rows and trim the store to its size limit.
+        """
+
+        self._connection.execute(
+            'DELETE FROM ocr_cache WHERE created < ?', (now - self._ttl,))
+        self._connection.execute(
+            'DELETE FROM ocr_cache WHERE key IN ('
+            'SELECT key FROM ocr_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self._max_disk_entries,))
+
+    def close(self) -> None:
+        """
+        Close the on-disk store.
+        """
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
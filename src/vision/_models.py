@@ -1,5 +1,17 @@
 from enum import Enum
 
+class VisionBackend(Enum):
+    """
+    Vision backends available through the registry.
+    """
+
+    OPENAI = 'openai'
+    GOOGLE = 'google'
+    AZURE = 'azure'
+    EASYOCR = 'easyocr'
+    TROCR = 'trocr'
+    MODEL_SERVER = 'model-server'
+
 class OpenAIModels(Enum):
     """
     All OpenAI models available through API.
@@ -7,6 +19,15 @@ class OpenAIModels(Enum):
 
     GPT_4_VISION = 'gpt-4-vision-preview'
 
+class ImageFormat(Enum):
+    """
+    Image formats payloads can be encoded to, with their file extension.
+    """
+
+    JPEG = '.jpg'
+    PNG = '.png'
+    WEBP = '.webp'
+
 class LocalModels(Enum):
     """
     All local models available.
@@ -23,6 +44,16 @@ class LocalModels(Enum):
     TROCR_LARGE_HAND_WRITTEN = 'microsoft/trocr-large-handwritten'
 
 
+class TrOCREngine(Enum):
+    """
+    Inference engines available for TrOCR models.
+    """
+
+    PYTORCH = 'pytorch'
+    PYTORCH_INT8 = 'pytorch-int8'
+    ONNX = 'onnx'
+    ONNX_INT8 = 'onnx-int8'
+
 class ModelsDirectory(Enum):
     """
     All local models directories.
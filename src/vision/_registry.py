@@ -0,0 +1,45 @@
+import importlib
+from typing import (
+    Dict,
+    Tuple,
+    Type,
+    Union)
+
+from src.vision._base import BaseVision
+from src.vision._models import VisionBackend
+
+# Backend name to module and class, modules are only imported when a backend is created
+VISION_BACKENDS: Dict[str, Tuple[str, str]] = {
+    VisionBackend.OPENAI.value: ('src.vision.vision_openai', 'OpenAIVision'),
+    VisionBackend.GOOGLE.value: ('src.vision.vision_google', 'GoogleVision'),
+    VisionBackend.AZURE.value: ('src.vision.vision_azure', 'AzureVision'),
+    VisionBackend.EASYOCR.value: ('src.vision.vision_easyocr', 'EasyOCR'),
+    VisionBackend.TROCR.value: ('src.vision.vision_trocr', 'TrOCR'),
+    VisionBackend.MODEL_SERVER.value: ('src.vision.vision_server', 'ModelServerVision'),
+}
+
+def register_vision_backend(name: str, module_name: str, class_name: str) -> None:
+    """
+    Register a backend class by module path so it can be created by name.
+    """
+
+    VISION_BACKENDS[name] = (module_name, class_name)
+
+def vision_backend_class(backend: Union[VisionBackend, str]) -> Type[BaseVision]:
+    """
+    Import a backend's module and return its class.
+    """
+
+    name = backend.value if isinstance(backend, VisionBackend) else backend
+    if name not in VISION_BACKENDS:
+        raise ValueError(f'{name} is not a registered vision backend')
+
+    module_name, class_name = VISION_BACKENDS[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+def create_vision(backend: Union[VisionBackend, str], **options) -> BaseVision:
+    """
+    Create a backend by name, importing its dependencies only now.
+    """
+
+    return vision_backend_class(backend=backend)(**options)
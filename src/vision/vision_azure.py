@@ -1,8 +1,13 @@
+import asyncio
 import time
 import os
-from typing import Optional
+from typing import (
+    Iterator,
+    List,
+    Optional)
 import io
 
+import aiohttp
 from azure.cognitiveservices.vision.computervision import ComputerVisionClient
 from azure.cognitiveservices.vision.computervision.models import OperationStatusCodes
 from cv2.typing import MatLike
@@ -10,14 +15,74 @@ from msrest.authentication import CognitiveServicesCredentials
 
 from src.vision._base import BaseVision
 from src.utils import (
-    encode_image, 
+    BILEVEL_ENCODING_POLICY,
+    EncodingPolicy,
+    encode_image,
     parse_ocr_response)
 
+READ_API_PATH = '/vision/v3.2/read/analyze'
+
+class ReadPollBackoff:
+    """
+    Adaptive polling schedule for the asynchronous Read operation.
+
+    Delays grow geometrically from an initial delay which tracks how long
+    recent operations took, so quick operations are picked up quickly
+    without hammering the endpoint on slow ones.
+    """
+    def __init__(
+        self,
+        initial_delay: float = 0.25,
+        min_delay: float = 0.05,
+        max_delay: float = 2.0,
+        factor: float = 1.5,
+        smoothing: float = 0.3
+    ):
+        self._initial_delay = initial_delay
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._factor = factor
+        self._smoothing = smoothing
+
+    def delays(self) -> Iterator[float]:
+        """
+        Yield successive delays between polls.
+        """
+
+        delay = self._initial_delay
+        while True:
+            yield delay
+            delay = min(delay * self._factor, self._max_delay)
+
+    def record(self, duration: float) -> None:
+        """
+        Adapt the initial delay to the duration of a finished operation.
+        """
+
+        target = min(max(duration / 2, self._min_delay), self._max_delay)
+        self._initial_delay += self._smoothing * (target - self._initial_delay)
+
+def _retry_after(headers, default: float) -> float:
+    """
+    Honour a Retry-After header when the service sends one.
+    """
+
+    try:
+        return max(float(headers.get('Retry-After', default)), default)
+    except (TypeError, ValueError):
+        return default
+
 class AzureVision(BaseVision):
     """
     Microsoft Azure AI vision API connection.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrent_requests: int = 8,
+        encoding_policy: Optional[EncodingPolicy] = None
+    ):
+        self._max_concurrent_requests = max_concurrent_requests
+        self._encoding_policy = encoding_policy or BILEVEL_ENCODING_POLICY
         self._key = os.environ['AZURE_API_KEY']
         self._endpoint = os.environ['AZURE_ENDPOINT']
 
@@ -31,16 +96,27 @@ class AzureVision(BaseVision):
 
         self._client = ComputerVisionClient(
             self._endpoint, CognitiveServicesCredentials(self._key))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._backoff = ReadPollBackoff()
         
     def _process_image(self, image: MatLike) -> bytes:
         """
         Transform open-cv image object into bytes.
         """
 
-        bytes_image = encode_image(image=image)
+        bytes_image = encode_image(image=image, policy=self._encoding_policy)
 
         return bytes_image
 
+    def _parse_lines(self, lines: List[str]) -> Optional[str]:
+        """
+        Concatenate detected lines and parse the result.
+        """
+
+        detections_concat = ''.join(lines)
+        result = parse_ocr_response(response=detections_concat)
+        return result
+
     def get_completion(self, image: MatLike) -> Optional[str]:
         """
         Get text detection within image from Azure vision API.
@@ -48,6 +124,7 @@ class AzureVision(BaseVision):
 
         bytes_image = self._process_image(image=image)
 
+        start = time.perf_counter()
         read_response = self._client.read_in_stream(io.BytesIO(bytes_image), raw=True)
 
         # Get the operation location (URL with an ID at the end)
@@ -55,16 +132,72 @@ class AzureVision(BaseVision):
         operation_id = read_operation_location.split("/")[-1]
 
         # Call the "GET" API and wait for it to retrieve the results 
-        while True:
+        for delay in self._backoff.delays():
             read_result = self._client.get_read_result(operation_id)
             if read_result.status.lower() not in ['notstarted', 'running']:
                 break
-            time.sleep(1)
+            time.sleep(delay)
+        self._backoff.record(duration=time.perf_counter() - start)
 
         # Print results, line by line
         if read_result.status == OperationStatusCodes.succeeded:
-            detections_concat = ''.join(
+            return self._parse_lines(
                 [line.text for text_result in read_result.analyze_result.read_results
                  for line in text_result.lines])
-            result = parse_ocr_response(response=detections_concat)
-            return result
\ No newline at end of file
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Lazily create a session with a pooled keep-alive connector.
+        """
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._max_concurrent_requests,
+                    keepalive_timeout=30),
+                headers={'Ocp-Apim-Subscription-Key': self._key})
+        return self._session
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Get text detection within image from Azure vision API without blocking.
+        """
+
+        # Encoding is CPU bound and runs off the event loop
+        bytes_image = await asyncio.to_thread(self._process_image, image=image)
+        session = self._get_session()
+
+        async with self._request_slot():
+            start = time.perf_counter()
+            async with session.post(
+                f"{self._endpoint.rstrip('/')}{READ_API_PATH}",
+                data=bytes_image,
+                headers={'Content-Type': 'application/octet-stream'}) as read_response:
+                read_response.raise_for_status()
+                read_operation_location = read_response.headers['Operation-Location']
+
+            # Poll the operation with backoff, yielding to the event loop in between
+            for delay in self._backoff.delays():
+                async with session.get(read_operation_location) as result_response:
+                    result_response.raise_for_status()
+                    read_result = await result_response.json()
+                    retry_delay = _retry_after(result_response.headers, default=delay)
+
+                if read_result['status'].lower() not in ['notstarted', 'running']:
+                    break
+                await asyncio.sleep(retry_delay)
+            self._backoff.record(duration=time.perf_counter() - start)
+
+        if read_result['status'].lower() == 'succeeded':
+            return self._parse_lines(
+                [line['text'] for text_result in read_result['analyzeResult']['readResults']
+                 for line in text_result['lines']])
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled connections of the async session.
+        """
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,153 @@
+import asyncio
+from typing import (
+    Any,
+    List,
+    Optional,
+    Tuple)
+
+from cv2.typing import MatLike
+
+from src.vision._base import BaseVision
+
+class BatchingVision(BaseVision):
+    """
+    Micro-batching wrapper around another vision backend.
+
+    Async completions arriving within a short time window are collected and
+    sent to the wrapped backend as one batch through get_completions.
+    """
+    def __init__(
+        self,
+        vision: BaseVision,
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,
+        max_concurrent_batches: int = 1
+    ):
+        self._vision = vision
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._max_concurrent_requests = max_concurrent_batches
+
+        self._pending: List[Tuple[MatLike, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: set = set()
+
+    @property
+    def cache_key(self) -> str:
+        return self._vision.cache_key
+
+    @property
+    def name(self) -> str:
+        return self._vision.name
+
+    def _process_image(self, image: MatLike) -> Any:
+        """
+        Delegate image processing to the wrapped backend.
+        """
+
+        return self._vision._process_image(image=image)
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Blocking completions are not batched and go straight to the wrapped backend.
+        """
+
+        return self._vision.get_completion(image=image)
+
+    def get_completions(self, images: List[MatLike]) -> List[Optional[str]]:
+        """
+        Delegate an explicit batch to the wrapped backend.
+        """
+
+        return self._vision.get_completions(images=images)
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Completions with confidence are not batched and go straight to the wrapped backend.
+        """
+
+        return self._vision.get_completion_with_confidence(image=image)
+
+    async def aget_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Completions with confidence are not batched and go straight to the wrapped backend.
+        """
+
+        return await self._vision.aget_completion_with_confidence(image=image)
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Queue the image for the next batch and wait for its result.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image, future))
+
+        # Flush as soon as the batch is full, otherwise when the window closes
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """
+        Hand the pending requests over to a batch task.
+        """
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending[:self._max_batch_size], self._pending[self._max_batch_size:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self._max_wait, self._flush)
+
+        if batch:
+            task = asyncio.create_task(self._run_batch(batch=batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[MatLike, asyncio.Future]]) -> None:
+        """
+        Run one batch through the wrapped backend and resolve the waiting futures.
+        """
+
+        # Requests whose callers gave up are dropped from the batch
+        batch = [(image, future) for image, future in batch if not future.done()]
+        if not batch:
+            return
+
+        try:
+            async with self._request_slot():
+                results = await asyncio.to_thread(
+                    self._vision.get_completions, [image for image, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def warm_up(self) -> None:
+        """
+        Warm up the wrapped backend.
+        """
+
+        self._vision.warm_up()
+
+    async def aclose(self) -> None:
+        """
+        Wait for in-flight batches and close the wrapped backend.
+        """
+
+        if self._pending:
+            self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        await self._vision.aclose()
@@ -0,0 +1,117 @@
+import asyncio
+from typing import (
+    Any,
+    List,
+    Optional)
+
+from cv2.typing import MatLike
+
+from src.vision._base import BaseVision
+from src.vision._cache import (
+    OCRCache,
+    cache_key)
+
+class CachedVision(BaseVision):
+    """
+    Content addressed result cache in front of any vision backend.
+
+    Results are keyed by a perceptual hash of the pre-processed image and the
+    wrapped backend's cache key, so reposted images skip the backend call.
+    Async completions only read the in-memory tier on the event loop, the
+    on-disk tier is read and written in a thread.
+    """
+    def __init__(self, vision: BaseVision, cache: OCRCache):
+        self._vision = vision
+        self._cache = cache
+
+    @property
+    def cache_key(self) -> str:
+        return self._vision.cache_key
+
+    @property
+    def name(self) -> str:
+        return self._vision.name
+
+    def _process_image(self, image: MatLike) -> Any:
+        """
+        Delegate image processing to the wrapped backend.
+        """
+
+        return self._vision._process_image(image=image)
+
+    def _key(self, image: MatLike) -> str:
+        return cache_key(image=image, backend_key=self._vision.cache_key)
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Return a cached result, otherwise complete with the wrapped backend.
+        """
+
+        key = self._key(image=image)
+        found, result = self._cache.get(key=key)
+        if found:
+            return result
+
+        result = self._vision.get_completion(image=image)
+        if result is not None:
+            self._cache.put(key=key, value=result)
+        return result
+
+    def get_completions(self, images: List[MatLike]) -> List[Optional[str]]:
+        """
+        Return cached results, completing only the misses as one batch.
+        """
+
+        keys = [self._key(image=image) for image in images]
+        results: List[Optional[str]] = []
+        missing = []
+        for index, key in enumerate(keys):
+            found, result = self._cache.get(key=key)
+            results.append(result)
+            if not found:
+                missing.append(index)
+
+        if missing:
+            completions = self._vision.get_completions(images=[images[index] for index in missing])
+            for index, result in zip(missing, completions):
+                results[index] = result
+                if result is not None:
+                    self._cache.put(key=keys[index], value=result)
+        return results
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Return a cached result, otherwise complete with the wrapped backend without blocking.
+        """
+
+        key = self._key(image=image)
+        if self._cache.on_disk:
+            found, result = self._cache.get_from_memory(key=key)
+            if not found:
+                found, result = await asyncio.to_thread(self._cache.get, key=key)
+        else:
+            found, result = self._cache.get(key=key)
+        if found:
+            return result
+
+        result = await self._vision.aget_completion(image=image)
+        if result is not None:
+            if self._cache.on_disk:
+                await asyncio.to_thread(self._cache.put, key=key, value=result)
+            else:
+                self._cache.put(key=key, value=result)
+        return result
+
+    def warm_up(self) -> None:
+        """
+        Warm up the wrapped backend.
+        """
+
+        self._vision.warm_up()
+
+    async def aclose(self) -> None:
+        """
+        Close the wrapped backend.
+        """
+
+        await self._vision.aclose()
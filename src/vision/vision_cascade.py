@@ -0,0 +1,175 @@
+import statistics
+import time
+from collections import deque
+from dataclasses import (
+    dataclass,
+    field)
+from typing import (
+    Any,
+    Deque,
+    List,
+    Optional,
+    Tuple)
+
+from cv2.typing import MatLike
+
+from src.vision._base import BaseVision
+
+# Number of recent latencies kept per stage for the median
+LATENCY_WINDOW = 1000
+
+@dataclass
+class CascadeStage:
+    """
+    One engine of a cascade and the confidence it needs for its result to be accepted.
+
+    A result is escalated to the next stage when it does not parse or, if
+    min_confidence is set, when the engine reports a lower confidence.
+    Engines that report no confidence are accepted whenever the result parses.
+    """
+
+    vision: BaseVision
+    min_confidence: Optional[float] = None
+
+@dataclass
+class CascadeStageStats:
+    """
+    Call, escalation and latency counters of one cascade stage.
+    """
+
+    calls: int = 0
+    escalations: int = 0
+    total_latency: float = 0.0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalations / self.calls if self.calls else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+    @property
+    def median_latency(self) -> float:
+        return statistics.median(self.latencies) if self.latencies else 0.0
+
+    def record(self, latency: float, escalated: bool) -> None:
+        self.calls += 1
+        self.escalations += escalated
+        self.total_latency += latency
+        self.latencies.append(latency)
+
+class CascadeVision(BaseVision):
+    """
+    Cascade of vision backends, cheapest first.
+
+    Each image is read by the first stage, typically a fast local engine, and
+    only escalated to the following, more expensive stages when the result
+    does not parse or its confidence is too low. If no stage is confident,
+    the last stage's result is returned, or the first parsed result before it.
+    """
+    def __init__(self, stages: List[CascadeStage]):
+        if not stages:
+            raise ValueError('A cascade needs at least one stage')
+
+        # Stages limit their own in-flight requests, so the cascade holds no request slot
+        self._stages = stages
+        self.stats = [CascadeStageStats() for _ in stages]
+
+    @property
+    def cache_key(self) -> str:
+        return '|'.join(
+            f'{stage.vision.cache_key}>={stage.min_confidence}' for stage in self._stages)
+
+    def _process_image(self, image: MatLike) -> Any:
+        """
+        Delegate image processing to the first stage.
+        """
+
+        return self._stages[0].vision._process_image(image=image)
+
+    def _accepts(self, stage: CascadeStage, result: Optional[str], confidence: Optional[float]) -> bool:
+        """
+        Whether a stage's result is good enough to stop the cascade.
+        """
+
+        if result is None:
+            return False
+        return stage.min_confidence is None or confidence is None or confidence >= stage.min_confidence
+
+    def _record(
+        self,
+        index: int,
+        start: float,
+        result: Optional[str],
+        confidence: Optional[float]
+    ) -> bool:
+        """
+        Record a stage's latency and escalation, returning whether the result was accepted.
+        """
+
+        accepted = self._accepts(stage=self._stages[index], result=result, confidence=confidence)
+        is_last = index == len(self._stages) - 1
+        self.stats[index].record(latency=time.perf_counter() - start, escalated=not accepted and not is_last)
+        return accepted
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Run the cascade on an image, returning the accepted result and its confidence.
+        """
+
+        fallback: Tuple[Optional[str], Optional[float]] = (None, None)
+        for index, stage in enumerate(self._stages):
+            start = time.perf_counter()
+            result, confidence = stage.vision.get_completion_with_confidence(image=image)
+            if self._record(index=index, start=start, result=result, confidence=confidence):
+                return result, confidence
+            if fallback[0] is None:
+                fallback = (result, confidence)
+        return (result, confidence) if result is not None else fallback
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Run the cascade on an image.
+        """
+
+        return self.get_completion_with_confidence(image=image)[0]
+
+    async def aget_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Run the cascade on an image without blocking, each stage on its own async path.
+        """
+
+        fallback: Tuple[Optional[str], Optional[float]] = (None, None)
+        for index, stage in enumerate(self._stages):
+            start = time.perf_counter()
+            result, confidence = await stage.vision.aget_completion_with_confidence(image=image)
+            if self._record(index=index, start=start, result=result, confidence=confidence):
+                return result, confidence
+            if fallback[0] is None:
+                fallback = (result, confidence)
+        return (result, confidence) if result is not None else fallback
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Run the cascade on an image without blocking.
+        """
+
+        return (await self.aget_completion_with_confidence(image=image))[0]
+
+    def warm_up(self) -> None:
+        """
+        Warm up every stage.
+        """
+
+        for stage in self._stages:
+            stage.vision.warm_up()
+
+    async def aclose(self) -> None:
+        """
+        Close every stage.
+        """
+
+        for stage in self._stages:
+            await stage.vision.aclose()
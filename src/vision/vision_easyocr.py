@@ -1,40 +1,132 @@
-from typing import Optional
+import threading
+from typing import (
+    List,
+    Optional,
+    Tuple)
 
+import numpy as np
+import cv2
 from cv2.typing import MatLike
 import easyocr
 
 from src.vision._base import BaseVision
+from src.vision._models import ImageFormat
 from src.utils import (
+    EncodingPolicy,
     encode_image,
     parse_ocr_response)
 
+# Pre-processed images are dark characters on a white background
+PADDING_VALUE = 255
+
+# The reader decodes the payload locally, so a lossless and fast encoding is preferred over size
+DEFAULT_ENCODING_POLICY = EncodingPolicy(image_format=ImageFormat.PNG, png_compression=1, bilevel=True)
+
+# Blank pre-processed image run through the reader when warming up
+WARM_UP_SHAPE = (64, 256)
+
 class EasyOCR(BaseVision):
     """
     Easy OCR API connection.
+
+    The reader and its weights are loaded on the first completion, or ahead of it by warm_up.
     """
-    def __init__(self):
-        self._reader = easyocr.Reader(['en'])
+    def __init__(self, encoding_policy: Optional[EncodingPolicy] = None):
+        self._encoding_policy = encoding_policy or DEFAULT_ENCODING_POLICY
+        self._reader_instance: Optional[easyocr.Reader] = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def _reader(self) -> easyocr.Reader:
+        """
+        Reader, created once on first use.
+        """
+
+        with self._load_lock:
+            if self._reader_instance is None:
+                self._reader_instance = easyocr.Reader(['en'])
+        return self._reader_instance
+
+    def warm_up(self) -> None:
+        """
+        Load the reader and run one detection on a blank image.
+        """
+
+        self._reader.readtext(np.full(WARM_UP_SHAPE, 255, dtype=np.uint8))
 
     def _process_image(self, image: MatLike) -> bytes:
         """
         Transform open-cv image object into bytes.
         """
 
-        bytes_image = encode_image(image=image)
+        bytes_image = encode_image(image=image, policy=self._encoding_policy)
 
         return bytes_image
 
+    def _pad_images(self, images: List[MatLike]) -> List[MatLike]:
+        """
+        Pad images with background to a common size so they can be batched.
+        """
+
+        height = max(image.shape[0] for image in images)
+        width = max(image.shape[1] for image in images)
+
+        return [
+            cv2.copyMakeBorder(
+                image, 0, height - image.shape[0], 0, width - image.shape[1],
+                cv2.BORDER_CONSTANT, value=(PADDING_VALUE,) * 3)
+            for image in images]
+
+    def _parse_detections(self, detections: list) -> Optional[str]:
+        """
+        Concatenate detected text and parse the result.
+        """
+
+        detections_concat = ''.join([text for (_, text, _) in detections])
+        
+        result = parse_ocr_response(response=detections_concat)
+
+        return result
+
+    def _detections_confidence(self, detections: list) -> Optional[float]:
+        """
+        Confidence of the concatenated text, that of its least confident detection.
+        """
+
+        if not detections:
+            return None
+        return min(float(confidence) for (_, _, confidence) in detections)
+
     def get_completion(self, image: MatLike) -> Optional[str]:
         """
         Get text detection within image from easy OCR API.
         """
 
+        return self.get_completion_with_confidence(image=image)[0]
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Get text detection within image from easy OCR API with the detection confidence.
+        """
+
         bytes_image = self._process_image(image=image)
 
         # Use the reader to read text from the bytes
         detections = self._reader.readtext(bytes_image)
-        detections_concat = ''.join([text for (_, text, _) in detections])
-        
-        result = parse_ocr_response(response=detections_concat)
+        return self._parse_detections(detections=detections), self._detections_confidence(detections=detections)
+
+    def get_completions(self, images: List[MatLike]) -> List[Optional[str]]:
+        """
+        Get text detection within a batch of images from easy OCR API.
+        """
+
+        if not images:
+            return []
+
+        # Arrays are passed directly, skipping the encode/decode round-trip
+        padded_images = self._pad_images(images=images)
+        height, width = padded_images[0].shape[:2]
 
-        return result
\ No newline at end of file
+        batch_detections = self._reader.readtext_batched(
+            padded_images, n_width=width, n_height=height, batch_size=len(padded_images))
+        return [self._parse_detections(detections=detections) for detections in batch_detections]
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Optional
 
@@ -6,15 +7,23 @@ from google.cloud import vision
 
 from src.vision._base import BaseVision
 from src.utils import (
-    encode_image, 
+    BILEVEL_ENCODING_POLICY,
+    EncodingPolicy,
+    encode_image,
     parse_ocr_response)
 
 class GoogleVision(BaseVision):
     """
     Google AI vision API connection.
     """
-    def __init__(self):
-        
+    def __init__(
+        self,
+        max_concurrent_requests: int = 8,
+        encoding_policy: Optional[EncodingPolicy] = None
+    ):
+        self._max_concurrent_requests = max_concurrent_requests
+        self._encoding_policy = encoding_policy or BILEVEL_ENCODING_POLICY
+
         # Retrieve API key
         self._api_key = os.environ.get("GOOGLE_API_KEY")
         
@@ -24,16 +33,33 @@ class GoogleVision(BaseVision):
 
         self._client = vision.ImageAnnotatorClient(
             client_options={'api_key': self._api_key})
+        self._async_client: Optional[vision.ImageAnnotatorAsyncClient] = None
         
     def _process_image(self, image: MatLike) -> bytes:
         """
         Transform open-cv image object into bytes.
         """
 
-        bytes_image = encode_image(image=image)
+        bytes_image = encode_image(image=image, policy=self._encoding_policy)
 
         return bytes_image
 
+    def _parse_response(self, response: vision.AnnotateImageResponse) -> Optional[str]:
+        """
+        Retrieve the longest detected text segment from an annotation response.
+        """
+
+        if response.error.message:
+            return None
+
+        # Sort and retrieve longest detected text
+        segments = response.text_annotations[1:]
+        if not segments:
+            return None
+
+        sorted_segments = sorted(segments, key=lambda x: len(x.description), reverse=True)
+        return parse_ocr_response(response=sorted_segments[0].description)
+
     def get_completion(self, image: MatLike) -> Optional[str]:
         """
         Get text detection within image from Google AI vision API.
@@ -44,13 +70,33 @@ class GoogleVision(BaseVision):
         # Retrieve all detected text in image
         image = vision.Image(content=bytes_image)
         response = self._client.text_detection(image=image)
-        detections = response.text_annotations
+        return self._parse_response(response=response)
 
-        # Sort and retrieve longest detected text
-        segments = detections[1:]
-        sorted_segments = sorted(segments, key=lambda x: len(x.description), reverse=True)
-        result = parse_ocr_response(response=sorted_segments[0].description)
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Get text detection within image from Google AI vision API without blocking.
+        """
 
-        if response.error.message:
-            return None
-        return result
\ No newline at end of file
+        # The gRPC channel behind the async client keeps connections alive between calls
+        if self._async_client is None:
+            self._async_client = vision.ImageAnnotatorAsyncClient(
+                client_options={'api_key': self._api_key})
+
+        # Encoding is CPU bound and runs off the event loop
+        content = await asyncio.to_thread(self._process_image, image=image)
+        request = vision.AnnotateImageRequest(
+            image=vision.Image(content=content),
+            features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)])
+
+        async with self._request_slot():
+            batch_response = await self._async_client.batch_annotate_images(requests=[request])
+        return self._parse_response(response=batch_response.responses[0])
+
+    async def aclose(self) -> None:
+        """
+        Close the gRPC channel of the async client.
+        """
+
+        if self._async_client is not None:
+            await self._async_client.transport.close()
+            self._async_client = None
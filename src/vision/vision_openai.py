@@ -1,15 +1,28 @@
+import asyncio
 import os
 from typing import Optional
 
+import httpx
 from cv2.typing import MatLike
-from openai import OpenAI
+from openai import (
+    AsyncOpenAI,
+    OpenAI)
 
 from src.vision._base import BaseVision
-from src.vision._models import OpenAIModels
+from src.vision._models import (
+    ImageFormat,
+    OpenAIModels)
 from src.utils import (
+    EncodingPolicy,
     encode_image_base64,
     parse_ocr_response)
 
+DEFAULT_PROMPT = 'What are the largest characters in this image? Only output the text in the image.'
+
+# Larger images are scaled down to fit 2048 pixels by the API anyway
+DEFAULT_ENCODING_POLICY = EncodingPolicy(
+    image_format=ImageFormat.PNG, png_compression=6, max_dimension=2048, bilevel=True)
+
 class OpenAIVision(BaseVision):
     """
     OpenAI vision API connection.
@@ -17,10 +30,16 @@ class OpenAIVision(BaseVision):
     def __init__(
         self,
         model_name: OpenAIModels = OpenAIModels.GPT_4_VISION,
-        temperature: float = 1.0
+        temperature: float = 1.0,
+        prompt: str = DEFAULT_PROMPT,
+        max_concurrent_requests: int = 8,
+        encoding_policy: Optional[EncodingPolicy] = None
     ):
         self._model_name = model_name
         self._temperature = temperature
+        self._prompt = prompt
+        self._max_concurrent_requests = max_concurrent_requests
+        self._encoding_policy = encoding_policy or DEFAULT_ENCODING_POLICY
 
         # Retrieve API key
         self._api_key = os.environ['OPENAI_API_KEY']
@@ -31,44 +50,93 @@ class OpenAIVision(BaseVision):
 
         # Instantiate a client object for interacting with the OpenAI API
         self._client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+        self._async_client: Optional[AsyncOpenAI] = None
 
         if not isinstance(self._model_name, OpenAIModels):
             raise ValueError(f'{model_name.value} is not a valid model name for OpenAI API')
         
-    def _process_image(self, image: MatLike) -> bytes:
+    @property
+    def cache_key(self) -> str:
+        return f'{type(self).__name__}:{self._model_name.value}:{self._prompt}'
+
+    def _process_image(self, image: MatLike) -> str:
         """
-        Transform open-cv image object into bytes.
+        Transform open-cv image object into a base64 string.
         """
 
-        bytes_base64_image = encode_image_base64(image=image)
+        bytes_base64_image = encode_image_base64(image=image, policy=self._encoding_policy)
 
         return bytes_base64_image
 
-    def get_completion(self, prompt: str, image: MatLike) -> Optional[str]:
+    def _build_messages(self, prompt: Optional[str], image: MatLike) -> list:
         """
-        Get prompt vision completion for image from OpenAI vision API.
+        Build chat messages containing the prompt and the base64 image.
         """
 
         bytes_base64_image = self._process_image(image=image)
 
-        response = self._client.chat.completions.create(
-            model=self._model_name.value,
-            messages=[
+        return [
             {
                 "role": "user",
                 "content": [
                     {
                     "type": "text",
-                    "text": prompt
+                    "text": prompt or self._prompt
                     },
                     {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{bytes_base64_image}"
+                        "url": f"data:{self._encoding_policy.mime_type};base64,{bytes_base64_image}"
                     }
                     }
                 ]
             }
-        ])
+        ]
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        """
+        Lazily create the async client with a pooled keep-alive connection pool.
+        """
+
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self._api_key,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self._max_concurrent_requests,
+                        max_keepalive_connections=self._max_concurrent_requests)))
+        return self._async_client
+
+    def get_completion(self, image: MatLike, prompt: Optional[str] = None) -> Optional[str]:
+        """
+        Get prompt vision completion for image from OpenAI vision API.
+        """
+
+        response = self._client.chat.completions.create(
+            model=self._model_name.value,
+            messages=self._build_messages(prompt=prompt, image=image))
         detected_text = parse_ocr_response(response=response.choices[0].message.content)
-        return detected_text
\ No newline at end of file
+        return detected_text
+
+    async def aget_completion(self, image: MatLike, prompt: Optional[str] = None) -> Optional[str]:
+        """
+        Get prompt vision completion for image from OpenAI vision API without blocking.
+        """
+
+        async with self._request_slot():
+            # Encoding is CPU bound and runs off the event loop
+            messages = await asyncio.to_thread(self._build_messages, prompt=prompt, image=image)
+            response = await self._get_async_client().chat.completions.create(
+                model=self._model_name.value,
+                messages=messages)
+        detected_text = parse_ocr_response(response=response.choices[0].message.content)
+        return detected_text
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled connections of the async client.
+        """
+
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
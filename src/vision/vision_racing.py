@@ -0,0 +1,190 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import (
+    dataclass,
+    field)
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    List,
+    Optional)
+
+import numpy as np
+from cv2.typing import MatLike
+
+from src.vision._base import BaseVision
+
+# Number of recent latencies kept per backend for the hedge delay
+LATENCY_WINDOW = 200
+
+@dataclass
+class BackendLatencyStats:
+    """
+    Requests, wins and recent latencies of one raced backend.
+
+    Cancelled requests count with the time they ran for, a lower bound of their latency.
+    """
+
+    requests: int = 0
+    wins: int = 0
+    cancellations: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.requests if self.requests else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        return float(np.quantile(self.latencies, q)) if self.latencies else None
+
+class RacingVision(BaseVision):
+    """
+    Hedged requests across several vision backends.
+
+    The image is sent to the first backend, and to the next one when the
+    pending request has run longer than its backend's hedge_quantile latency
+    or returned no parsable result. The first parsed result wins and the
+    other requests are cancelled. Until a backend has min_samples latencies,
+    initial_hedge_delay is used. With a zero delay every backend is raced at once.
+    """
+    def __init__(
+        self,
+        backends: List[BaseVision],
+        hedge_quantile: float = 0.95,
+        initial_hedge_delay: float = 2.0,
+        min_samples: int = 20
+    ):
+        if not backends:
+            raise ValueError('At least one backend is required')
+
+        self._backends = backends
+        self._hedge_quantile = hedge_quantile
+        self._initial_hedge_delay = initial_hedge_delay
+        self._min_samples = min_samples
+        self.stats = [BackendLatencyStats() for _ in backends]
+
+    @property
+    def cache_key(self) -> str:
+        return '|'.join(backend.cache_key for backend in self._backends)
+
+    def _process_image(self, image: MatLike) -> Any:
+        """
+        Delegate image processing to the first backend.
+        """
+
+        return self._backends[0]._process_image(image=image)
+
+    def hedge_delay(self, index: int) -> float:
+        """
+        Seconds to wait on a backend before sending the request to the next one.
+        """
+
+        stats = self.stats[index]
+        if self._initial_hedge_delay == 0 or len(stats.latencies) < self._min_samples:
+            return self._initial_hedge_delay
+        return stats.quantile(q=self._hedge_quantile)
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Blocking completions try each backend in turn until one gives a parsed result.
+        """
+
+        for index, backend in enumerate(self._backends):
+            self.stats[index].requests += 1
+            start = time.perf_counter()
+            result = backend.get_completion(image=image)
+            self.stats[index].latencies.append(time.perf_counter() - start)
+            if result is not None:
+                self.stats[index].wins += 1
+                return result
+        return None
+
+    async def _timed_completion(self, index: int, image: MatLike) -> Optional[str]:
+        """
+        Complete with one backend, recording its latency when it finishes or is cancelled.
+        """
+
+        self.stats[index].requests += 1
+        start = time.perf_counter()
+        try:
+            result = await self._backends[index].aget_completion(image=image)
+        except asyncio.CancelledError:
+            # Cancelled losers took at least this long, leaving them out would shrink the hedge delay
+            self.stats[index].cancellations += 1
+            self.stats[index].latencies.append(time.perf_counter() - start)
+            raise
+        except Exception as e:
+            print(f'{self._backends[index].cache_key} failed during a hedged request: {e}')
+            result = None
+
+        self.stats[index].latencies.append(time.perf_counter() - start)
+        return result
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Race the backends with hedged requests, returning the first parsed result.
+        """
+
+        pending: Dict[asyncio.Task, int] = {}
+        next_index = 0
+        launched_at = 0.0
+
+        def launch() -> None:
+            nonlocal next_index, launched_at
+            task = asyncio.create_task(self._timed_completion(index=next_index, image=image))
+            pending[task] = next_index
+            next_index += 1
+            launched_at = time.perf_counter()
+
+        try:
+            while pending or next_index < len(self._backends):
+                # Launch the next backend when nothing is in flight or the hedge delay passed
+                if next_index < len(self._backends) and not pending:
+                    launch()
+
+                # The hedge delay runs from the latest launch, and is over once that request gave no result
+                timeout = None
+                if next_index < len(self._backends):
+                    timeout = 0.0
+                    if next_index - 1 in pending.values():
+                        elapsed = time.perf_counter() - launched_at
+                        timeout = max(0.0, self.hedge_delay(index=next_index - 1) - elapsed)
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done and next_index < len(self._backends):
+                    launch()
+                    continue
+
+                for task in done:
+                    index = pending.pop(task)
+                    result = task.result()
+                    if result is not None:
+                        self.stats[index].wins += 1
+                        return result
+            return None
+        finally:
+            # Losing requests are cancelled as soon as a result wins
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def warm_up(self) -> None:
+        """
+        Warm up every backend.
+        """
+
+        for backend in self._backends:
+            backend.warm_up()
+
+    async def aclose(self) -> None:
+        """
+        Close every backend.
+        """
+
+        for backend in self._backends:
+            await backend.aclose()
@@ -0,0 +1,389 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import struct
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+    Union)
+
+import numpy as np
+from cv2.typing import MatLike
+
+from src.vision._base import BaseVision
+from src.vision._models import VisionBackend
+from src.vision._registry import create_vision
+from src.vision.vision_batching import BatchingVision
+
+DEFAULT_SOCKET_PATH = '/tmp/telegram_ocr_model.sock'
+
+# Every frame starts with the length of its JSON header and of its raw payload
+FRAME_PREFIX = struct.Struct('!II')
+
+def _encode_frame(header: dict, payload: bytes = b'') -> bytes:
+    """
+    Serialise a frame as prefix, JSON header and raw payload.
+    """
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    return FRAME_PREFIX.pack(len(header_bytes), len(payload)) + header_bytes + payload
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+    """
+    Read one frame from a stream.
+    """
+
+    header_length, payload_length = FRAME_PREFIX.unpack(await reader.readexactly(FRAME_PREFIX.size))
+    header = json.loads(await reader.readexactly(header_length))
+    payload = await reader.readexactly(payload_length) if payload_length else b''
+    return header, payload
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes:
+    """
+    Read exactly size bytes from a blocking socket.
+    """
+
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    while view:
+        received = sock.recv_into(view)
+        if not received:
+            raise ConnectionError('Model server closed the connection')
+        view = view[received:]
+    return bytes(buffer)
+
+def _receive_frame(sock: socket.socket) -> Tuple[dict, bytes]:
+    """
+    Read one frame from a blocking socket.
+    """
+
+    header_length, payload_length = FRAME_PREFIX.unpack(_receive_exactly(sock=sock, size=FRAME_PREFIX.size))
+    header = json.loads(_receive_exactly(sock=sock, size=header_length))
+    payload = _receive_exactly(sock=sock, size=payload_length) if payload_length else b''
+    return header, payload
+
+def _image_frame(request_id: int, image: MatLike, with_confidence: bool) -> bytes:
+    """
+    Frame a completion request carrying the raw image array.
+    """
+
+    image = np.ascontiguousarray(image)
+    header = {
+        'op': 'complete',
+        'id': request_id,
+        'shape': image.shape,
+        'dtype': image.dtype.str,
+        'with_confidence': with_confidence}
+    return _encode_frame(header=header, payload=image.data.cast('B'))
+
+class ModelServer:
+    """
+    Local inference server owning a single copy of a vision backend.
+
+    Clients connect over a Unix socket and send raw image arrays. Requests
+    from every connection go through one micro-batcher, so concurrent
+    listeners share a warm model and its batches.
+    """
+    def __init__(
+        self,
+        backend: Union[VisionBackend, str],
+        backend_options: Optional[dict] = None,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        max_batch_size: int = 8,
+        max_wait: float = 0.01
+    ):
+        self._socket_path = socket_path
+        self._vision = BatchingVision(
+            vision=create_vision(backend=backend, **(backend_options or {})),
+            max_batch_size=max_batch_size,
+            max_wait=max_wait)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _complete(self, header: dict, payload: bytes) -> dict:
+        """
+        Run one completion request through the batcher.
+        """
+
+        image = np.frombuffer(payload, dtype=np.dtype(header['dtype'])).reshape(header['shape'])
+        if header.get('with_confidence'):
+            result, confidence = await self._vision.aget_completion_with_confidence(image=image)
+        else:
+            result, confidence = await self._vision.aget_completion(image=image), None
+        return {'id': header['id'], 'result': result, 'confidence': confidence}
+
+    async def _respond(self, header: dict, payload: bytes, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer one request, reporting failures back to the client.
+        """
+
+        try:
+            if header['op'] == 'info':
+                response = {'id': header['id'], 'cache_key': self._vision.cache_key}
+            else:
+                response = await self._complete(header=header, payload=payload)
+        except Exception as e:
+            response = {'id': header['id'], 'error': f'{type(e).__name__}: {e}'}
+
+        # A whole frame is written at once so concurrent responses never interleave
+        writer.write(_encode_frame(header=response))
+        await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve pipelined requests from one client until it disconnects.
+        """
+
+        tasks: set = set()
+        try:
+            while True:
+                header, payload = await _read_frame(reader=reader)
+                task = asyncio.create_task(self._respond(header=header, payload=payload, writer=writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def serve_forever(self) -> None:
+        """
+        Warm the model up, then accept clients until cancelled.
+        """
+
+        await asyncio.to_thread(self._vision.warm_up)
+
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        # Only the owner may submit work, the socket is never accessible to other users even briefly
+        previous_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=self._socket_path)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(self._socket_path, 0o600)
+        print(f'Model server for {self._vision.cache_key} listening on {self._socket_path}')
+
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self._vision.aclose()
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+
+class ModelServerVision(BaseVision):
+    """
+    Thin client forwarding completions to a ModelServer.
+
+    Async completions share one pipelined connection, blocking completions
+    open a short-lived one. No model is loaded in the client process. The
+    cache key is the server backend's, on an event loop it must have been
+    fetched by warm_up first.
+    """
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, max_concurrent_requests: int = 32):
+        self._socket_path = socket_path
+        self._max_concurrent_requests = max_concurrent_requests
+        self._request_ids = itertools.count()
+        self._cache_key: Optional[str] = None
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receiver: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    @property
+    def cache_key(self) -> str:
+        if self._cache_key is not None:
+            return self._cache_key
+
+        # The event loop is never blocked on the server
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._cache_key = self._fetch_cache_key()
+            return self._cache_key
+        raise RuntimeError('The model server cache key is unknown, call warm_up before using it on an event loop')
+
+    def _fetch_cache_key(self) -> str:
+        """
+        Ask the server for its backend's cache key over a blocking connection.
+        """
+
+        frame = _encode_frame(header={'op': 'info', 'id': next(self._request_ids)})
+        return self._request(frame=frame)['cache_key']
+
+    def _process_image(self, image: MatLike) -> Any:
+        """
+        Images are sent as raw arrays, the server does any processing.
+        """
+
+        return image
+
+    def _request(self, frame: bytes) -> dict:
+        """
+        Send one request frame over a blocking connection and wait for its response.
+        """
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self._socket_path)
+            sock.sendall(frame)
+            response, _ = _receive_frame(sock=sock)
+        return response
+
+    def _result(self, response: dict) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Unpack a completion response, raising errors reported by the server.
+        """
+
+        if 'error' in response:
+            raise RuntimeError(f'Model server error: {response["error"]}')
+        return response['result'], response['confidence']
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Complete an image on the server with its confidence, blocking until it answers.
+        """
+
+        frame = _image_frame(request_id=next(self._request_ids), image=image, with_confidence=True)
+        return self._result(response=self._request(frame=frame))
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Complete an image on the server, blocking until it answers.
+        """
+
+        return self.get_completion_with_confidence(image=image)[0]
+
+    def warm_up(self) -> None:
+        """
+        Check the server is reachable and fetch its cache key, its model is already warm.
+        """
+
+        self._cache_key = self._fetch_cache_key()
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        """
+        Open the shared connection and its response receiver if they are not open, returning its writer.
+        """
+
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            writer = self._writer
+            if writer is not None and not writer.is_closing():
+                return writer
+            self._reader, writer = await asyncio.open_unix_connection(path=self._socket_path)
+            self._writer = writer
+            self._receiver = asyncio.create_task(self._receive(reader=self._reader))
+            return writer
+
+    async def _receive(self, reader: asyncio.StreamReader) -> None:
+        """
+        Resolve pending requests as their responses arrive.
+        """
+
+        try:
+            while True:
+                response, _ = await _read_frame(reader=reader)
+                future = self._pending.pop(response['id'], None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except Exception as e:
+            # Every request still waiting on this connection fails with it
+            error = e if isinstance(e, ConnectionError) else ConnectionError(f'Model server connection lost: {e}')
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    async def _send(self, writer: asyncio.StreamWriter, frame_for: Callable[[int], bytes]) -> dict:
+        """
+        Send the frame built for a new request id on a connection and wait for its response.
+        """
+
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            writer.write(frame_for(request_id))
+            await writer.drain()
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _arequest(self, image: MatLike, with_confidence: bool) -> dict:
+        """
+        Send a completion request on the shared connection and wait for its response.
+        """
+
+        # The local writer stays valid even if a failed receiver clears the shared one meanwhile
+        writer = await self._connect()
+        return await self._send(
+            writer=writer,
+            frame_for=lambda request_id: _image_frame(
+                request_id=request_id, image=image, with_confidence=with_confidence))
+
+    async def aget_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Complete an image on the server with its confidence without blocking.
+        """
+
+        async with self._request_slot():
+            response = await self._arequest(image=image, with_confidence=True)
+        return self._result(response=response)
+
+    async def aget_completion(self, image: MatLike) -> Optional[str]:
+        """
+        Complete an image on the server without blocking, batched with other requests.
+        """
+
+        async with self._request_slot():
+            response = await self._arequest(image=image, with_confidence=False)
+        return self._result(response=response)[0]
+
+    async def aclose(self) -> None:
+        """
+        Close the shared connection.
+        """
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._receiver is not None:
+            self._receiver.cancel()
+            await asyncio.gather(self._receiver, return_exceptions=True)
+            self._receiver = None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve one vision backend to local clients.')
+    parser.add_argument(
+        '--backend',
+        default=VisionBackend.TROCR.value,
+        choices=[backend.value for backend in VisionBackend if backend is not VisionBackend.MODEL_SERVER])
+    parser.add_argument('--socket-path', default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--max-batch-size', type=int, default=8)
+    parser.add_argument('--max-wait', type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = ModelServer(
+        backend=args.backend,
+        socket_path=args.socket_path,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait)
+    asyncio.run(server.serve_forever())
+
+if __name__ == "__main__":
+    main()
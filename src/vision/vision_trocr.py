@@ -1,8 +1,18 @@
+import glob
 import os
+import shutil
+import threading
+from typing import (
+    Any,
+    List,
+    Optional,
+    Tuple)
 
 from PIL import Image
+import numpy as np
 import cv2
 from cv2.typing import MatLike
+import torch
 from torch import Tensor
 from transformers import (
     TrOCRProcessor, 
@@ -12,19 +22,55 @@ from src.utils import parse_ocr_response
 from src.vision._base import BaseVision
 from src.vision._models import (
     LocalModels,
-    ModelsDirectory)
+    ModelsDirectory,
+    TrOCREngine)
+
+# Tickers are at most five letters, a few tokens more leave room for spaces and symbols
+DEFAULT_MAX_NEW_TOKENS = 12
+
+# Blank pre-processed image run through the model when warming up
+WARM_UP_SHAPE = (64, 256)
 
 class TrOCR(BaseVision):
     """
     TrOCR local model inference.
+
+    Weights are loaded on the first completion, or ahead of it by warm_up.
     """
     def __init__(
         self,
         model_name: LocalModels = LocalModels.TROCR_LARGE_STR,
-        model_directory: ModelsDirectory = ModelsDirectory.TROCR
+        model_directory: ModelsDirectory = ModelsDirectory.TROCR,
+        engine: TrOCREngine = TrOCREngine.PYTORCH,
+        max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS
     ):
         self._model_name = model_name
         self._model_directory = model_directory
+        self._engine = engine
+        self._max_new_tokens = max_new_tokens
+
+        self._processor: Optional[TrOCRProcessor] = None
+        self._model: Any = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def cache_key(self) -> str:
+        return f'{type(self).__name__}:{self._model_name.value}:{self._engine.value}'
+
+    def _load(self) -> None:
+        """
+        Load the processor and model weights once.
+        """
+
+        with self._load_lock:
+            if self._model is not None:
+                return
+            self._load_model()
+
+    def _load_model(self) -> None:
+        """
+        Load the pretrained model for the configured engine, saving it locally on first use.
+        """
 
         # Get local pretrained models
         local_model_path = os.path.join(self._model_directory.value, self._model_name.value)
@@ -38,30 +84,149 @@ class TrOCR(BaseVision):
             self._processor.save_pretrained(local_model_path)
             self._model.save_pretrained(local_model_path)
 
+        if self._engine is TrOCREngine.PYTORCH_INT8:
+            self._model = torch.quantization.quantize_dynamic(
+                self._model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self._engine in (TrOCREngine.ONNX, TrOCREngine.ONNX_INT8):
+            self._model = self._load_onnx_model(local_model_path=local_model_path)
+
+    def _load_onnx_model(self, local_model_path: str) -> Any:
+        """
+        Load the ONNX Runtime model, exporting and quantizing it on first use.
+
+        Exported and quantized models are cached next to the PyTorch model as
+        <model>-onnx and <model>-onnx-int8.
+        """
+
+        # ONNX Runtime is only needed by the ONNX engines
+        from optimum.onnxruntime import (
+            ORTModelForVision2Seq,
+            ORTQuantizer)
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        onnx_model_path = f'{local_model_path}-{TrOCREngine.ONNX.value}'
+        if not os.path.exists(onnx_model_path):
+            model = ORTModelForVision2Seq.from_pretrained(local_model_path, export=True, use_cache=True)
+            model.save_pretrained(onnx_model_path)
+            self._processor.save_pretrained(onnx_model_path)
+
+        if self._engine is TrOCREngine.ONNX:
+            return ORTModelForVision2Seq.from_pretrained(onnx_model_path, use_cache=True)
+
+        # Each exported graph is quantized with dynamic int8 weights, keeping its file name
+        int8_model_path = f'{local_model_path}-{TrOCREngine.ONNX_INT8.value}'
+        if not os.path.exists(int8_model_path):
+            quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            for onnx_file in glob.glob(os.path.join(onnx_model_path, '*.onnx')):
+                file_name = os.path.basename(onnx_file)
+                quantizer = ORTQuantizer.from_pretrained(onnx_model_path, file_name=file_name)
+                quantizer.quantize(
+                    save_dir=int8_model_path, quantization_config=quantization_config, file_suffix='')
+            for config_file in glob.glob(os.path.join(onnx_model_path, '*config.json')):
+                shutil.copy(config_file, int8_model_path)
+            self._processor.save_pretrained(int8_model_path)
+
+        return ORTModelForVision2Seq.from_pretrained(int8_model_path, use_cache=True)
+
     def _process_image(self, image: MatLike) -> Tensor:
         """
         Transform open-cv image object into tensor.
         """
 
-        # Convert matlive open-cv object into RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image_pil = Image.fromarray(image_rgb)
+        return self._process_images(images=[image])
+
+    def _process_images(self, images: List[MatLike]) -> Tensor:
+        """
+        Transform open-cv image objects into one batched tensor.
+        """
+
+        self._load()
+
+        # Convert matlive open-cv objects into RGB, pre-processed images are single channel
+        images_pil = [
+            Image.fromarray(cv2.cvtColor(
+                image, cv2.COLOR_GRAY2RGB if image.ndim == 2 else cv2.COLOR_BGR2RGB))
+            for image in images]
 
-        # Turn rgb image into pixel values
-        pixel_values = self._processor(images=image_pil, return_tensors="pt").pixel_values
+        # Turn rgb images into pixel values, the processor resizes every image to the
+        # encoder input size so images of any shape stack into a single batch tensor
+        pixel_values = self._processor(images=images_pil, return_tensors="pt").pixel_values
         
         return pixel_values
 
-    def get_completion(self, image: MatLike) -> str:
+    def warm_up(self) -> None:
+        """
+        Load the weights and run one inference on a blank image.
+        """
+
+        self.get_completions(images=[np.full(WARM_UP_SHAPE, 255, dtype=np.uint8)])
+
+    def get_completion(self, image: MatLike) -> Optional[str]:
         """
         Get text detection within image from trocr local model.
         """
 
-        pixel_values = self._process_image(image=image)
+        return self.get_completions(images=[image])[0]
+
+    def get_completions(self, images: List[MatLike]) -> List[Optional[str]]:
+        """
+        Get text detection within a batch of images from trocr local model.
+        """
+
+        return [result for result, _ in self.get_completions_with_confidence(images=images)]
+
+    def get_completion_with_confidence(self, image: MatLike) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Get text detection within image from trocr local model with its confidence.
+        """
+
+        return self.get_completions_with_confidence(images=[image])[0]
+
+    def get_completions_with_confidence(
+        self,
+        images: List[MatLike]
+    ) -> List[Tuple[Optional[str], Optional[float]]]:
+        """
+        Get text detection and confidence within a batch of images from trocr local model.
+
+        The confidence is the geometric mean probability of the generated tokens.
+        """
+
+        if not images:
+            return []
+
+        pixel_values = self._process_images(images=images)
+
+        # Greedy decoding reusing the decoder's key/value cache, kept short as tickers are 1-5 letters
+        with torch.inference_mode():
+            output = self._model.generate(
+                pixel_values,
+                max_new_tokens=self._max_new_tokens,
+                num_beams=1,
+                do_sample=False,
+                use_cache=True,
+                output_scores=True,
+                return_dict_in_generate=True)
+        responses = self._processor.batch_decode(output.sequences, skip_special_tokens=True)
+
+        # Padding after an early end of sequence scores zero and is left out of the mean
+        transition_scores = self._model.compute_transition_scores(
+            output.sequences, output.scores, output.get('beam_indices'), normalize_logits=True)
+        generated_tokens = output.sequences[:, -transition_scores.shape[1]:]
+        generated = generated_tokens != self._processor.tokenizer.pad_token_id
+        log_probabilities = (
+            transition_scores.masked_fill(~generated, 0).sum(dim=1) / generated.sum(dim=1).clamp(min=1))
+        confidences = log_probabilities.exp().tolist()
 
-        # Run inference on image
-        output = self._model.generate(pixel_values)
-        response = self._processor.batch_decode(output, skip_special_tokens=True)[0]
+        # Sequences cut off at max_new_tokens are longer than any ticker, not a shorter one.
+        # Only generated tokens are checked, TrOCR's decoder start token is also its end of sequence token
+        eos_token_id = self._model.generation_config.eos_token_id
+        if eos_token_id is None:
+            finished = [True] * len(responses)
+        else:
+            finished = torch.isin(generated_tokens, torch.tensor(eos_token_id)).any(dim=1).tolist()
 
-        result = parse_ocr_response(response=response)
-        return result
\ No newline at end of file
+        results = [
+            (parse_ocr_response(response=response), confidence) if is_finished else (None, confidence)
+            for response, confidence, is_finished in zip(responses, confidences, finished)]
+        return results